@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import ImageVariants
+
+
+@admin.register(ImageVariants)
+class ImageVariantsAdmin(admin.ModelAdmin):
+    list_display = ['source', 'updated_at']
+    search_fields = ['source']
+    readonly_fields = ['source', 'variants', 'updated_at']
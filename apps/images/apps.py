@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ImagesConfig(AppConfig):
+    name = 'apps.images'
+
+    def ready(self):
+        from . import signals  # noqa: F401
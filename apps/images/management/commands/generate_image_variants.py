@@ -0,0 +1,45 @@
+"""
+Render missing or outdated variants of every stall, menu item and profile
+image in this process, e.g. after changing IMAGE_VARIANTS or restoring media.
+Usage:
+    python manage.py generate_image_variants
+    python manage.py generate_image_variants --force    # re-render everything
+    python manage.py generate_image_variants --prune    # also delete variants no image uses any more
+"""
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from apps.images.pipeline import IMAGE_FIELDS, generate, prune
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnail and WebP variants of uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-render variants that are up to date')
+        parser.add_argument('--prune', action='store_true', help='Delete variants of images no longer in use')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        sources, owners = {}, {}
+        for (label, field_name), wanted in IMAGE_FIELDS.items():
+            rows = apps.get_model(label).objects.exclude(**{field_name: ''}).exclude(
+                **{f'{field_name}__isnull': True},
+            ).values_list('pk', field_name)
+            for pk, name in rows.iterator():
+                sources[name] = tuple(dict.fromkeys(sources.get(name, ()) + wanted))
+                owners.setdefault(name, (label, pk))
+
+        rendered = 0
+        for source, wanted in sources.items():
+            if generate(source, wanted, force=options['force'], owner=owners[source]):
+                rendered += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'🖼️  Rendered {rendered} of {len(sources)} images in {time.perf_counter() - started:.1f}s'
+            f' ({len(sources) - rendered} already up to date)'
+        ))
+        if options['prune']:
+            records, files = prune(set(sources))
+            self.stdout.write(f'🧹 Pruned {records} unused records and {files} unused variant files')
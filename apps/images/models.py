@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class ImageVariants(models.Model):
+    """Resized copies of one uploaded image, by preset (see apps/images/pipeline.py).
+
+    variants maps a preset name to {'spec': signature of the preset it was
+    made for, 'webp': [[width, name], ...], 'jpeg': [[width, name], ...]}.
+    A preset whose image could not be decoded has 'failed': True instead.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    variants = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Image variants'
+
+    def __str__(self):
+        return self.source
@@ -0,0 +1,239 @@
+"""
+Thumbnail and WebP variants of uploaded images.
+Every image field in IMAGE_FIELDS is rendered at the widths of its
+presets (IMAGE_VARIANTS in settings), cropped to the preset's aspect
+ratio, as WebP and as progressive JPEG. Variant files are named by a hash
+of their bytes, so a name never changes content and can be cached
+forever, and re-uploading the same photo reuses the same files.
+ImageVariants records which files belong to which original.
+
+Uploads are rendered by one background thread once the saving
+transaction commits, so a request never waits for Pillow. Each preset
+records a signature of its settings. When a preset changes, or a render
+was lost to a restart, {% responsive_image %} queues the image again the
+next time it is shown and serves the old variants (or the original) until
+the new ones exist.
+"""
+import hashlib
+import json
+import logging
+import queue
+import threading
+from datetime import timedelta
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'variants'
+FORMATS = ('webp', 'jpeg')
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+JPEG_QUALITY = 80
+WEBP_QUALITY = 78
+PRUNE_GRACE = timedelta(hours=1)   # unreferenced files younger than this may belong to a render in progress
+
+DEFAULT_PRESETS = {
+    # widths in px, aspect as (width, height), and the sizes attribute for the browser
+    'card': {'widths': [320, 640], 'aspect': [4, 3], 'sizes': '(max-width: 768px) 100vw, 320px'},
+    'hero': {'widths': [300, 600, 1000], 'aspect': [3, 2], 'sizes': '(max-width: 992px) 100vw, 300px'},
+    'avatar': {'widths': [120, 240], 'aspect': [1, 1], 'sizes': '120px'},
+}
+
+# Sent with the model instance's pk when new variants of its image are ready,
+# so pages that cached the original <img> can invalidate
+variants_rendered = Signal()
+
+# (model label, field name) -> presets rendered on upload
+IMAGE_FIELDS = {
+    ('stalls.FoodStall', 'image'): ('card', 'hero'),
+    ('stalls.MenuItem', 'image'): ('card',),
+    ('users.User', 'profile_pic'): ('avatar',),
+}
+
+
+def presets():
+    return getattr(settings, 'IMAGE_VARIANTS', None) or DEFAULT_PRESETS
+
+
+def signature(preset):
+    """Short hash of everything that decides how a preset is rendered."""
+    spec = {**presets()[preset], 'quality': [JPEG_QUALITY, WEBP_QUALITY]}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:10]
+
+
+def presets_for(fieldfile):
+    field = fieldfile.field
+    return IMAGE_FIELDS.get((field.model._meta.label, field.name), ())
+
+
+def stale_presets(variants, wanted):
+    return [preset for preset in wanted if variants.get(preset, {}).get('spec') != signature(preset)]
+
+
+def _cache_key(source):
+    return 'image-variants:' + hashlib.sha1(source.encode()).hexdigest()
+
+
+def cached_variants(source):
+    """ImageVariants.variants for an original, from the cache after the first read."""
+    key = _cache_key(source)
+    variants = cache.get(key)
+    if variants is None:
+        from .models import ImageVariants
+        variants = ImageVariants.objects.filter(source=source).values_list('variants', flat=True).first() or {}
+        cache.set(key, variants, None)
+    return variants
+
+
+def load(fh, specs):
+    """Open an upload upright and in RGB, decoding big JPEGs at a reduced scale."""
+    image = Image.open(fh)
+    largest = max(width for spec in specs for width in spec['widths'])
+    image.draft('RGB', (largest, largest))   # no-op for formats other than JPEG
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        flat = Image.new('RGB', image.size, 'white')
+        flat.paste(image, mask=image.getchannel('A'))
+        return flat
+    return image.convert('RGB')
+
+
+def encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == 'jpeg':
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def store(data, fmt):
+    """Save variant bytes under their hash; identical bytes are stored once."""
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    name = f'{VARIANT_DIR}/{digest[:2]}/{digest}.{EXTENSIONS[fmt]}'
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(data))
+
+
+def render_preset(image, preset):
+    """{'spec', 'webp', 'jpeg'} for one preset. Widths beyond the original are skipped, bar the smallest."""
+    spec = presets()[preset]
+    ratio = spec['aspect'][1] / spec['aspect'][0]
+    widths = [width for width in spec['widths'] if width <= image.width] or spec['widths'][:1]
+    entry = {'spec': signature(preset), **{fmt: [] for fmt in FORMATS}}
+    for width in widths:
+        resized = ImageOps.fit(image, (width, round(width * ratio)), Image.Resampling.LANCZOS)
+        for fmt in FORMATS:
+            entry[fmt].append([width, store(encode(resized, fmt), fmt)])
+    return entry
+
+
+def generate(source, wanted, force=False, owner=None):
+    """
+    Render the outdated presets of one original and record them. owner is
+    the (model label, pk) whose field holds it. Returns the presets rendered.
+    """
+    from .models import ImageVariants
+
+    record, _created = ImageVariants.objects.get_or_create(source=source)
+    variants = dict(record.variants)
+    todo = list(wanted) if force else stale_presets(variants, wanted)
+    if todo:
+        try:
+            with default_storage.open(source) as fh:
+                image = load(fh, [presets()[preset] for preset in todo])
+                for preset in todo:
+                    variants[preset] = render_preset(image, preset)
+        except (OSError, Image.DecompressionBombError) as exc:
+            # Missing or not an image: remember, so renders stop queueing it
+            logger.warning('No variants for %s: %s', source, exc)
+            for preset in todo:
+                variants[preset] = {'spec': signature(preset), 'failed': True}
+        record.variants = variants
+        record.save(update_fields=['variants', 'updated_at'])
+    cache.set(_cache_key(source), variants, None)
+    if todo and owner:
+        label, pk = owner
+        variants_rendered.send(sender=apps.get_model(label), pk=pk, source=source)
+    return todo
+
+
+class VariantWorker:
+    """A daemon thread rendering queued originals in order; each original is queued at most once at a time."""
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, source, wanted, owner=None):
+        with self.lock:
+            if source in self.pending:
+                return
+            self.pending.add(source)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='image-variants', daemon=True)
+                self.thread.start()
+        self.jobs.put((source, tuple(wanted), owner))
+
+    def run(self):
+        while True:
+            source, wanted, owner = self.jobs.get()
+            try:
+                generate(source, wanted, owner=owner)
+            except Exception:
+                logger.exception('Rendering variants of %s failed', source)
+            finally:
+                connection.close()   # this thread's own connection; reopened by the next job
+                with self.lock:
+                    self.pending.discard(source)
+                self.jobs.task_done()
+
+    def join(self):
+        """Wait until everything queued so far is rendered."""
+        self.jobs.join()
+
+
+worker = VariantWorker()
+
+
+def prune(sources):
+    """
+    Delete records of originals not in `sources`, then variant files no
+    record refers to. Returns (records deleted, files deleted).
+    """
+    from .models import ImageVariants
+
+    unused = [pk for pk, source in ImageVariants.objects.values_list('pk', 'source') if source not in sources]
+    for start in range(0, len(unused), 500):
+        ImageVariants.objects.filter(pk__in=unused[start:start + 500]).delete()
+
+    referenced = {
+        name
+        for variants in ImageVariants.objects.values_list('variants', flat=True).iterator()
+        for entry in variants.values()
+        for fmt in FORMATS
+        for _width, name in entry.get(fmt, ())
+    }
+    removed = 0
+    if default_storage.exists(VARIANT_DIR):
+        cutoff = timezone.now() - PRUNE_GRACE
+        for folder in default_storage.listdir(VARIANT_DIR)[0]:
+            for filename in default_storage.listdir(f'{VARIANT_DIR}/{folder}')[1]:
+                name = f'{VARIANT_DIR}/{folder}/{filename}'
+                if name not in referenced and default_storage.get_modified_time(name) < cutoff:
+                    default_storage.delete(name)
+                    removed += 1
+    return len(unused), removed
@@ -0,0 +1,25 @@
+"""
+Queue new uploads for rendering once the saving transaction commits.
+Saves that leave the image alone queue nothing new: the worker finds the
+variants up to date and returns.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from .pipeline import IMAGE_FIELDS, worker
+
+
+def image_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    for (label, field_name), wanted in IMAGE_FIELDS.items():
+        if label != sender._meta.label or (update_fields is not None and field_name not in update_fields):
+            continue
+        name = getattr(instance, field_name).name
+        if name:
+            owner = (label, instance.pk)
+            transaction.on_commit(lambda name=name, wanted=wanted, owner=owner: worker.submit(name, wanted, owner))
+
+
+for label in {label for label, _field in IMAGE_FIELDS}:
+    post_save.connect(image_saved, sender=label, dispatch_uid=f'image-variants:{label}')
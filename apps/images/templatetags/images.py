@@ -0,0 +1,40 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from apps.images.pipeline import cached_variants, presets, presets_for, stale_presets, worker
+
+register = template.Library()
+
+
+def _srcset(variants):
+    return ', '.join(f'{default_storage.url(name)} {width}w' for width, name in variants)
+
+
+@register.simple_tag
+def responsive_image(fieldfile, preset, alt='', css_class='', lazy=True):
+    """
+    <picture> with WebP and JPEG srcsets of an image field at `preset`, or
+    the original in a plain <img> until its variants exist. Queues the
+    image for rendering if the preset is missing or outdated.
+
+        {% responsive_image stall.image 'card' alt=stall.name %}
+    """
+    if not fieldfile:
+        return ''
+    variants = cached_variants(fieldfile.name)
+    wanted = tuple(dict.fromkeys(presets_for(fieldfile) + (preset,)))
+    if stale_presets(variants, wanted):
+        worker.submit(fieldfile.name, wanted, (fieldfile.instance._meta.label, fieldfile.instance.pk))
+
+    loading = 'lazy' if lazy else 'eager'
+    entry = variants.get(preset)
+    if not entry or entry.get('failed'):
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}">', fieldfile.url, alt, css_class, loading)
+    sizes = presets()[preset]['sizes']
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}" decoding="async"></picture>',
+        _srcset(entry['webp']), sizes,
+        default_storage.url(entry['jpeg'][-1][1]), _srcset(entry['jpeg']), sizes, alt, css_class, loading,
+    )
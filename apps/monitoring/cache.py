@@ -0,0 +1,21 @@
+"""
+Cache backends that count hits and misses for the request metrics.
+"""
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import record_cache_access
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """Mix into any cache backend class; get_many() goes through get()."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        record_cache_access(value is not _MISSING)
+        return default if value is _MISSING else value
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
@@ -0,0 +1,44 @@
+"""
+Browse stored request profiles.
+Usage:
+    python manage.py profiles                                # profiles per URL name
+    python manage.py profiles place_order --top 25           # hottest functions
+    python manage.py profiles admin_dashboard --folded out.folded   # for flamegraph.pl / speedscope
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.monitoring.profiling import ProfileStore, profile_settings, to_folded, top_functions
+
+
+class Command(BaseCommand):
+    help = 'Aggregate sampled request profiles per URL name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('view', nargs='?', help='URL name to aggregate')
+        parser.add_argument('--top', type=int, default=20, help='Functions to list')
+        parser.add_argument('--folded', help='Write merged collapsed stacks to this file')
+
+    def handle(self, *args, **options):
+        config = profile_settings()
+        store = ProfileStore(config['directory'], config['keep'])
+        views = store.views()
+        view = options['view']
+        if not view:
+            if not views:
+                self.stdout.write(f"No profiles in {config['directory']}")
+            for name, count in views.items():
+                self.stdout.write(f'  {name:<30} {count:>4} profiles')
+            return
+        if view not in views:
+            raise CommandError(f'No profiles for "{view}"')
+
+        stacks, requests = store.load(view)
+        total = sum(stacks.values()) or 1
+        if options['folded']:
+            with open(options['folded'], 'w') as fh:
+                fh.write(to_folded(stacks))
+            self.stdout.write(self.style.SUCCESS(f"💾 Collapsed stacks written to {options['folded']}"))
+        self.stdout.write(f'{view}: {total} samples from {requests} requests\n')
+        self.stdout.write(f"{'self':>7} {'total':>7}  function")
+        for frame, own, inclusive in top_functions(stacks, options['top']):
+            self.stdout.write(f'{own * 100 / total:>6.1f}% {inclusive * 100 / total:>6.1f}%  {frame}')
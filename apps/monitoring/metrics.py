@@ -0,0 +1,174 @@
+"""
+In-process request metrics.
+Each thread writes to its own shard, so recording a request never takes
+a shared lock; shards are only merged when /metrics is scraped. When a
+thread exits its shard is folded into one aggregate, so thread-per-request
+servers don't pile up shards.
+"""
+import threading
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+
+# Latency histogram upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stats for the request being handled on this thread/task, if any
+current_request = ContextVar('current_request_stats', default=None)
+
+
+class RequestStats:
+    """Counters gathered while one request runs."""
+    __slots__ = ('queries', 'db_seconds', 'db_locked', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.db_locked = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class ViewMetrics:
+    __slots__ = (
+        'requests', 'buckets', 'latency_sum', 'queries', 'db_seconds', 'db_locked', 'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last bucket is +Inf
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.db_locked = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.latency_sum += other.latency_sum
+        self.queries += other.queries
+        self.db_seconds += other.db_seconds
+        self.db_locked += other.db_locked
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+
+
+class _ThreadSentinel:
+    """Kept in a thread's local storage; collected when the thread exits."""
+    __slots__ = ('__weakref__',)
+
+
+def _merge_into(merged, shard):
+    for key, metrics in shard.copy().items():
+        merged.setdefault(key, ViewMetrics()).merge(metrics)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}  # folded shards of threads that have exited
+        self._shards_lock = threading.Lock()  # only taken when a thread starts or exits
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._local.sentinel = sentinel = _ThreadSentinel()
+            with self._shards_lock:
+                self._shards.append(shard)
+            weakref.finalize(sentinel, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._shards = [other for other in self._shards if other is not shard]
+            _merge_into(self._retired, shard)
+
+    def observe(self, view, method, status, seconds, stats):
+        key = (view, method, str(status))
+        shard = self._shard()
+        metrics = shard.get(key)
+        if metrics is None:
+            metrics = shard[key] = ViewMetrics()
+        metrics.requests += 1
+        metrics.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        metrics.latency_sum += seconds
+        metrics.queries += stats.queries
+        metrics.db_seconds += stats.db_seconds
+        metrics.db_locked += stats.db_locked
+        metrics.cache_hits += stats.cache_hits
+        metrics.cache_misses += stats.cache_misses
+
+    def snapshot(self):
+        """Merge every thread's shard into {(view, method, status): ViewMetrics}."""
+        merged = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+            _merge_into(merged, self._retired)
+        for shard in shards:
+            _merge_into(merged, shard)
+        return merged
+
+    def reset(self):
+        with self._shards_lock:
+            self._retired.clear()
+            for shard in self._shards:
+                shard.clear()
+
+
+registry = MetricsRegistry()
+
+
+def record_cache_access(hit):
+    stats = current_request.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def _labels(view, method, status, **extra):
+    pairs = dict(view=view, method=method, status=status, **extra)
+    return ','.join(f'{name}="{value}"' for name, value in pairs.items())
+
+
+def render_prometheus(snapshot):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        '# HELP smartfood_requests_total Requests handled, by URL name.',
+        '# TYPE smartfood_requests_total counter',
+    ]
+    ordered = sorted(snapshot.items())
+    for (view, method, status), m in ordered:
+        lines.append(f'smartfood_requests_total{{{_labels(view, method, status)}}} {m.requests}')
+
+    lines += [
+        '# HELP smartfood_request_duration_seconds Request latency, by URL name.',
+        '# TYPE smartfood_request_duration_seconds histogram',
+    ]
+    for (view, method, status), m in ordered:
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), m.buckets):
+            cumulative += count
+            lines.append(
+                f'smartfood_request_duration_seconds_bucket{{{_labels(view, method, status, le=bound)}}} {cumulative}'
+            )
+        lines.append(f'smartfood_request_duration_seconds_sum{{{_labels(view, method, status)}}} {m.latency_sum:.6f}')
+        lines.append(f'smartfood_request_duration_seconds_count{{{_labels(view, method, status)}}} {m.requests}')
+
+    counters = [
+        ('smartfood_db_queries_total', 'Database queries executed.', 'queries', 'd'),
+        ('smartfood_db_duration_seconds_total', 'Time spent in database queries.', 'db_seconds', '.6f'),
+        ('smartfood_db_locked_total', 'Queries that failed with "database is locked".', 'db_locked', 'd'),
+        ('smartfood_cache_hits_total', 'Cache lookups that found a value.', 'cache_hits', 'd'),
+        ('smartfood_cache_misses_total', 'Cache lookups that found nothing.', 'cache_misses', 'd'),
+    ]
+    for name, help_text, attr, fmt in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (view, method, status), m in ordered:
+            lines.append(f'{name}{{{_labels(view, method, status)}}} {getattr(m, attr):{fmt}}')
+    return '\n'.join(lines) + '\n'
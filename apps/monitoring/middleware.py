@@ -0,0 +1,52 @@
+import time
+from contextlib import ExitStack
+
+from django.db import OperationalError, connections
+
+from .metrics import RequestStats, current_request, registry
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, DB queries/time and cache hits/misses per URL name.
+    Place it first in MIDDLEWARE so the timing covers the whole stack.
+    Server errors caused by SQLite lock contention are marked with an
+    X-DB-Locked header, so load tests can tell them apart without DEBUG
+    error pages.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+
+        def record_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            except OperationalError as exc:
+                if 'database is locked' in str(exc):
+                    stats.db_locked += 1
+                raise
+            finally:
+                stats.queries += 1
+                stats.db_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or '<unresolved>'
+        registry.observe(view, request.method, response.status_code, elapsed, stats)
+        if stats.db_locked and response.status_code >= 500:
+            response['X-DB-Locked'] = str(stats.db_locked)
+        return response
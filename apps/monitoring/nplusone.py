@@ -0,0 +1,136 @@
+"""
+N+1 query detection.
+Queries are fingerprinted by their normalized SQL shape (literals and
+parameter lists stripped). When one shape runs more than `threshold`
+times in a request or a `detect_n_plus_one()` block, it is reported
+together with the template line or Python frames that issued it.
+Usage in a test or shell:
+    with detect_n_plus_one(threshold=3):
+        client.get('/stalls/')
+"""
+import logging
+import re
+import sys
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class NPlusOneDetected(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape: no literals, IN (...) lists collapsed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _project_frame(filename):
+    base = str(settings.BASE_DIR)
+    return filename.startswith(base) and 'site-packages' not in filename and '/apps/monitoring/' not in filename
+
+
+def query_origin(stack_depth=3):
+    """Where the current query came from: the template line if rendering, else project frames."""
+    from django.template.base import Node
+
+    frame = sys._getframe(1)
+    python_frames = []
+    while frame is not None:
+        node = frame.f_locals.get('self') if frame.f_code.co_name == 'render_annotated' else None
+        if isinstance(node, Node) and getattr(node, 'origin', None) and getattr(node, 'token', None):
+            return f'{node.origin.template_name or node.origin.name}:{node.token.lineno} {node.token.contents[:60]}'
+        filename = frame.f_code.co_filename
+        if len(python_frames) < stack_depth and _project_frame(filename):
+            python_frames.append(f'{filename[len(str(settings.BASE_DIR)) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return ' <- '.join(python_frames) or '<unknown>'
+
+
+class QueryShapeTracker:
+    """execute_wrapper counting statements per shape and where each repeat came from."""
+
+    def __init__(self):
+        self.shapes = Counter()
+        self.origins = defaultdict(Counter)
+        self.samples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = normalize_sql(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] > 1:
+            self.origins[shape][query_origin()] += 1
+        else:
+            self.samples[shape] = sql
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        """[(shape, count, [(origin, count), ...])] for shapes run more than `threshold` times."""
+        return [
+            (shape, count, self.origins[shape].most_common(3))
+            for shape, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+    def report(self, threshold, label=''):
+        lines = [f'Possible N+1 queries{f" in {label}" if label else ""}:']
+        for shape, count, origins in self.repeated(threshold):
+            lines.append(f'  {count}x {shape[:200]}')
+            lines.extend(f'      {n}x from {origin}' for origin, n in origins)
+        return '\n'.join(lines)
+
+
+@contextmanager
+def track_queries(using=None):
+    tracker = QueryShapeTracker()
+    with ExitStack() as stack:
+        for alias in ([using] if using else connections):
+            stack.enter_context(connections[alias].execute_wrapper(tracker))
+        yield tracker
+
+
+@contextmanager
+def detect_n_plus_one(threshold=DEFAULT_THRESHOLD, action='raise', label='', using=None):
+    """Raise NPlusOneDetected (or log, with action='warn') if any query shape repeats."""
+    with track_queries(using) as tracker:
+        yield tracker
+    if tracker.repeated(threshold):
+        message = tracker.report(threshold, label)
+        if action == 'raise':
+            raise NPlusOneDetected(message)
+        logger.warning(message)
+
+
+class NPlusOneMiddleware:
+    """
+    Development aid: active only with DEBUG on. Configure with
+    NPLUSONE_THRESHOLD (default 5) and NPLUSONE_ACTION ('warn' or 'raise').
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'NPLUSONE_THRESHOLD', DEFAULT_THRESHOLD)
+        self.action = getattr(settings, 'NPLUSONE_ACTION', 'warn')
+
+    def __call__(self, request):
+        # Template responses are rendered before they get back here, so template queries are tracked too
+        with detect_n_plus_one(self.threshold, self.action, label=f'{request.method} {request.path}'):
+            return self.get_response(request)
@@ -0,0 +1,191 @@
+"""
+Opt-in sampling profiler for requests.
+A single background thread reads the stacks of profiled request threads
+(sys._current_frames) every PROFILE_INTERVAL_MS, so the profiled code runs
+untouched. A request is profiled when it is picked by PROFILE_SAMPLE_RATE,
+or once it has run longer than PROFILE_SLOW_MS. Samples are written in
+collapsed-stack format ("frame;frame;frame count" lines, the input of
+flamegraph.pl and speedscope) to PROFILE_DIR/<url name>/, keeping the
+newest PROFILE_KEEP files per URL name.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_SUFFIX = '.folded'
+
+
+def profile_settings():
+    return {
+        'sample_rate': getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0),
+        'slow_ms': getattr(settings, 'PROFILE_SLOW_MS', None),
+        'interval': getattr(settings, 'PROFILE_INTERVAL_MS', 5) / 1000,
+        'directory': Path(getattr(settings, 'PROFILE_DIR', Path(settings.BASE_DIR) / 'profiles')),
+        'keep': getattr(settings, 'PROFILE_KEEP', 50),
+    }
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        filename = filename[len(base) + 1:]
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def collapse(frame):
+    """Outermost-first 'a;b;c' for a frame's stack."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class ActiveRequest:
+    __slots__ = ('started', 'always', 'stacks')
+
+    def __init__(self, always):
+        self.started = time.perf_counter()
+        self.always = always
+        self.stacks = Counter()
+
+
+class Sampler:
+    """Samples the stacks of registered threads from one daemon thread."""
+
+    def __init__(self, interval, slow_seconds):
+        self.interval = interval
+        self.slow_seconds = slow_seconds
+        self.active = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def register(self, always):
+        request = ActiveRequest(always)
+        with self.lock:
+            self.active[threading.get_ident()] = request
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='request-sampler', daemon=True)
+                self.thread.start()
+        return request
+
+    def unregister(self):
+        with self.lock:
+            self.active.pop(threading.get_ident(), None)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self.lock:
+                due = [
+                    (ident, request) for ident, request in self.active.items()
+                    if request.always or (self.slow_seconds is not None and now - request.started >= self.slow_seconds)
+                ]
+            if not due:
+                continue
+            frames = sys._current_frames()
+            samples = [(ident, request, collapse(frames[ident])) for ident, request in due if ident in frames]
+            del frames
+            with self.lock:
+                # Skip requests that finished meanwhile; their stacks are being saved
+                for ident, request, stack in samples:
+                    if self.active.get(ident) is request:
+                        request.stacks[stack] += 1
+
+
+class ProfileStore:
+    """Per-URL-name directories of collapsed-stack files, pruned to `keep` each."""
+
+    def __init__(self, directory, keep=50):
+        self.directory = Path(directory)
+        self.keep = keep
+
+    def _view_dir(self, view):
+        return self.directory / view.replace(':', '__').replace('/', '_')
+
+    def save(self, view, stacks, *, path='', elapsed_ms=0.0):
+        folder = self._view_dir(view)
+        folder.mkdir(parents=True, exist_ok=True)
+        target = folder / f'{time.time_ns()}{PROFILE_SUFFIX}'
+        lines = [f'# view={view} path={path} elapsed_ms={elapsed_ms:.1f} samples={sum(stacks.values())}']
+        lines += [f'{stack} {count}' for stack, count in stacks.most_common()]
+        target.write_text('\n'.join(lines) + '\n')
+        for old in sorted(folder.glob(f'*{PROFILE_SUFFIX}'))[:-self.keep]:
+            old.unlink(missing_ok=True)
+        return target
+
+    def views(self):
+        """{url name: number of stored profiles}"""
+        if not self.directory.exists():
+            return {}
+        return {
+            folder.name.replace('__', ':'): len(list(folder.glob(f'*{PROFILE_SUFFIX}')))
+            for folder in sorted(self.directory.iterdir()) if folder.is_dir()
+        }
+
+    def load(self, view):
+        """Merge every stored profile for `view` into one Counter of stacks."""
+        merged = Counter()
+        requests = 0
+        for profile in sorted(self._view_dir(view).glob(f'*{PROFILE_SUFFIX}')):
+            requests += 1
+            for line in profile.read_text().splitlines():
+                if line and not line.startswith('#'):
+                    stack, _, count = line.rpartition(' ')
+                    merged[stack] += int(count)
+        return merged, requests
+
+
+def top_functions(stacks, limit=20):
+    """[(frame, self samples, total samples)] ordered by self time."""
+    own = Counter()
+    total = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(frame, n, total[frame]) for frame, n in own.most_common(limit)]
+
+
+def to_folded(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """Only loaded when PROFILE_SAMPLE_RATE or PROFILE_SLOW_MS is set."""
+
+    def __init__(self, get_response):
+        config = profile_settings()
+        if not config['sample_rate'] and config['slow_ms'] is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config['sample_rate']
+        slow_seconds = config['slow_ms'] / 1000 if config['slow_ms'] is not None else None
+        self.sampler = Sampler(config['interval'], slow_seconds)
+        self.store = ProfileStore(config['directory'], config['keep'])
+
+    def __call__(self, request):
+        active = self.sampler.register(always=random.random() < self.sample_rate)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.sampler.unregister()
+        if active.stacks:
+            match = request.resolver_match
+            self.store.save(
+                (match.view_name if match else None) or 'unresolved', active.stacks,
+                path=request.path, elapsed_ms=(time.perf_counter() - active.started) * 1000,
+            )
+        return response
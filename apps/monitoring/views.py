@@ -0,0 +1,42 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.shortcuts import render
+
+from .metrics import registry, render_prometheus
+from .profiling import ProfileStore, profile_settings, to_folded, top_functions
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, staff only"""
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Staff only')
+    return HttpResponse(render_prometheus(registry.snapshot()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def profiles(request):
+    """Stored request profiles, aggregated per URL name"""
+    config = profile_settings()
+    store = ProfileStore(config['directory'], config['keep'])
+    views = store.views()
+    selected = request.GET.get('view')
+    context = {'views': views, 'selected': selected, 'config': config}
+    if selected:
+        if selected not in views:
+            raise Http404('No profiles for this view')
+        stacks, requests = store.load(selected)
+        if request.GET.get('format') == 'folded':
+            response = HttpResponse(to_folded(stacks), content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{selected.replace(":", "_")}.folded"'
+            return response
+        total = sum(stacks.values()) or 1
+        context.update({
+            'requests': requests,
+            'samples': sum(stacks.values()),
+            'functions': [
+                {'frame': frame, 'own': own, 'total': inclusive,
+                 'own_pct': round(own * 100 / total, 1), 'total_pct': round(inclusive * 100 / total, 1)}
+                for frame, own, inclusive in top_functions(stacks, limit=40)
+            ],
+        })
+    return render(request, 'monitoring/profiles.html', context)
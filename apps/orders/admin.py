@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import Order, OrderItem, DemandForecast, OrderAnalytics
+from django.contrib import admin, messages
+from django.utils import timezone
+from .models import ArchivedOrder, Order, OrderItem, DemandForecast, ForecastState, OrderAnalytics
 
 
 class OrderItemInline(admin.TabularInline):
@@ -10,33 +11,87 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['id', 'token_number', 'user', 'stall', 'break_slot', 'pickup_date', 'status', 'total_amount', 'created_at']
+    list_display = ['id', 'token_number', 'user', 'stall', 'break_slot', 'pickup_date', 'status', 'items',
+                    'total_quantity', 'prep_minutes', 'total_amount', 'created_at']
     list_filter = ['status', 'break_slot', 'pickup_date', 'stall']
     search_fields = ['token_number', 'user__username', 'stall__name']
     inlines = [OrderItemInline]
     readonly_fields = ['token_number', 'created_at', 'updated_at']
     actions = ['mark_confirmed', 'mark_preparing', 'mark_ready', 'mark_completed']
+    list_select_related = ['user', 'stall']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_item_summary()
+
+    @admin.display(description='Items')
+    def items(self, obj):
+        names = ', '.join(f'{item.menu_item.name} ×{item.quantity}' for item in obj.preview_items)
+        return f'{names} +{obj.extra_item_count} more' if obj.extra_item_count else names
+
+    @admin.display(description='Qty', ordering='total_quantity')
+    def total_quantity(self, obj):
+        return obj.total_quantity or 0
+
+    @admin.display(description='Prep (min)', ordering='prep_minutes')
+    def prep_minutes(self, obj):
+        return obj.prep_minutes or 0
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Keep the denormalized line snapshot in step with edited items
+        form.instance.snapshot_lines()
+
+    def get_readonly_fields(self, request, obj=None):
+        # A cancelled order has released its stock, so it stays cancelled
+        if obj and obj.status == 'cancelled':
+            return self.readonly_fields + ['status']
+        return self.readonly_fields
+
+    def _mark(self, request, queryset, status):
+        skipped = queryset.filter(status='cancelled').count()
+        queryset.exclude(status='cancelled').update(status=status, updated_at=timezone.now())
+        if skipped:
+            self.message_user(request, f"Skipped {skipped} cancelled order(s); they cannot be reopened.",
+                              messages.WARNING)
 
     def mark_confirmed(self, request, queryset):
-        queryset.update(status='confirmed')
+        self._mark(request, queryset, 'confirmed')
     mark_confirmed.short_description = "Mark as Confirmed"
 
     def mark_preparing(self, request, queryset):
-        queryset.update(status='preparing')
+        self._mark(request, queryset, 'preparing')
     mark_preparing.short_description = "Mark as Preparing"
 
     def mark_ready(self, request, queryset):
-        queryset.update(status='ready')
+        self._mark(request, queryset, 'ready')
     mark_ready.short_description = "Mark as Ready for Pickup"
 
     def mark_completed(self, request, queryset):
-        queryset.update(status='completed')
+        self._mark(request, queryset, 'completed')
     mark_completed.short_description = "Mark as Completed"
 
 
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'token_number', 'user', 'stall', 'break_slot', 'pickup_date', 'status', 'total_amount', 'archived_at']
+    list_filter = ['status', 'stall']
+    search_fields = ['token_number', 'user__username']
+    date_hierarchy = 'pickup_date'
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(DemandForecast)
 class DemandForecastAdmin(admin.ModelAdmin):
-    list_display = ['stall', 'break_slot', 'forecast_date', 'predicted_quantity', 'actual_quantity', 'confidence_score']
+    list_display = ['stall', 'menu_item', 'break_slot', 'forecast_date', 'predicted_quantity',
+                    'lower_quantity', 'upper_quantity', 'actual_quantity', 'confidence_score']
+    list_filter = ['stall', 'break_slot']
+
+
+@admin.register(ForecastState)
+class ForecastStateAdmin(admin.ModelAdmin):
+    list_display = ['stall', 'menu_item', 'break_slot', 'level', 'trend', 'alpha', 'gamma', 'mse', 'last_date']
     list_filter = ['stall', 'break_slot']
 
 
@@ -2,40 +2,39 @@
 AI-based demand prediction module using simple statistical analysis.
 This uses historical order data to predict future demand patterns.
 """
-from datetime import date, timedelta
+import random
+import time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
 from collections import defaultdict
+from django.core.cache import cache
 from django.db.models import Count, Sum, Avg
+from django.utils import timezone
 
 
-def predict_demand_for_slot(stall_id, break_slot, target_date):
-    """
-    Predict demand for a given stall, break slot, and date.
-    Uses weighted moving average of historical data.
-    Returns predicted order count and confidence score.
-    """
-    from apps.orders.models import Order
+WEEK_WEIGHTS = [4, 3, 2, 1]  # same weekday 1..4 weeks back, most recent first
+SLOT_CAPACITY = 50  # orders a stall can serve comfortably per slot
+FORECAST_STATUSES = ['completed', 'ready', 'confirmed', 'preparing']
 
-    # Get last 4 weeks of same day orders
-    target_day = target_date.weekday()
-    past_data = []
+# Slot recommendation
+PROJECTION_TTL = 30            # seconds a stall's projected slot loads are reused
+ARRIVAL_CURVE_TTL = 6 * 3600   # order lead-time history changes slowly
+NEAR_EQUAL_ORDERS = max(3, SLOT_CAPACITY // 10)  # slots this close count as ties
+RECOMMENDATION_UPTAKE = 0.3    # expected orders per recommendation shown
 
-    for weeks_back in range(1, 5):
-        past_date = target_date - timedelta(weeks=weeks_back)
-        count = Order.objects.filter(
-            stall_id=stall_id,
-            break_slot=break_slot,
-            pickup_date=past_date,
-            status__in=['completed', 'ready', 'confirmed', 'preparing']
-        ).count()
-        past_data.append(count)
 
+def weighted_average_forecast(past_data):
+    """
+    Predict from same-weekday counts, most recent first, using a weighted
+    moving average. Returns predicted order count and confidence score.
+    Pure function, shared by predict_demand_for_slot and the backtester.
+    """
     if not any(past_data):
         return 0, 0.0
 
     # Weighted average (more recent = higher weight)
-    weights = [4, 3, 2, 1]
-    weighted_sum = sum(d * w for d, w in zip(past_data, weights))
-    total_weight = sum(weights[:len(past_data)])
+    weighted_sum = sum(d * w for d, w in zip(past_data, WEEK_WEIGHTS))
+    total_weight = sum(WEEK_WEIGHTS[:len(past_data)])
     predicted = round(weighted_sum / total_weight)
 
     # Confidence based on data consistency
@@ -53,6 +52,30 @@ def predict_demand_for_slot(stall_id, break_slot, target_date):
     return predicted, round(confidence, 2)
 
 
+def predict_demand_for_slot(stall_id, break_slot, target_date):
+    """
+    Predict demand for a given stall, break slot, and date.
+    Uses weighted moving average of historical data.
+    Returns predicted order count and confidence score.
+    """
+    from apps.orders.models import Order
+
+    # Get last 4 weeks of same day orders
+    past_data = []
+
+    for weeks_back in range(1, len(WEEK_WEIGHTS) + 1):
+        past_date = target_date - timedelta(weeks=weeks_back)
+        count = Order.objects.filter(
+            stall_id=stall_id,
+            break_slot=break_slot,
+            pickup_date=past_date,
+            status__in=FORECAST_STATUSES
+        ).count()
+        past_data.append(count)
+
+    return weighted_average_forecast(past_data)
+
+
 def get_peak_hours_analysis(stall_id, days=30):
     """
     Analyze peak hours for a stall over the past N days.
@@ -76,6 +99,16 @@ def get_peak_hours_analysis(stall_id, days=30):
     return result, peak_slots
 
 
+def congestion_level(count):
+    ratio = count / SLOT_CAPACITY
+    if ratio < 0.4:
+        return 'low'
+    elif ratio < 0.75:
+        return 'medium'
+    else:
+        return 'high'
+
+
 def get_slot_congestion_level(stall_id, break_slot, pickup_date):
     """
     Returns congestion level: low, medium, high
@@ -83,32 +116,140 @@ def get_slot_congestion_level(stall_id, break_slot, pickup_date):
     """
     from apps.orders.models import Order
 
-    MAX_CAPACITY = 50  # configurable
     current_count = Order.objects.filter(
         stall_id=stall_id,
         break_slot=break_slot,
         pickup_date=pickup_date,
         status__in=['pending', 'confirmed', 'preparing']
     ).count()
+    return congestion_level(current_count), current_count
 
-    ratio = current_count / MAX_CAPACITY
-    if ratio < 0.4:
-        return 'low', current_count
-    elif ratio < 0.75:
-        return 'medium', current_count
-    else:
-        return 'high', current_count
 
+def slot_start(pickup_date, break_slot):
+    return timezone.make_aware(datetime.combine(pickup_date, datetime.strptime(break_slot, '%H:%M').time()))
 
-def get_recommended_slot(stall_id, pickup_date):
-    """Recommend the least congested slot for a given date."""
-    from apps.orders.models import BREAK_SLOT_CHOICES
 
-    slot_loads = []
-    for slot_value, slot_label in BREAK_SLOT_CHOICES:
-        level, count = get_slot_congestion_level(stall_id, slot_value, pickup_date)
-        slot_loads.append((slot_value, slot_label, level, count))
+def get_arrival_curves(stall_id, today):
+    """
+    Per slot, the sorted lead times (seconds between ordering and slot
+    start) of the stall's orders over the past four weeks. The share of
+    lead times >= t is the share of a slot's orders usually placed by the
+    time t seconds remain.
+    """
+    from apps.orders.models import Order
+
+    key = f'arrival-curve:{stall_id}:{today}'
+    curves = cache.get(key)
+    if curves is None:
+        curves = defaultdict(list)
+        orders = Order.objects.filter(
+            stall_id=stall_id,
+            pickup_date__gte=today - timedelta(weeks=len(WEEK_WEIGHTS)),
+            pickup_date__lt=today,
+        ).exclude(status='cancelled').values_list('pickup_date', 'break_slot', 'created_at')
+        for pickup_date, break_slot, created_at in orders.iterator():
+            curves[break_slot].append((slot_start(pickup_date, break_slot) - created_at).total_seconds())
+        curves = {slot: sorted(leads) for slot, leads in curves.items()}
+        cache.set(key, curves, ARRIVAL_CURVE_TTL)
+    return curves
+
+
+def arrived_share(leads, seconds_left):
+    """Share of a slot's orders usually placed with `seconds_left` still to go."""
+    if not leads:
+        return 1.0
+    return (len(leads) - bisect_left(leads, seconds_left)) / len(leads)
 
-    # Sort by count ascending - recommend least busy
-    slot_loads.sort(key=lambda x: x[3])
+
+def project_slot_loads(stall_id, pickup_date, now=None):
+    """
+    Expected final order count per slot: orders so far plus the forecast
+    share still to arrive (the "pickup" method). One grouped query for the
+    current counts and one for the same weekday over the past four weeks;
+    cached for PROJECTION_TTL seconds.
+    """
+    from apps.orders.models import BREAK_SLOT_CHOICES, Order
+
+    key = f'slot-projection:{stall_id}:{pickup_date}'
+    projection = cache.get(key)
+    if projection is not None:
+        return projection
+
+    now = now or timezone.now()
+    current = dict(
+        Order.objects.filter(stall_id=stall_id, pickup_date=pickup_date).exclude(status='cancelled')
+        .values_list('break_slot').annotate(n=Count('id')).order_by()
+    )
+    past_dates = [pickup_date - timedelta(weeks=weeks) for weeks in range(1, len(WEEK_WEIGHTS) + 1)]
+    history = defaultdict(int)
+    for break_slot, day, n in Order.objects.filter(
+        stall_id=stall_id, pickup_date__in=past_dates, status__in=FORECAST_STATUSES,
+    ).values_list('break_slot', 'pickup_date').annotate(n=Count('id')).order_by():
+        history[break_slot, day] = n
+    curves = get_arrival_curves(stall_id, timezone.localdate(now))
+
+    slots = {}
+    for slot_value, slot_label in BREAK_SLOT_CHOICES:
+        seconds_left = (slot_start(pickup_date, slot_value) - now).total_seconds()
+        forecast, _confidence = weighted_average_forecast([history[slot_value, day] for day in past_dates])
+        count = current.get(slot_value, 0)
+        arrived = arrived_share(curves.get(slot_value), seconds_left)
+        slots[slot_value] = {
+            'label': slot_label,
+            'count': count,
+            'forecast': forecast,
+            'projected': round(count + forecast * (1 - arrived)) if seconds_left > 0 else count,
+            'open': seconds_left > 0,
+        }
+    projection = {'generation': time.time_ns(), 'slots': slots}
+    cache.set(key, projection, PROJECTION_TTL)
+    return projection
+
+
+def _recommendation_key(stall_id, pickup_date, generation, slot_value):
+    return f'slot-recs:{stall_id}:{pickup_date}:{generation}:{slot_value}'
+
+
+def get_recommended_slot(stall_id, pickup_date, now=None):
+    """
+    Recommend a slot for a given date from the projected final loads.
+    Slots within NEAR_EQUAL_ORDERS of the least loaded are treated as ties and
+    one is picked at random, weighted by headroom; recommendations shown since
+    the projection was computed count towards a slot's load, so a burst of
+    visitors is spread out instead of all sent to the same slot.
+    Returns dicts sorted with the recommended slot first, then by projected load.
+    """
+    projection = project_slot_loads(stall_id, pickup_date, now)
+    generation = projection['generation']
+    slot_loads = []
+    for slot_value, info in projection['slots'].items():
+        shown = cache.get(_recommendation_key(stall_id, pickup_date, generation, slot_value), 0)
+        load = info['projected'] + RECOMMENDATION_UPTAKE * shown
+        slot_loads.append({
+            'value': slot_value,
+            'label': info['label'],
+            'count': info['count'],
+            'projected': info['projected'],
+            'load': load,
+            'level': congestion_level(info['projected']) if info['open'] else 'closed',
+            'open': info['open'],
+            'recommended': False,
+        })
+
+    candidates = [slot for slot in slot_loads if slot['open']]
+    if candidates:
+        lightest = min(slot['load'] for slot in candidates)
+        ties = [slot for slot in candidates if slot['load'] <= lightest + NEAR_EQUAL_ORDERS]
+        headroom = [max(SLOT_CAPACITY - slot['load'], 1) for slot in ties]
+        chosen = random.choices(ties, weights=headroom)[0]
+        chosen['recommended'] = True
+        key = _recommendation_key(stall_id, pickup_date, generation, chosen['value'])
+        cache.add(key, 0, PROJECTION_TTL * 2)
+        try:
+            cache.incr(key)
+        except ValueError:  # expired between add() and incr()
+            pass
+
+    # Recommended first, then least busy; started slots last
+    slot_loads.sort(key=lambda slot: (not slot['recommended'], not slot['open'], slot['projected']))
     return slot_loads
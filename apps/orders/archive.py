@@ -0,0 +1,115 @@
+"""
+Cold order archival.
+Completed and cancelled orders older than the retention window move from
+Order/OrderItem into the compact ArchivedOrder table, one day at a time
+in batched transactions. Before a day is moved its OrderAnalytics rollups
+are (re)computed from the hot and archived rows together, so rollups stay
+correct however often the archiver runs.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+# ai_demand compares against the same weekday up to four weeks back
+MIN_RETENTION_DAYS = 35
+
+
+def archivable_orders(cutoff):
+    from apps.orders.models import Order
+    return Order.objects.filter(pickup_date__lt=cutoff, status__in=ARCHIVABLE_STATUSES)
+
+
+def _rollup_rows(day):
+    from apps.orders.models import ArchivedOrder, Order
+
+    fields = ('stall_id', 'break_slot', 'status', 'total_amount', 'line_items')
+    yield from Order.objects.filter(pickup_date=day).values(*fields).iterator()
+    yield from ArchivedOrder.objects.filter(pickup_date=day).values(*fields).iterator()
+
+
+def rollup_day(day):
+    """
+    Write OrderAnalytics for every stall and slot on `day` and drop rows for
+    slots that no longer have orders. Cancelled orders are not counted.
+    """
+    from apps.orders.models import OrderAnalytics
+
+    totals = defaultdict(lambda: {'orders': 0, 'revenue': Decimal('0'), 'prep': 0})
+    for row in _rollup_rows(day):
+        if row['status'] == 'cancelled':
+            continue
+        bucket = totals[row['stall_id'], row['break_slot']]
+        bucket['orders'] += 1
+        bucket['revenue'] += row['total_amount']
+        bucket['prep'] += sum(line.get('prep', 0) * line['qty'] for line in row['line_items'])
+
+    # Same rule as get_peak_hours_analysis: a slot within 70% of the stall's busiest
+    busiest = defaultdict(int)
+    for (stall_id, _slot), bucket in totals.items():
+        busiest[stall_id] = max(busiest[stall_id], bucket['orders'])
+
+    with transaction.atomic():
+        # Slots whose orders were all cancelled (or moved) since the last rollup
+        existing = OrderAnalytics.objects.filter(date=day).values_list('pk', 'stall_id', 'break_slot')
+        stale = [pk for pk, stall_id, slot in existing if (stall_id, slot) not in totals]
+        OrderAnalytics.objects.filter(pk__in=stale).delete()
+        for (stall_id, slot), bucket in totals.items():
+            OrderAnalytics.objects.update_or_create(
+                stall_id=stall_id, date=day, break_slot=slot,
+                defaults={
+                    'total_orders': bucket['orders'],
+                    'total_revenue': bucket['revenue'],
+                    'avg_prep_time': round(bucket['prep'] / bucket['orders'], 1),
+                    'peak_hour': bucket['orders'] >= busiest[stall_id] * 0.7,
+                },
+            )
+    return len(totals)
+
+
+def _snapshot_missing_lines(orders):
+    """Fill line_items for orders placed before snapshots existed."""
+    from apps.orders.models import OrderItem
+
+    missing = [order for order in orders if not order.line_items]
+    if not missing:
+        return
+    lines = defaultdict(list)
+    items = OrderItem.objects.filter(order__in=missing).select_related('menu_item').order_by('id')
+    for item in items:
+        lines[item.order_id].append(item.as_line())
+    for order in missing:
+        order.line_items = lines[order.pk]
+
+
+def archive_batch(order_ids):
+    """Move one batch of orders into the archive. Returns the number moved."""
+    from apps.orders.models import ArchivedOrder, Order
+
+    with transaction.atomic():
+        orders = list(Order.objects.filter(pk__in=order_ids))
+        _snapshot_missing_lines(orders)
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=order.pk, user_id=order.user_id, stall_id=order.stall_id,
+                break_slot=order.break_slot, pickup_date=order.pickup_date, status=order.status,
+                total_amount=order.total_amount, special_instructions=order.special_instructions,
+                token_number=order.token_number, created_at=order.created_at, updated_at=order.updated_at,
+                line_items=order.line_items,
+            )
+            for order in orders
+        ], ignore_conflicts=True)
+        Order.objects.filter(pk__in=order_ids).delete()  # cascades to OrderItem
+    return len(orders)
+
+
+def archive_day(day, cutoff, batch_size=500):
+    """Roll up `day`, then archive its eligible orders in batches."""
+    with transaction.atomic():
+        rollup_day(day)
+    ids = list(archivable_orders(cutoff).filter(pickup_date=day).values_list('pk', flat=True))
+    moved = 0
+    for start in range(0, len(ids), batch_size):
+        moved += archive_batch(ids[start:start + batch_size])
+    return moved
@@ -0,0 +1,271 @@
+"""
+Backtesting for slot-level demand forecasts.
+History is replayed day by day. Each strategy predicts a stall's order
+count per slot using only earlier days, and the predictions are scored
+against what happened:
+- MAE and MAPE
+- how well confidence_score matches the share of near-hits (calibration)
+Stalls are independent, so each is a shard run in a process pool. Daily
+counts come from one grouped query per order table. Days older than
+SETTLED_AFTER_DAYS are cached under BACKTEST_CACHE_DIR, so repeated runs
+only query the last couple of days plus a count/max(updated_at)
+fingerprint that tells when the cached days changed.
+"""
+import hashlib
+import math
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.utils import timezone
+
+from apps.orders.ai_demand import WEEK_WEIGHTS, weighted_average_forecast
+from apps.orders.forecasting import DEMAND_STATUSES, PHI, SEASON, fit_new, smooth
+
+HIT_TOLERANCE = 0.2    # a prediction within 20% (or 1 order) of the actual is a hit
+CONFIDENCE_BINS = 5
+WARMUP_DAYS = 56       # history before the range, for lags and model fitting
+SETTLED_AFTER_DAYS = 2 # older days no longer change and are served from the cache
+
+
+# Strategies: (counts[slot, day], weekday[day], first scored day) ->
+# (predicted, confidence) for every slot and scored day. confidence may be None.
+
+def weighted_average_strategy(counts, weekday, start):
+    predicted = np.zeros((counts.shape[0], counts.shape[1] - start))
+    confidence = np.zeros_like(predicted)
+    for t in range(start, counts.shape[1]):
+        for slot in range(counts.shape[0]):
+            past = [int(counts[slot, t - 7 * weeks]) for weeks in range(1, len(WEEK_WEIGHTS) + 1) if t >= 7 * weeks]
+            predicted[slot, t - start], confidence[slot, t - start] = weighted_average_forecast(past)
+    return predicted, confidence
+
+
+def last_week_strategy(counts, weekday, start):
+    return counts[:, start - 7:counts.shape[1] - 7].astype(float), None
+
+
+def holt_winters_strategy(counts, weekday, start):
+    """Fit on the warm-up days, then predict one day ahead and update, as forecast_demand would."""
+    y = counts.astype(float)
+    observed = np.broadcast_to(counts.sum(axis=0) > 0, counts.shape).copy()
+    training = observed.copy()
+    training[:, start:] = False
+    fitted = fit_new(y, training, weekday)
+    level, trend, mse = (fitted[field][:, None] for field in ('level', 'trend', 'mse'))
+    season = fitted['season'][:, None, :]
+    alpha, beta, gamma = (fitted[field][:, None] for field in ('alpha', 'beta', 'gamma'))
+
+    predicted = np.zeros((counts.shape[0], counts.shape[1] - start))
+    confidence = np.zeros_like(predicted)
+    for t in range(start, counts.shape[1]):
+        mean = np.maximum(level + PHI * trend + season[:, :, weekday[t]], 0.0)[:, 0]
+        predicted[:, t - start] = mean
+        confidence[:, t - start] = np.clip(1 - np.sqrt(mse[:, 0]) / np.maximum(mean, 1.0), 0.0, 1.0)
+        smooth(y[:, t:t + 1], observed[:, t:t + 1], weekday[t:t + 1],
+               level, trend, season, mse, alpha, beta, gamma)
+    return predicted, confidence
+
+
+STRATEGIES = {
+    'weighted_average': weighted_average_strategy,
+    'last_week': last_week_strategy,
+    'holt_winters': holt_winters_strategy,
+}
+
+
+def score(predicted, actual, confidence=None):
+    """Error and calibration metrics for one series of (predicted, actual[, confidence])."""
+    errors = np.abs(predicted - actual)
+    ordered = actual > 0
+    hits = errors <= np.maximum(HIT_TOLERANCE * actual, 1)
+    result = {
+        'days': int(actual.size),
+        'mae': float(errors.mean()) if actual.size else None,
+        'mape': float((errors[ordered] / actual[ordered]).mean() * 100) if ordered.any() else None,
+        'bias': float((predicted - actual).mean()) if actual.size else None,
+        'hit_rate': float(hits.mean()) if actual.size else None,
+        'mean_confidence': None,
+        'calibration_error': None,
+        'bins': [],
+    }
+    if confidence is None or not actual.size:
+        return result
+
+    # Reliability table: within each confidence band, how often was it a hit?
+    bands = np.minimum((confidence * CONFIDENCE_BINS).astype(int), CONFIDENCE_BINS - 1)
+    gap = 0.0
+    for band in range(CONFIDENCE_BINS):
+        members = bands == band
+        if not members.any():
+            continue
+        stated, observed = float(confidence[members].mean()), float(hits[members].mean())
+        gap += members.sum() / actual.size * abs(stated - observed)
+        result['bins'].append({
+            'low': band / CONFIDENCE_BINS, 'days': int(members.sum()),
+            'confidence': stated, 'hit_rate': observed,
+        })
+    result['mean_confidence'] = float(confidence.mean())
+    result['calibration_error'] = gap
+    return result
+
+
+def backtest_stall(stall_id, slots, counts, first_weekday, start, strategies):
+    """
+    Worker: run `strategies` over one stall's counts (slots x days, scoring
+    from day index `start`). Days the stall sold nothing are left out of the
+    scores. Returns (per-slot results, raw arrays for pooling).
+    """
+    weekday = (np.arange(counts.shape[1]) + first_weekday) % SEASON
+    actual = counts[:, start:].astype(float)
+    open_days = actual.sum(axis=0) > 0
+    results, raw = [], {}
+    for name in strategies:
+        predicted, confidence = STRATEGIES[name](counts, weekday, start)
+        raw[name] = (
+            predicted[:, open_days], actual[:, open_days],
+            None if confidence is None else confidence[:, open_days],
+        )
+        for index, slot in enumerate(slots):
+            slot_confidence = None if confidence is None else confidence[index, open_days]
+            results.append({
+                'stall_id': stall_id, 'slot': slot, 'strategy': name,
+                **score(predicted[index, open_days], actual[index, open_days], slot_confidence),
+            })
+    return results, raw
+
+
+def selected_stall_ids(stall_ids=None):
+    from apps.stalls.models import FoodStall
+
+    stalls = FoodStall.objects.order_by('pk')
+    if stall_ids is not None:
+        stalls = stalls.filter(pk__in=stall_ids)
+    return np.array(stalls.values_list('pk', flat=True), dtype=np.int64)
+
+
+def query_counts(first_day, end, stall_ids=None):
+    """(stall ids, counts[stall, slot, day]) of orders in DEMAND_STATUSES."""
+    from django.db.models import Count
+
+    from apps.orders.models import BREAK_SLOT_CHOICES, ArchivedOrder, Order
+
+    ids = selected_stall_ids(stall_ids)
+    position = {pk: index for index, pk in enumerate(ids.tolist())}
+    slot_index = {slot: index for index, (slot, _label) in enumerate(BREAK_SLOT_CHOICES)}
+    counts = np.zeros((len(ids), len(slot_index), (end - first_day).days + 1), dtype=np.int32)
+    for model in (Order, ArchivedOrder):
+        rows = model.objects.filter(
+            pickup_date__range=(first_day, end), status__in=DEMAND_STATUSES, stall_id__in=position,
+        ).values_list('stall_id', 'break_slot', 'pickup_date').annotate(n=Count('id')).order_by()
+        for stall_id, slot, day, n in rows:
+            counts[position[stall_id], slot_index[slot], (day - first_day).days] += n
+    return ids, counts
+
+
+def counts_fingerprint(first_day, last_day, ids):
+    """
+    Row count and newest updated_at per order table over the days, so edits,
+    deletes, back-fills and archiving of cached days are noticed.
+    """
+    from django.db.models import Count, Max
+
+    from apps.orders.models import ArchivedOrder, Order
+
+    parts = []
+    for model in (Order, ArchivedOrder):
+        row = model.objects.filter(
+            pickup_date__range=(first_day, last_day), stall_id__in=ids.tolist(),
+        ).aggregate(n=Count('id'), latest=Max('updated_at'))
+        parts.append(f"{row['n']}:{row['latest'].isoformat() if row['latest'] else '-'}")
+    return '|'.join(parts)
+
+
+def _cached_counts(target, first_day, settled, ids):
+    """
+    counts for first_day..settled from the cache file, or None if it doesn't
+    cover them, was written for other stalls or its days changed since.
+    """
+    if not target.exists():
+        return None
+    with np.load(target) as cached:
+        offset = first_day.toordinal() - int(cached['first_day'])
+        days = (settled - first_day).days + 1
+        if offset < 0 or offset + days > cached['counts'].shape[2]:
+            return None
+        if 'fingerprint' not in cached.files or not np.array_equal(cached['stall_ids'], ids):
+            return None
+        cached_first = date.fromordinal(int(cached['first_day']))
+        cached_last = cached_first + timedelta(days=cached['counts'].shape[2] - 1)
+        if str(cached['fingerprint']) != counts_fingerprint(cached_first, cached_last, ids):
+            return None
+        return cached['counts'][:, :, offset:offset + days]
+
+
+def load_counts(first_day, end, stall_ids=None, cache_dir=None):
+    """
+    query_counts, with settled days (older than SETTLED_AFTER_DAYS) served
+    from an .npz file per stall selection; only newer days are re-queried.
+    The file is used only while the stall list and its days' fingerprint
+    still match.
+    """
+    settled = min(end, timezone.localdate() - timedelta(days=SETTLED_AFTER_DAYS))
+    if cache_dir is None or settled < first_day:
+        return query_counts(first_day, end, stall_ids)
+    selection = 'all' if stall_ids is None else ','.join(map(str, sorted(stall_ids)))
+    target = Path(cache_dir) / f'counts_{hashlib.sha1(selection.encode()).hexdigest()[:12]}.npz'
+
+    ids = selected_stall_ids(stall_ids)
+    counts = _cached_counts(target, first_day, settled, ids)
+    if counts is not None:
+        if settled == end:
+            return ids, counts
+        recent_ids, recent = query_counts(settled + timedelta(days=1), end, stall_ids)
+        if np.array_equal(recent_ids, ids):  # no stalls added in between
+            return ids, np.concatenate([counts, recent], axis=2)
+
+    ids, counts = query_counts(first_day, end, stall_ids)
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(target, stall_ids=ids, first_day=first_day.toordinal(),
+                        counts=counts[:, :, :(settled - first_day).days + 1],
+                        fingerprint=np.array(counts_fingerprint(first_day, settled, ids)))
+    return ids, counts
+
+
+def run_backtest(start, end, strategies=None, stall_ids=None, workers=None, cache_dir=None,
+                 warmup_days=WARMUP_DAYS):
+    """
+    Score `strategies` (default: all) on every day from `start` to `end`.
+    Returns (per stall and slot results, overall results per strategy).
+    """
+    strategies = list(strategies or STRATEGIES)
+    first_day = start - timedelta(days=warmup_days)
+    from apps.orders.models import BREAK_SLOT_CHOICES
+
+    slots = [slot for slot, _label in BREAK_SLOT_CHOICES]
+    ids, counts = load_counts(first_day, end, stall_ids, cache_dir)
+    jobs = [(int(stall_id), slots, counts[index], first_day.weekday(), warmup_days, strategies)
+            for index, stall_id in enumerate(ids)]
+
+    if workers == 1:
+        outputs = [backtest_stall(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(backtest_stall, *zip(*jobs))) if jobs else []
+
+    results = [row for shard, _raw in outputs for row in shard]
+    overall = {}
+    for name in strategies:
+        parts = [raw[name] for _shard, raw in outputs]
+        predicted = np.concatenate([p.ravel() for p, _a, _c in parts]) if parts else np.zeros(0)
+        actual = np.concatenate([a.ravel() for _p, a, _c in parts]) if parts else np.zeros(0)
+        confidence = None
+        if parts and parts[0][2] is not None:
+            confidence = np.concatenate([c.ravel() for _p, _a, c in parts])
+        overall[name] = score(predicted, actual, confidence)
+    return results, overall
+
+
+def format_metric(value, pattern='{:.2f}'):
+    return '-' if value is None or (isinstance(value, float) and math.isnan(value)) else pattern.format(value)
@@ -0,0 +1,124 @@
+"""
+View-level performance benchmarks.
+Each scenario drives one view through Django's test client against a
+seeded test database and records query count, latency percentiles and
+peak memory allocated while handling the request.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+Scenario = namedtuple('Scenario', ['name', 'method', 'user', 'url', 'data'])
+
+
+def _cart(fx):
+    return json.dumps([{'id': item_id, 'quantity': 1} for item_id in fx['menu_item_ids'][:2]])
+
+
+SCENARIOS = [
+    Scenario('home', 'get', None, lambda fx: '/', None),
+    Scenario('stall_list', 'get', None, lambda fx: '/stalls/', None),
+    Scenario('stall_detail', 'get', None, lambda fx: f"/stalls/{fx['stall_id']}/", None),
+    Scenario('place_order', 'get', 'student', lambda fx: f"/order/stall/{fx['stall_id']}/", None),
+    Scenario('place_order_post', 'post', 'student', lambda fx: f"/order/stall/{fx['stall_id']}/",
+             lambda fx: {'break_slot': '12:00', 'pickup_date': date.today().isoformat(), 'cart_data': _cart(fx)}),
+    Scenario('my_orders', 'get', 'student', lambda fx: '/orders/', None),
+    Scenario('order_detail', 'get', 'student', lambda fx: f"/order/{fx['order_id']}/", None),
+    Scenario('admin_dashboard', 'get', 'staff', lambda fx: '/admin-dashboard/', None),
+    Scenario('slot_demand_api', 'get', None, lambda fx: f"/api/slot-demand/?stall_id={fx['stall_id']}", None),
+    Scenario('order_status_api', 'get', 'student', lambda fx: f"/api/order-status/{fx['order_id']}/", None),
+    Scenario('my_orders_api', 'get', 'student', lambda fx: '/api/my-orders/', None),
+    Scenario('menu_item_api', 'get', None, lambda fx: f"/stalls/api/menu-item/{fx['menu_item_ids'][0]}/", None),
+]
+
+
+def build_fixtures():
+    """Pick the objects scenarios act on from the seeded dataset."""
+    from django.contrib.auth import get_user_model
+    from apps.orders.models import Order
+    from apps.stalls.models import FoodStall
+
+    User = get_user_model()
+    staff, _ = User.objects.get_or_create(username='bench_admin', defaults={'is_staff': True, 'role': 'admin'})
+    order = Order.objects.order_by('-created_at').select_related('user', 'stall').first()
+    stall = order.stall if order else FoodStall.objects.first()
+    return {
+        'users': {'student': order.user if order else staff, 'staff': staff},
+        'stall_id': stall.pk,
+        'order_id': order.pk if order else 0,
+        'menu_item_ids': list(stall.menu_items.filter(is_available=True).values_list('id', flat=True)),
+    }
+
+
+def _percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+def run_scenario(scenario, fixtures, iterations=50, warmup=5):
+    client = Client()
+    user = fixtures['users'].get(scenario.user)
+    if user:
+        client.force_login(user)
+    url = scenario.url(fixtures)
+    data = scenario.data(fixtures) if scenario.data else None
+
+    def request():
+        return getattr(client, scenario.method)(url, data)
+
+    for _ in range(warmup):
+        response = request()
+        if response.status_code >= 400:
+            raise RuntimeError(f'{scenario.name}: {url} returned {response.status_code}')
+
+    with CaptureQueriesContext(connection) as queries:
+        request()
+    # Read now: the next request resets the connection's query log
+    query_count = len(queries)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    request()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        request()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'queries': query_count,
+        'p50_ms': round(_percentile(samples, 50), 3),
+        'p95_ms': round(_percentile(samples, 95), 3),
+        'p99_ms': round(_percentile(samples, 99), 3),
+        'peak_alloc_kib': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance=0.25, query_tolerance=0):
+    """
+    Return a list of human-readable regressions of `results` against
+    `baseline`. Latency and allocations may grow by `tolerance` (a
+    fraction); query counts by `query_tolerance` queries.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if current['queries'] > base['queries'] + query_tolerance:
+            regressions.append(f"{name}: queries {base['queries']} -> {current['queries']}")
+        for metric in ('p95_ms', 'peak_alloc_kib'):
+            if current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {base[metric]} -> {current[metric]}')
+    return regressions
@@ -0,0 +1,147 @@
+"""
+Streaming exports of orders, line items and daily analytics.
+Rows come from values_list(...).iterator(chunk_size=...) and are encoded
+and (optionally) gzip-compressed chunk by chunk, so memory use does not
+grow with the size of the export. Archived orders are included.
+"""
+import csv
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+EXPORT_KINDS = ('orders', 'items', 'analytics')
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+CHUNK_SIZE = 2000        # rows fetched per database round trip
+FLUSH_BYTES = 64 * 1024  # encoded bytes buffered before a chunk is yielded
+
+ORDER_COLUMNS = ['id', 'token', 'student', 'stall_id', 'stall', 'pickup_date', 'break_slot',
+                 'status', 'total_amount', 'created_at', 'item_count', 'total_quantity', 'prep_minutes']
+ITEM_COLUMNS = ['order_id', 'token', 'pickup_date', 'break_slot', 'stall_id', 'menu_item_id',
+                'item', 'quantity', 'price', 'customization']
+ANALYTICS_COLUMNS = ['date', 'stall_id', 'stall', 'break_slot', 'total_orders', 'total_revenue',
+                     'avg_prep_time', 'peak_hour']
+
+
+def _filtered(queryset, stall_ids, start, end, date_field):
+    if stall_ids is not None:
+        queryset = queryset.filter(stall_id__in=stall_ids)
+    if start:
+        queryset = queryset.filter(**{f'{date_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{date_field}__lte': end})
+    return queryset
+
+
+def order_rows(stall_ids=None, start=None, end=None):
+    from apps.orders.models import ArchivedOrder, Order
+
+    fields = ('id', 'token_number', 'user__username', 'stall_id', 'stall__name', 'pickup_date',
+              'break_slot', 'status', 'total_amount', 'created_at')
+    orders = _filtered(Order.objects.with_item_totals(), stall_ids, start, end, 'pickup_date')
+    yield from orders.order_by('pickup_date', 'id').values_list(
+        *fields, 'item_count', 'total_quantity', 'prep_minutes',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+    # Archived orders keep their items only in the snapshot
+    archived = _filtered(ArchivedOrder.objects.all(), stall_ids, start, end, 'pickup_date')
+    for *row, lines in archived.order_by('pickup_date', 'id').values_list(
+        *fields, 'line_items',
+    ).iterator(chunk_size=CHUNK_SIZE):
+        yield (*row, len(lines), sum(line['qty'] for line in lines),
+               sum(line.get('prep', 0) * line['qty'] for line in lines))
+
+
+def item_rows(stall_ids=None, start=None, end=None):
+    from apps.orders.models import ArchivedOrder, OrderItem
+
+    items = OrderItem.objects.all()
+    if stall_ids is not None:
+        items = items.filter(order__stall_id__in=stall_ids)
+    if start:
+        items = items.filter(order__pickup_date__gte=start)
+    if end:
+        items = items.filter(order__pickup_date__lte=end)
+    yield from items.order_by('order_id', 'id').values_list(
+        'order_id', 'order__token_number', 'order__pickup_date', 'order__break_slot', 'order__stall_id',
+        'menu_item_id', 'menu_item__name', 'quantity', 'price_at_order', 'customization',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+    # Archived orders keep their items only in the snapshot
+    archived = _filtered(ArchivedOrder.objects.all(), stall_ids, start, end, 'pickup_date')
+    for order_id, token, pickup_date, slot, stall_id, lines in archived.order_by('id').values_list(
+        'id', 'token_number', 'pickup_date', 'break_slot', 'stall_id', 'line_items',
+    ).iterator(chunk_size=CHUNK_SIZE):
+        for line in lines:
+            yield (order_id, token, pickup_date, slot, stall_id, line['id'], line['name'],
+                   line['qty'], line['price'], line.get('customization', ''))
+
+
+def analytics_rows(stall_ids=None, start=None, end=None):
+    from apps.orders.models import OrderAnalytics
+
+    queryset = _filtered(OrderAnalytics.objects.all(), stall_ids, start, end, 'date')
+    yield from queryset.order_by('date', 'stall_id', 'break_slot').values_list(
+        'date', 'stall_id', 'stall__name', 'break_slot', 'total_orders', 'total_revenue',
+        'avg_prep_time', 'peak_hour',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+SOURCES = {
+    'orders': (ORDER_COLUMNS, order_rows),
+    'items': (ITEM_COLUMNS, item_rows),
+    'analytics': (ANALYTICS_COLUMNS, analytics_rows),
+}
+
+
+class _LineBuffer:
+    """File-like target for csv.writer that just keeps the last line."""
+
+    def write(self, value):
+        return value
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Cannot serialise {type(value).__name__}')
+
+
+def _encoded_lines(columns, rows, fmt):
+    if fmt == 'csv':
+        writer = csv.writer(_LineBuffer())
+        yield writer.writerow(columns).encode()
+        for row in rows:
+            yield writer.writerow(row).encode()
+    else:
+        for row in rows:
+            yield (json.dumps(dict(zip(columns, row)), default=_json_default) + '\n').encode()
+
+
+def stream_export(kind, fmt='csv', stall_ids=None, start=None, end=None, compress=False):
+    """Yield the export as byte chunks of roughly FLUSH_BYTES, gzip-compressed if asked."""
+    columns, source = SOURCES[kind]
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: gzip container
+    buffer = []
+    size = 0
+    for line in _encoded_lines(columns, source(stall_ids, start, end), fmt):
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_filename(kind, fmt, start=None, end=None, compress=False):
+    span = f"_{start or 'start'}_{end or 'today'}" if start or end else ''
+    return f"{kind}{span}.{fmt}{'.gz' if compress else ''}"
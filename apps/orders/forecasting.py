@@ -0,0 +1,326 @@
+"""
+Per-menu-item demand forecasting with additive Holt-Winters smoothing.
+Every (stall, menu item, slot) is a daily series of quantities sold, modelled
+with a level, a damped trend and a weekly season. All series are advanced
+together as NumPy arrays, one day per step, and the fitted state is kept in
+ForecastState so the next run only feeds in the days since the last one.
+Smoothing parameters are chosen per series by a grid search the first time
+a series is fitted (or on refit). Days on which a stall sold nothing at all
+are treated as closed and skipped.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+
+SEASON = 7
+DEMAND_STATUSES = ('completed', 'ready', 'confirmed', 'preparing')
+PHI = 0.9             # trend damping per day
+MSE_DECAY = 0.1       # weight of the newest one-step error in the running MSE
+INTERVAL_Z = 1.2816   # two-sided 80% normal interval
+PARAM_GRID = np.array([
+    (alpha, beta, gamma)
+    for alpha in (0.05, 0.15, 0.3, 0.5)
+    for beta in (0.0, 0.05)
+    for gamma in (0.05, 0.15, 0.3)
+])
+DEFAULT_PARAMS = 8    # (0.15, 0.0, 0.15), for series too short to compare candidates
+
+
+def daily_item_demand(stall_ids=None, since=None, until=None):
+    """{(stall_id, menu_item_id, slot): {date: quantity}} over live and archived orders."""
+    from apps.orders.models import ArchivedOrder, OrderItem
+
+    items = OrderItem.objects.filter(order__status__in=DEMAND_STATUSES)
+    archived = ArchivedOrder.objects.filter(status__in=DEMAND_STATUSES)
+    if stall_ids is not None:
+        items = items.filter(order__stall_id__in=stall_ids)
+        archived = archived.filter(stall_id__in=stall_ids)
+    if since:
+        items = items.filter(order__pickup_date__gte=since)
+        archived = archived.filter(pickup_date__gte=since)
+    if until:
+        items = items.filter(order__pickup_date__lte=until)
+        archived = archived.filter(pickup_date__lte=until)
+
+    demand = defaultdict(lambda: defaultdict(int))
+    rows = items.values_list(
+        'order__stall_id', 'menu_item_id', 'order__break_slot', 'order__pickup_date',
+    ).annotate(quantity=Sum('quantity')).order_by()
+    for stall_id, item_id, slot, day, quantity in rows.iterator():
+        demand[stall_id, item_id, slot][day] += quantity
+    for stall_id, slot, day, lines in archived.values_list(
+        'stall_id', 'break_slot', 'pickup_date', 'line_items',
+    ).iterator():
+        for line in lines:
+            demand[stall_id, line['id'], slot][day] += line['qty']
+    return demand
+
+
+def smooth(y, observed, weekday, level, trend, season, mse, alpha, beta, gamma):
+    """
+    Run the Holt-Winters recursions over the day columns of `y` (series x
+    days), updating the state arrays in place. State arrays carry a trailing
+    axis of parameter candidates: level, trend, mse and the parameters are
+    (series, candidates), season is (series, candidates, SEASON). Returns
+    the summed squared one-step errors per series and candidate.
+    """
+    sse = np.zeros_like(level)
+    for t in np.flatnonzero(observed.any(axis=0)):
+        mask = observed[:, t, None]
+        value = y[:, t, None]
+        day = weekday[t]
+        seasonal = season[:, :, day]
+        damped = level + PHI * trend
+        error = value - damped - seasonal
+        new_level = alpha * (value - seasonal) + (1 - alpha) * damped
+        new_trend = beta * (new_level - level) + (1 - beta) * PHI * trend
+        new_seasonal = gamma * (value - new_level) + (1 - gamma) * seasonal
+        squared = np.where(mask, error * error, 0.0)
+        sse += squared
+        mse[:] = np.where(mask, (1 - MSE_DECAY) * mse + MSE_DECAY * squared, mse)
+        trend[:] = np.where(mask, new_trend, trend)
+        level[:] = np.where(mask, new_level, level)
+        season[:, :, day] = np.where(mask, new_seasonal, seasonal)
+    return sse
+
+
+def initial_state(y, observed, weekday):
+    """
+    Level and season from each series' first SEASON observed days. Returns
+    (level, season, mse, observed days left for the recursions).
+    """
+    rank = np.cumsum(observed, axis=1)
+    warmup = observed & (rank <= SEASON)
+    counts = warmup.sum(axis=1)
+    level = (y * warmup).sum(axis=1) / np.maximum(counts, 1)
+    deviation = (y - level[:, None]) * warmup
+    weekdays = np.eye(SEASON)[weekday]
+    season = (deviation @ weekdays) / np.maximum(warmup.astype(float) @ weekdays, 1)
+    # Poisson-style floor so a short, flat warm-up doesn't give a zero-width interval
+    variance = (deviation ** 2).sum(axis=1) / np.maximum(counts - 1, 1)
+    mse = np.maximum(variance, np.maximum(level, 1.0))
+    return level, season, mse, observed & (rank > SEASON)
+
+
+def fit_new(y, observed, weekday):
+    """Initialise and fit new series, picking the best PARAM_GRID row for each."""
+    n, candidates = y.shape[0], len(PARAM_GRID)
+    level, season, mse, remaining = initial_state(y, observed, weekday)
+    level = np.repeat(level[:, None], candidates, axis=1)
+    trend = np.zeros((n, candidates))
+    season = np.repeat(season[:, None, :], candidates, axis=1)
+    mse = np.repeat(mse[:, None], candidates, axis=1)
+    alpha, beta, gamma = (np.broadcast_to(PARAM_GRID[:, k], (n, candidates)) for k in range(3))
+    sse = smooth(y, remaining, weekday, level, trend, season, mse, alpha, beta, gamma)
+
+    best = np.where(remaining.sum(axis=1) >= 2 * SEASON, sse.argmin(axis=1), DEFAULT_PARAMS)
+    rows = np.arange(n)
+    return {
+        'level': level[rows, best], 'trend': trend[rows, best], 'season': season[rows, best],
+        'mse': mse[rows, best], 'alpha': PARAM_GRID[best, 0], 'beta': PARAM_GRID[best, 1],
+        'gamma': PARAM_GRID[best, 2],
+    }
+
+
+def advance(states, y, observed, weekday):
+    """Feed new days into already fitted series with their stored parameters."""
+    def column(field):
+        return np.array([getattr(state, field) for state in states], dtype=float)[:, None]
+
+    level, trend, mse = column('level'), column('trend'), column('mse')
+    season = np.array([state.season for state in states], dtype=float)[:, None, :]
+    alpha, beta, gamma = column('alpha'), column('beta'), column('gamma')
+    smooth(y, observed, weekday, level, trend, season, mse, alpha, beta, gamma)
+    return {
+        'level': level[:, 0], 'trend': trend[:, 0], 'season': season[:, 0], 'mse': mse[:, 0],
+        'alpha': alpha[:, 0], 'beta': beta[:, 0], 'gamma': gamma[:, 0],
+    }
+
+
+def _history(stall_ids, states, refit):
+    """Demand since the earliest unfitted day of each stall (all of it for new stalls)."""
+    from apps.stalls.models import FoodStall
+
+    fitted_through = {}
+    for state in states.values():
+        known = fitted_through.get(state.stall_id)
+        fitted_through[state.stall_id] = state.last_date if known is None else min(known, state.last_date)
+    all_stalls = FoodStall.objects.all()
+    if stall_ids is not None:
+        all_stalls = all_stalls.filter(pk__in=stall_ids)
+    fresh = [pk for pk in all_stalls.values_list('pk', flat=True) if refit or pk not in fitted_through]
+
+    demand = daily_item_demand(fresh) if fresh else {}
+    if fitted_through:
+        since = min(fitted_through.values()) + timedelta(days=1)
+        demand.update(daily_item_demand(list(fitted_through), since=since))
+    return demand
+
+
+def update_states(until, stall_ids=None, refit=False):
+    """
+    Bring ForecastState up to date through `until`. Returns
+    (states by series key, number of series touched, days fed in).
+    """
+    from apps.orders.models import ForecastState
+    from apps.stalls.models import MenuItem
+
+    existing = ForecastState.objects.all()
+    if stall_ids is not None:
+        existing = existing.filter(stall_id__in=stall_ids)
+    states = {} if refit else {
+        (state.stall_id, state.menu_item_id, state.break_slot): state for state in existing
+    }
+    demand = _history(stall_ids, states, refit)
+    live_items = set(MenuItem.objects.values_list('pk', flat=True))
+    keys = sorted(key for key in set(states) | set(demand) if key[1] in live_items)
+
+    first_days = [min(days) for days in demand.values() if days]
+    first_days += [state.last_date + timedelta(days=1) for state in states.values()]
+    if not keys or not first_days or min(first_days) > until:
+        return states, 0, 0
+    start = min(first_days)
+    total_days = (until - start).days + 1
+    weekday = (np.arange(total_days) + start.weekday()) % SEASON
+
+    # Quantities by series and day; a stall is open on days it sold anything
+    y = np.zeros((len(keys), total_days))
+    open_days = defaultdict(lambda: np.zeros(total_days, dtype=bool))
+    for row, key in enumerate(keys):
+        for day, quantity in demand.get(key, {}).items():
+            if day <= until:
+                y[row, (day - start).days] = quantity
+                open_days[key[0]][(day - start).days] = True
+    observed = np.array([open_days[key[0]] for key in keys])
+
+    columns = np.arange(total_days)
+    old_rows = [row for row, key in enumerate(keys) if key in states]
+    new_rows = [row for row, key in enumerate(keys) if key not in states]
+    for row in old_rows:
+        observed[row] &= columns > (states[keys[row]].last_date - start).days
+    for row in new_rows:
+        observed[row] &= y[row].cumsum() > 0  # starts at the item's first sale in the slot
+
+    fitted = {}
+    if old_rows:
+        fitted['old'] = advance([states[keys[row]] for row in old_rows], y[old_rows], observed[old_rows], weekday)
+    if new_rows:
+        fitted['new'] = fit_new(y[new_rows], observed[new_rows], weekday)
+
+    created, updated = [], []
+    for group, rows in (('old', old_rows), ('new', new_rows)):
+        for index, row in enumerate(rows):
+            values = fitted[group]
+            key = keys[row]
+            state = states.get(key) or ForecastState(
+                stall_id=key[0], menu_item_id=key[1], break_slot=key[2], observations=0,
+            )
+            state.level = float(values['level'][index])
+            state.trend = float(values['trend'][index])
+            state.season = [round(float(term), 4) for term in values['season'][index]]
+            state.mse = float(values['mse'][index])
+            state.alpha = float(values['alpha'][index])
+            state.beta = float(values['beta'][index])
+            state.gamma = float(values['gamma'][index])
+            state.observations += int(observed[row].sum())
+            state.last_date = until
+            (updated if state.pk else created).append(state)
+            states[key] = state
+
+    with transaction.atomic():
+        if refit:
+            existing.delete()
+        ForecastState.objects.bulk_create(created, batch_size=500)
+        ForecastState.objects.bulk_update(updated, [
+            'level', 'trend', 'season', 'mse', 'alpha', 'beta', 'gamma', 'observations', 'last_date', 'updated_at',
+        ], batch_size=500)
+        record_actuals(demand, start, until, stall_ids)
+    return states, len(keys), total_days
+
+
+def forecast(states, dates):
+    """
+    Point forecasts and 80% intervals for every state on every date.
+    Returns (mean, lower, upper, confidence), each shaped (states, dates).
+    """
+    level = np.array([state.level for state in states])[:, None]
+    trend = np.array([state.trend for state in states])[:, None]
+    season = np.array([state.season for state in states], dtype=float)
+    mse = np.array([state.mse for state in states])[:, None]
+    alpha = np.array([state.alpha for state in states])[:, None]
+    last = np.array([state.last_date.toordinal() for state in states])[:, None]
+
+    horizon = np.maximum(np.array([day.toordinal() for day in dates])[None, :] - last, 1)
+    damped_trend = PHI * (1 - PHI ** horizon) / (1 - PHI) * trend
+    mean = np.maximum(level + damped_trend + season[:, [day.weekday() for day in dates]], 0.0)
+    # Variance grows with the horizon as in simple exponential smoothing
+    spread = INTERVAL_Z * np.sqrt(mse * (1 + (horizon - 1) * alpha ** 2))
+    lower = np.maximum(mean - spread, 0.0)
+    upper = mean + spread
+    confidence = np.clip(1 - (spread / INTERVAL_Z) / np.maximum(mean, 1.0), 0.0, 1.0)
+    return mean, lower, upper, confidence
+
+
+def write_forecasts(states, dates):
+    """Upsert DemandForecast rows for every state on every date. Returns the row count."""
+    from apps.orders.models import DemandForecast
+
+    states = list(states)
+    if not states or not dates:
+        return 0
+    mean, lower, upper, confidence = forecast(states, dates)
+    rows = [
+        DemandForecast(
+            stall_id=state.stall_id, menu_item_id=state.menu_item_id, break_slot=state.break_slot,
+            forecast_date=day, day_of_week=day.weekday(),
+            predicted_quantity=int(round(mean[row, col])),
+            lower_quantity=int(np.floor(lower[row, col])),
+            upper_quantity=int(np.ceil(upper[row, col])),
+            confidence_score=round(float(confidence[row, col]), 2),
+        )
+        for row, state in enumerate(states)
+        for col, day in enumerate(dates)
+    ]
+    DemandForecast.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True,
+        unique_fields=['stall', 'menu_item', 'break_slot', 'forecast_date'],
+        update_fields=['day_of_week', 'predicted_quantity', 'lower_quantity', 'upper_quantity', 'confidence_score'],
+    )
+    return len(rows)
+
+
+def record_actuals(demand, start, until, stall_ids=None):
+    """Fill actual_quantity on earlier per-item forecasts for days now in the history."""
+    from apps.orders.models import DemandForecast
+
+    past = DemandForecast.objects.filter(menu_item__isnull=False, forecast_date__range=(start, until))
+    if stall_ids is not None:
+        past = past.filter(stall_id__in=stall_ids)
+    changed = []
+    for row in past.only('stall_id', 'menu_item_id', 'break_slot', 'forecast_date', 'actual_quantity'):
+        actual = demand.get((row.stall_id, row.menu_item_id, row.break_slot), {}).get(row.forecast_date, 0)
+        if actual != row.actual_quantity:
+            row.actual_quantity = actual
+            changed.append(row)
+    DemandForecast.objects.bulk_update(changed, ['actual_quantity'], batch_size=500)
+
+
+def run_forecasts(today, days=7, stall_ids=None, refit=False):
+    """
+    Fit through yesterday and write per-item forecasts for `today` and the
+    following days - 1 days. Returns a summary dict.
+    """
+    started = time.perf_counter()
+    states, series, history_days = update_states(today - timedelta(days=1), stall_ids, refit)
+    dates = [today + timedelta(days=offset) for offset in range(days)]
+    written = write_forecasts(states.values(), dates)
+    return {
+        'series': series,
+        'history_days': history_days,
+        'forecasts': written,
+        'seconds': time.perf_counter() - started,
+    }
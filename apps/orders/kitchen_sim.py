@@ -0,0 +1,220 @@
+"""
+Discrete-event simulation of a stall's kitchen, for capacity planning.
+Orders are jobs for `stations` parallel cooks, taken first come, first
+served. A cook handles up to `batch` units at once, so an order takes its
+estimated prep time (prep_time_minutes x quantity, as
+Order.estimated_prep_time) divided by the batch, but never less than its
+slowest item; work_factor scales the result. Cooking for a slot starts at
+most prep_ahead minutes before the slot opens. A student's wait is the
+time from the slot opening (or from ordering, if later) until their order is ready.
+Orders come from a replayed historical day, or are resampled from
+recent history with the scenario's demand_scale. Each (scenario, day)
+run is independent, so a grid of what-if scenarios is spread over a
+process pool.
+"""
+import heapq
+import itertools
+import math
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Scenario(namedtuple('Scenario', 'stations batch prep_ahead work_factor demand_scale slot_moves',
+                          defaults=(1, 4, 30.0, 1.0, 1.0, ()))):
+    """
+    One what-if: parallel stations, units a station cooks at once, minutes
+    before a slot that cooking may start, work_factor (< 1 is faster than the
+    listed prep times), demand_scale (resampled days only) and slot_moves,
+    e.g. (('15:00', '15:30'),).
+    """
+    __slots__ = ()
+
+    def label(self):
+        parts = [
+            f'{self.stations} station{"s" if self.stations != 1 else ""}',
+            f'batch {self.batch}', f'ahead {self.prep_ahead:g}m',
+        ]
+        if self.work_factor != 1:
+            parts.append(f'work x{self.work_factor:g}')
+        if self.demand_scale != 1:
+            parts.append(f'demand x{self.demand_scale:g}')
+        parts += [f'{old}->{new}' for old, new in self.slot_moves]
+        return ', '.join(parts)
+
+
+def minutes_of(slot):
+    hours, minutes = slot.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def slot_windows(choices):
+    """{'10:00': (600, 620)} in minutes after midnight, from BREAK_SLOT_CHOICES labels."""
+    windows = {}
+    for value, label in choices:
+        start = minutes_of(value)
+        end = label.split(' - ')[-1]
+        clock = datetime.strptime(end, '%I:%M %p')
+        windows[value] = (start, clock.hour * 60 + clock.minute)
+    return windows
+
+
+def simulate(orders, scenario, windows):
+    """
+    Run one day through the kitchen. Returns waits (minutes), on-time flags
+    and queue statistics. Event queue entries are (time, sequence, kind, job).
+    """
+    moves = dict(scenario.slot_moves)
+    events = []
+    sequence = itertools.count()
+    jobs = []
+    for slot, lead, longest, total in orders:
+        start, end = windows[slot]
+        if slot in moves:
+            shift = minutes_of(moves[slot]) - start
+            start, end = start + shift, end + shift
+        arrival = start - lead
+        work = max(longest, total / scenario.batch) * scenario.work_factor
+        job = {'arrival': arrival, 'start': start, 'end': end, 'work': work}
+        jobs.append(job)
+        heapq.heappush(events, (max(arrival, start - scenario.prep_ahead), next(sequence), 'release', job))
+
+    free = scenario.stations
+    queue = deque()            # released jobs waiting for a station, FIFO by release
+    busy_minutes = 0.0
+    max_queue = 0
+    queue_area = 0.0           # integral of queue length over time
+    first_event = last_event = None
+    waits, on_time = [], []
+    while events:
+        now, _seq, kind, job = heapq.heappop(events)
+        if last_event is not None:
+            queue_area += len(queue) * (now - last_event)
+        first_event = now if first_event is None else first_event
+        last_event = now
+        if kind == 'release':
+            queue.append(job)
+        else:
+            free += 1
+            ready_wait = max(now - max(job['start'], job['arrival']), 0.0)
+            waits.append(ready_wait)
+            on_time.append(now <= job['end'])
+        while free and queue:
+            started = queue.popleft()
+            free -= 1
+            busy_minutes += started['work']
+            heapq.heappush(events, (now + started['work'], next(sequence), 'finish', started))
+        max_queue = max(max_queue, len(queue))
+
+    span = (last_event - first_event) if jobs else 0.0
+    return {
+        'orders': len(jobs),
+        'waits': waits,
+        'on_time': sum(on_time),
+        'max_queue': max_queue,
+        'mean_queue': queue_area / span if span else 0.0,
+        'utilisation': busy_minutes / (span * scenario.stations) if span else 0.0,
+    }
+
+
+def resample_day(history, scale, rng, day_label):
+    """A synthetic day: per slot, a Poisson count around the historical mean, orders drawn from history."""
+    by_slot = defaultdict(list)
+    for _label, orders in history:
+        for order in orders:
+            by_slot[order[0]].append(order)
+    orders = []
+    for slot, pool in sorted(by_slot.items()):
+        count = rng.poisson(len(pool) / len(history) * scale)
+        orders += [pool[index] for index in rng.integers(len(pool), size=count)]
+    return day_label, orders
+
+
+def run_one(scenario, day, windows):
+    label, orders = day
+    result = simulate(orders, scenario, windows)
+    result['day'] = label
+    return scenario, result
+
+
+def summarise(runs):
+    """Pool the runs of one scenario into wait percentiles and queue figures."""
+    waits = np.concatenate([np.asarray(run['waits'], dtype=float) for run in runs]) if runs else np.zeros(0)
+    orders = sum(run['orders'] for run in runs)
+    summary = {
+        'days': len(runs),
+        'orders': orders,
+        'mean_wait': float(waits.mean()) if waits.size else 0.0,
+        'on_time': sum(run['on_time'] for run in runs) / orders if orders else 1.0,
+        'max_queue': max((run['max_queue'] for run in runs), default=0),
+        'mean_queue': float(np.mean([run['mean_queue'] for run in runs])) if runs else 0.0,
+        'utilisation': float(np.mean([run['utilisation'] for run in runs])) if runs else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f'p{pct}_wait'] = float(np.percentile(waits, pct)) if waits.size else 0.0
+    return summary
+
+
+def run_scenarios(scenarios, days, windows, history=None, samples=0, seed=0, workers=None):
+    """
+    Simulate every scenario on every replayed day, or on `samples`
+    resampled days per scenario when history is given. Returns
+    [(scenario, summary)] in the order of `scenarios`.
+    """
+    rng = np.random.default_rng(seed)
+    tasks = []
+    for scenario in scenarios:
+        if samples:
+            for index in range(samples):
+                tasks.append((scenario, resample_day(history, scenario.demand_scale, rng, f'sample {index + 1}')))
+        else:
+            tasks += [(scenario, day) for day in days]
+
+    if workers == 1:
+        results = [run_one(scenario, day, windows) for scenario, day in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk = max(1, math.ceil(len(tasks) / ((workers or 4) * 8)))
+            results = list(pool.map(run_one, *zip(*tasks), itertools.repeat(windows), chunksize=chunk)) if tasks else []
+
+    runs = defaultdict(list)
+    for scenario, result in results:
+        runs[scenario].append(result)
+    return [(scenario, summarise(runs[scenario])) for scenario in scenarios]
+
+
+def scenario_grid(stations, batches, prep_ahead, work_factors=(1.0,), demand_scales=(1.0,), slot_moves=()):
+    """Every combination of the given values, sharing the same slot moves."""
+    return [
+        Scenario(*values, tuple(slot_moves))
+        for values in itertools.product(stations, batches, prep_ahead, work_factors, demand_scales)
+    ]
+
+
+def load_days(stall_id, start, end):
+    """
+    [(day, orders)] for a stall, each order as (slot, minutes ordered before
+    the slot, slowest item's prep minutes, total prep minutes), from the
+    line-item snapshots of live and archived orders.
+    """
+    from apps.orders.ai_demand import slot_start
+    from apps.orders.models import ArchivedOrder, Order
+
+    days = defaultdict(list)
+    for model in (Order, ArchivedOrder):
+        rows = model.objects.filter(
+            stall_id=stall_id, pickup_date__range=(start, end),
+        ).exclude(status='cancelled').values_list('pickup_date', 'break_slot', 'created_at', 'line_items')
+        for pickup_date, slot, created_at, lines in rows.iterator():
+            if not lines:
+                continue
+            # Orders close when the slot starts; imported or backfilled rows can be stamped later
+            lead = max((slot_start(pickup_date, slot) - created_at).total_seconds() / 60, 0.0)
+            longest = max(line.get('prep', 0) for line in lines)
+            total = sum(line.get('prep', 0) * line['qty'] for line in lines)
+            days[pickup_date].append((slot, lead, longest, total))
+    return [(str(day), orders) for day, orders in sorted(days.items())]
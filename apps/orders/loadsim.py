@@ -0,0 +1,321 @@
+"""
+Break-rush load simulator.
+Students, pollers and stall owners are modelled as threads talking HTTP
+to a running server. Simulated campus time runs faster than wall time
+(`time_scale`), and students arrive following a bell curve ahead of each
+break slot.
+"""
+import itertools
+import json
+import math
+import random
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency and error bookkeeping."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.counters = defaultdict(int)
+
+    def record(self, endpoint, status, elapsed_ms, db_locked=False):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed_ms)
+            self.statuses[endpoint][status] += 1
+            if status == 0:
+                self.errors[endpoint]['connection'] += 1
+            elif status >= 500:
+                kind = 'sqlite_locked' if db_locked else 'server_error'
+                self.errors[endpoint][kind] += 1
+            elif status == 429:
+                self.errors[endpoint]['rate_limited'] += 1
+            elif status >= 400:
+                self.errors[endpoint]['client_error'] += 1
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def summary(self, wall_seconds):
+        report = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            errors = dict(self.errors[endpoint])
+            ordered = sorted(samples)
+            report[endpoint] = {
+                'requests': len(samples),
+                'throughput_rps': round(len(samples) / wall_seconds, 2),
+                'error_rate': round(sum(errors.values()) / len(samples), 4),
+                'errors': errors,
+                'p50_ms': round(_pct(ordered, 50), 1),
+                'p95_ms': round(_pct(ordered, 95), 1),
+                'p99_ms': round(_pct(ordered, 99), 1),
+            }
+        return report
+
+
+def _pct(ordered, pct):
+    if len(ordered) == 1:
+        return ordered[0]
+    return statistics.quantiles(ordered, n=100, method='inclusive')[pct - 1]
+
+
+class HttpSession:
+    """Cookie-aware client for one simulated user. Redirects are not followed."""
+
+    def __init__(self, base_url, recorder, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, endpoint, path, data=None):
+        body = None
+        headers = {}
+        if data is not None:
+            data = dict(data, csrfmiddlewaretoken=self.csrf_token())
+            body = urllib.parse.urlencode(data).encode()
+            headers = {'X-CSRFToken': self.csrf_token(), 'Referer': self.base_url + path}
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as resp:
+                status, payload, headers = resp.status, resp.read(), resp.headers
+        except urllib.error.HTTPError as exc:
+            status, payload, headers = exc.code, exc.read(), exc.headers
+        except (urllib.error.URLError, OSError):
+            status, payload, headers = 0, b'', {}
+        location = headers.get('Location', '')
+        # Set by RequestMetricsMiddleware; error pages only name the cause with DEBUG on
+        db_locked = 'X-DB-Locked' in headers
+        self.recorder.record(endpoint, status, (time.perf_counter() - started) * 1000, db_locked)
+        return status, payload, location
+
+    def login(self, username, password):
+        self.request('login_page', '/users/login/')
+        status, _body, _location = self.request('login', '/users/login/', {'username': username, 'password': password})
+        return status == 302
+
+
+class RushSimulation:
+    """
+    Drive a break rush against `base_url`.
+    `arrivals` maps break slot -> number of students ordering for it.
+    """
+
+    def __init__(self, base_url, students, owners, stalls, arrivals, *, start, end, time_scale=60.0,
+                 lead_minutes=45, spread_minutes=20, poll_seconds=10, demand_poll_seconds=30,
+                 owner_interval_seconds=15, double_submit_rate=0.0, seed=42, pickup_date=None):
+        self.base_url = base_url
+        self.students = students
+        self.owners = owners
+        self.stalls = stalls  # stall id -> list of menu item ids
+        self.arrivals = arrivals
+        self.start = start
+        self.end = end
+        self.time_scale = time_scale
+        self.lead = timedelta(minutes=lead_minutes)
+        self.spread = spread_minutes
+        self.poll_seconds = poll_seconds
+        self.demand_poll_seconds = demand_poll_seconds
+        self.owner_interval_seconds = owner_interval_seconds
+        self.double_submit_rate = double_submit_rate
+        self.rng = random.Random(seed)
+        self.pickup_date = pickup_date or start.date()
+        self.recorder = Recorder()
+        self.stop = threading.Event()
+
+    # --- simulated clock -------------------------------------------------
+
+    def sim_now(self):
+        return self.start + timedelta(seconds=(time.perf_counter() - self.wall_start) * self.time_scale)
+
+    def sleep_sim(self, seconds):
+        """Sleep for `seconds` of simulated time; False once the run is over."""
+        return not self.stop.wait(seconds / self.time_scale)
+
+    def schedule(self):
+        """(arrival time, slot) per student, bell-shaped ahead of each slot."""
+        plan = []
+        for slot, count in self.arrivals.items():
+            hour, minute = map(int, slot.split(':'))
+            peak = self.start.replace(hour=hour, minute=minute, second=0, microsecond=0) - self.lead
+            for _ in range(count):
+                at = peak + timedelta(minutes=self.rng.gauss(0, self.spread))
+                plan.append((min(max(at, self.start), self.end), slot))
+        plan.sort()
+        return plan
+
+    # --- actors ------------------------------------------------------------
+
+    def student(self, username, password, slot):
+        session = HttpSession(self.base_url, self.recorder)
+        if not session.login(username, password):
+            self.recorder.count('failed_logins')
+            return
+        stall_id = self.rng.choice(list(self.stalls))
+        items = self.rng.sample(self.stalls[stall_id], min(len(self.stalls[stall_id]), self.rng.randint(1, 3)))
+
+        _status, page, _location = session.request('place_order_page', f'/order/stall/{stall_id}/')
+        session.request('slot_demand_api', f'/api/slot-demand/?stall_id={stall_id}&date={self.pickup_date}')
+        key = re.search(rb'name="idempotency_key" value="(\w+)"', page)
+        if not key:  # the order page never loaded, so there is no form to submit
+            self.recorder.count('orders_failed')
+            return
+        cart = json.dumps([{'id': item_id, 'quantity': self.rng.choice((1, 1, 2))} for item_id in items])
+        form = {
+            'break_slot': slot,
+            'pickup_date': self.pickup_date.isoformat(),
+            'cart_data': cart,
+            'idempotency_key': key.group(1).decode(),
+        }
+        if self.rng.random() < self.double_submit_rate:
+            order_id = self.double_submit(session, f'/order/stall/{stall_id}/', form)
+        else:
+            order_id = self.submit(session, f'/order/stall/{stall_id}/', form)
+        if order_id is None:
+            self.recorder.count('orders_failed')
+            return
+        self.recorder.count('orders_placed')
+
+        while self.sleep_sim(self.poll_seconds):
+            status, body, _location = session.request('order_status_api', f'/api/order-status/{order_id}/')
+            if status == 200 and json.loads(body).get('status') in ('ready', 'completed', 'cancelled'):
+                break
+
+    def submit(self, session, path, form):
+        status, _body, location = session.request('place_order', path, form)
+        match = re.search(r'/order/(\d+)/', location)
+        return match.group(1) if status == 302 and match else None
+
+    def double_submit(self, session, path, form):
+        """Post the same form twice at once, like an impatient double click."""
+        results = [None, None]
+
+        def post(i):
+            results[i] = self.submit(session, path, form)
+
+        threads = [threading.Thread(target=post, args=(i,)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.recorder.count('double_submits')
+        placed = {order_id for order_id in results if order_id}
+        if len(placed) > 1:
+            self.recorder.count('duplicate_orders')
+        return min(placed) if placed else None
+
+    def demand_poller(self, stall_id):
+        """An open home/order page refreshing slot demand."""
+        session = HttpSession(self.base_url, self.recorder)
+        while self.sleep_sim(self.demand_poll_seconds):
+            session.request('slot_demand_api', f'/api/slot-demand/?stall_id={stall_id}&date={self.pickup_date}')
+
+    NEXT_STATUS = {'pending': 'confirmed', 'confirmed': 'preparing', 'preparing': 'ready', 'ready': 'completed'}
+
+    def owner(self, username, password):
+        session = HttpSession(self.base_url, self.recorder)
+        if not session.login(username, password):
+            self.recorder.count('failed_logins')
+            return
+        while self.sleep_sim(self.owner_interval_seconds):
+            status, body, _location = session.request('recent_orders_api', '/api/recent-orders/')
+            if status != 200:
+                continue
+            for order in json.loads(body)['orders']:
+                new_status = self.NEXT_STATUS.get(order['status'])
+                if new_status:
+                    session.request('update_order_status', f"/api/update-status/{order['id']}/", {'status': new_status})
+
+    # --- driver --------------------------------------------------------------
+
+    def spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def run(self, password, pollers_per_stall=5):
+        plan = self.schedule()
+        self.threads = []
+        self.wall_start = time.perf_counter()
+        for owner in self.owners:
+            self.spawn(self.owner, owner, password)
+        for stall_id in self.stalls:
+            for _ in range(pollers_per_stall):
+                self.spawn(self.demand_poller, stall_id)
+
+        # One thread per arriving student; most of its life is spent polling
+        students = itertools.cycle(self.students)
+        for arrival, slot in plan:
+            delay = (arrival - self.sim_now()).total_seconds() / self.time_scale
+            if delay > 0 and self.stop.wait(delay):
+                break
+            self.spawn(self.student, next(students), password, slot)
+
+        remaining = (self.end - self.sim_now()).total_seconds() / self.time_scale
+        self.stop.wait(max(0.0, remaining))
+        self.stop.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+        wall = time.perf_counter() - self.wall_start
+        return {
+            'wall_seconds': round(wall, 1),
+            'simulated': f'{self.start:%H:%M}-{self.end:%H:%M}',
+            'counters': dict(self.recorder.counters),
+            'endpoints': self.recorder.summary(wall),
+        }
+
+
+def parse_arrivals(spec, total, slots=None):
+    """
+    '12:00=0.5,13:00=0.3,15:00=0.2' -> {slot: students}, shares of `total`.
+    Raises ValueError for a malformed spec, a slot not in `slots` or weights
+    that don't add up to more than zero.
+    """
+    weights = {}
+    for part in spec.split(','):
+        slot, sep, weight = (piece.strip() for piece in part.partition('='))
+        if not sep or not slot:
+            raise ValueError(f'expected SLOT=WEIGHT, got {part!r}')
+        if slots is not None and slot not in slots:
+            raise ValueError(f"unknown slot {slot!r}; expected one of {', '.join(slots)}")
+        try:
+            weights[slot] = float(weight)
+        except ValueError:
+            raise ValueError(f'weight for {slot} must be a number, got {weight!r}') from None
+        if not math.isfinite(weights[slot]) or weights[slot] < 0:
+            raise ValueError(f'weight for {slot} must be zero or more, got {weight!r}')
+    if not sum(weights.values()) > 0:
+        raise ValueError('at least one slot needs a weight above zero')
+    scale = total / sum(weights.values())
+    return {slot: math.floor(weight * scale) for slot, weight in weights.items()}
+
+
+def parse_clock(value, day):
+    return datetime.combine(day, datetime.strptime(value, '%H:%M').time())
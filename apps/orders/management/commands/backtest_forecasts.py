@@ -0,0 +1,74 @@
+"""
+Replay order history and score slot-level forecasting strategies.
+Usage:
+    python manage.py backtest_forecasts                             # last 90 days, all strategies
+    python manage.py backtest_forecasts --start 2026-01-01 --end 2026-06-30 --workers 8
+    python manage.py backtest_forecasts --strategy weighted_average --stall 3 --json report.json
+"""
+import json
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.orders.backtest import STRATEGIES, WARMUP_DAYS, format_metric, run_backtest
+from apps.stalls.models import FoodStall
+
+
+class Command(BaseCommand):
+    help = 'Backtest demand forecasting strategies per stall and slot (MAE, MAPE, confidence calibration)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day scored (default: 90 days ago)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day scored (default: yesterday)')
+        parser.add_argument('--strategy', action='append', choices=list(STRATEGIES), dest='strategies',
+                            help='Strategy to score; repeat for several (default: all)')
+        parser.add_argument('--stall', type=int, action='append', dest='stalls', help='Stall id; repeat for several')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+        parser.add_argument('--warmup-days', type=int, default=WARMUP_DAYS, help='History before --start used for fitting')
+        parser.add_argument('--no-cache', action='store_true', help='Re-query daily counts instead of using the cache')
+        parser.add_argument('--json', dest='json_path', help='Also write the full report, with calibration bins, here')
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.localdate() - timedelta(days=1)
+        start = options['start'] or end - timedelta(days=89)
+        if start > end:
+            raise CommandError('--start must not be after --end')
+        if options['warmup_days'] < 28:
+            raise CommandError('--warmup-days must be at least 28; weighted_average looks four weeks back')
+
+        started = time.perf_counter()
+        cache_dir = None if options['no_cache'] else getattr(settings, 'BACKTEST_CACHE_DIR', None)
+        results, overall = run_backtest(
+            start, end, options['strategies'], options['stalls'], options['workers'], cache_dir,
+            options['warmup_days'],
+        )
+        elapsed = time.perf_counter() - started
+
+        names = dict(FoodStall.objects.values_list('pk', 'name'))
+        self.stdout.write(f"{'Stall':<24} {'Slot':<6} {'Strategy':<17} {'MAE':>6} {'MAPE%':>7} {'Hit%':>5} {'Conf%':>6} {'Calib':>6}")
+        for row in results:
+            self.stdout.write(self._line(names.get(row['stall_id'], row['stall_id']), row['slot'], row['strategy'], row))
+        self.stdout.write('')
+        for name, row in overall.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(self._line('All stalls', '', name, row)))
+        self.stdout.write(self.style.SUCCESS(
+            f'🔁 Backtested {len(overall)} strategies over {start} – {end} in {elapsed:.1f}s'
+        ))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as out:
+                json.dump({'start': str(start), 'end': str(end), 'results': results, 'overall': overall}, out, indent=2)
+            self.stdout.write(f"💾 Report written to {options['json_path']}")
+
+    def _line(self, stall, slot, strategy, row):
+        def pct(value):
+            return format_metric(value if value is None else value * 100, '{:.0f}')
+
+        return (
+            f"{str(stall)[:24]:<24} {slot:<6} {strategy:<17} {format_metric(row['mae']):>6} "
+            f"{format_metric(row['mape'], '{:.1f}'):>7} {pct(row['hit_rate']):>5} {pct(row['mean_confidence']):>6} "
+            f"{format_metric(row['calibration_error']):>6}"
+        )
@@ -0,0 +1,120 @@
+"""
+Benchmark the main views against a seeded test database.
+Usage:
+    python manage.py benchmark_views --save-baseline   # record a baseline
+    python manage.py benchmark_views                   # compare against it
+    python manage.py benchmark_views --only home,stall_list,stall_detail --without-fragment-cache
+"""
+import io
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import modify_settings, override_settings, setup_test_environment, teardown_test_environment
+
+from apps.orders.benchmarks import SCENARIOS, build_fixtures, compare, run_scenario
+
+
+class Command(BaseCommand):
+    help = 'Benchmark views (queries, latency percentiles, allocations) and check for regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--save-baseline', action='store_true', help='Overwrite the baseline with this run')
+        parser.add_argument('--output', help='Also write this run\'s results to a JSON file')
+        parser.add_argument('--only', help='Comma-separated scenario names')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed fractional growth of p95 latency and allocations')
+        parser.add_argument('--query-tolerance', type=int, default=0, help='Allowed extra queries per view')
+        parser.add_argument('--without-middleware', action='append', default=[], metavar='PATH',
+                            help='Run with this middleware removed, e.g. to measure its overhead')
+        parser.add_argument('--without-fragment-cache', action='store_true',
+                            help='Render every {% cache %} fragment afresh, to measure what the cache saves')
+        parser.add_argument('--no-rate-limits', action='store_true',
+                            help='Skip rate limit checks (by default they run with limits too high to trip)')
+        # Dataset size, passed through to generate_orders
+        parser.add_argument('--stalls', type=int, default=5)
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--orders-per-day', type=int, default=60)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['only']:
+            wanted = set(options['only'].split(','))
+            scenarios = [s for s in SCENARIOS if s.name in wanted]
+            unknown = wanted - {s.name for s in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        setup_test_environment(debug=False)
+        without = modify_settings(MIDDLEWARE={'remove': options['without_middleware']})
+        without.enable()
+        # Repeated requests would otherwise be throttled; keep the checks, drop the limits
+        unlimited = {
+            name: {scope: '1000000000/m' for scope in buckets}
+            for name, buckets in getattr(settings, 'RATE_LIMITS', {}).items()
+        }
+        limits = override_settings(RATE_LIMITS=unlimited, RATE_LIMIT_ENABLED=not options['no_rate_limits'])
+        limits.enable()
+        caches = {**settings.CACHES}
+        if options['without_fragment_cache']:
+            caches['fragments'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        fragments = override_settings(CACHES=caches)
+        fragments.enable()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write('🌱 Seeding benchmark dataset...')
+            call_command(
+                'generate_orders', stdout=io.StringIO(), prefix='bench',
+                stalls=options['stalls'], students=options['students'], days=options['days'],
+                orders_per_day=options['orders_per_day'], seed=options['seed'],
+            )
+            fixtures = build_fixtures()
+            results = {}
+            for scenario in scenarios:
+                results[scenario.name] = run_scenario(scenario, fixtures, options['iterations'], options['warmup'])
+                self.report(scenario.name, results[scenario.name])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            fragments.disable()
+            limits.disable()
+            without.disable()
+            teardown_test_environment()
+
+        if options['output']:
+            self.write_json(Path(options['output']), results)
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            self.write_json(baseline_path, results)
+            self.stdout.write(self.style.SUCCESS(f'\n💾 Baseline saved to {baseline_path}'))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f'\nNo baseline at {baseline_path}; run with --save-baseline'))
+            return
+
+        regressions = compare(
+            results, json.loads(baseline_path.read_text()),
+            tolerance=options['tolerance'], query_tolerance=options['query_tolerance'],
+        )
+        if regressions:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('\n✅ No regressions against baseline'))
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"  {name:<18} {result['queries']:>4} queries  "
+            f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms  "
+            f"peak {result['peak_alloc_kib']:>8.1f} KiB"
+        )
+
+    def write_json(self, path, results):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
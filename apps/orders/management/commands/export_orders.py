@@ -0,0 +1,47 @@
+"""
+Stream orders, line items or daily analytics to a file.
+Usage:
+    python manage.py export_orders orders --start 2026-01-01 --end 2026-03-31 -o q1.csv
+    python manage.py export_orders items --format jsonl --gzip -o items.jsonl.gz
+    python manage.py export_orders analytics --stall 3
+"""
+import sys
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.exports import EXPORT_FORMATS, EXPORT_KINDS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Export orders, line items or OrderAnalytics as CSV/JSONL without loading them into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=EXPORT_KINDS)
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--start', type=date.fromisoformat, help='First pickup date (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last pickup date (YYYY-MM-DD)')
+        parser.add_argument('--stall', type=int, action='append', help='Stall id; repeat for several')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output on the fly')
+        parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+
+    def handle(self, *args, **options):
+        if options['gzip'] and not options['output']:
+            raise CommandError('--gzip needs --output')
+        chunks = stream_export(
+            options['kind'], options['format'], options['stall'], options['start'], options['end'],
+            compress=options['gzip'],
+        )
+        started = time.perf_counter()
+        written = 0
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+        if options['output']:
+            self.stderr.write(f"💾 {written / 1024:.0f} KiB written to {options['output']} in {time.perf_counter() - started:.1f}s")
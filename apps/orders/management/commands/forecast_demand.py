@@ -0,0 +1,29 @@
+"""
+Update per-item Holt-Winters forecasts (see apps/orders/forecasting.py).
+Usage:
+    python manage.py forecast_demand                # fit new days, forecast the next 7
+    python manage.py forecast_demand --days 14 --stall 3
+    python manage.py forecast_demand --refit        # refit every series from full history
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.orders.forecasting import run_forecasts
+
+
+class Command(BaseCommand):
+    help = 'Fit per-item demand series incrementally and write DemandForecast rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Days ahead to forecast, starting today')
+        parser.add_argument('--stall', type=int, action='append', dest='stalls', help='Limit to a stall id (repeatable)')
+        parser.add_argument('--refit', action='store_true', help='Discard fitted state and refit from full history')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        summary = run_forecasts(timezone.localdate(), options['days'], options['stalls'], options['refit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"📈 Fitted {summary['series']} item series over {summary['history_days']} days, "
+            f"wrote {summary['forecasts']} forecasts in {summary['seconds']:.2f}s"
+        ))
@@ -0,0 +1,233 @@
+"""
+Generate a large, realistic synthetic order history for load and
+performance testing.
+Usage: python manage.py generate_orders --stalls 20 --students 5000 --days 180
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.orders.models import BREAK_SLOT_CHOICES, Order, OrderItem
+from apps.stalls.models import FoodStall, MenuItem
+from apps.stalls.search import get_backend
+
+User = get_user_model()
+
+# (name, category, price, is_vegetarian, calories, prep minutes)
+DISHES = [
+    ('Masala Dosa', 'meals', 45, True, 180, 10),
+    ('Idli Sambar', 'meals', 35, True, 120, 8),
+    ('Chicken Biryani', 'meals', 90, False, 450, 20),
+    ('Veg Biryani', 'meals', 70, True, 380, 15),
+    ('Curd Rice', 'meals', 30, True, 200, 5),
+    ('Chapati Kurma', 'meals', 40, True, 260, 10),
+    ('Veg Sandwich', 'snacks', 40, True, 220, 7),
+    ('Egg Sandwich', 'snacks', 50, False, 280, 8),
+    ('Samosa', 'snacks', 20, True, 150, 5),
+    ('Pav Bhaji', 'snacks', 55, True, 320, 12),
+    ('French Fries', 'snacks', 50, True, 250, 10),
+    ('Filter Coffee', 'beverages', 15, True, 60, 3),
+    ('Cold Coffee', 'beverages', 40, True, 200, 5),
+    ('Mango Lassi', 'beverages', 40, True, 220, 4),
+    ('Gulab Jamun', 'desserts', 25, True, 200, 5),
+    ('Chocolate Brownie', 'desserts', 40, True, 280, 8),
+    ('Combo: Sandwich + Cold Coffee', 'combos', 75, True, 420, 10),
+]
+
+# Monday .. Sunday demand multipliers
+WEEKDAY_FACTORS = [1.0, 1.05, 1.1, 1.05, 0.9, 0.35, 0.15]
+
+# Share of a stall's daily orders per slot before the rush multiplier
+SLOT_WEIGHTS = {'10:00': 0.2, '12:00': 0.3, '13:00': 0.3, '15:00': 0.2}
+RUSH_SLOTS = ('12:00', '13:00')
+
+
+@contextmanager
+def historical_timestamps():
+    """Let bulk_create write explicit created_at/updated_at values."""
+    created = Order._meta.get_field('created_at')
+    updated = Order._meta.get_field('updated_at')
+    saved = created.auto_now_add, updated.auto_now
+    created.auto_now_add = updated.auto_now = False
+    try:
+        yield
+    finally:
+        created.auto_now_add, updated.auto_now = saved
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic order history with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stalls', type=int, default=10)
+        parser.add_argument('--items-per-stall', type=int, default=10)
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=90, help='Days of history ending today')
+        parser.add_argument('--orders-per-day', type=int, default=120,
+                            help='Mean orders per stall on a normal weekday')
+        parser.add_argument('--rush-factor', type=float, default=1.5,
+                            help='Extra demand multiplier for the 12:00 and 13:00 slots')
+        parser.add_argument('--cancel-rate', type=float, default=0.08)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Orders per bulk insert')
+        parser.add_argument('--prefix', default='synth', help='Prefix for generated users and stalls')
+        parser.add_argument('--password', default='pass1234', help='Password for generated students')
+
+    def handle(self, *args, **options):
+        for name in ('chunk_size', 'stalls', 'items_per_stall'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive")
+        for name in ('students', 'days', 'orders_per_day', 'rush_factor'):
+            if options[name] < 0:
+                raise CommandError(f"--{name.replace('_', '-')} must not be negative")
+        if not 0 <= options['cancel_rate'] <= 1:
+            raise CommandError('--cancel-rate must be between 0 and 1')
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        started = time.perf_counter()
+
+        students = self.create_students()
+        if not students:
+            raise CommandError(f"No {options['prefix']}_student users to place orders; pass --students N")
+        menus = self.create_stalls()
+        self.stdout.write(f'✅ {len(students)} students, {len(menus)} stalls ready')
+
+        self.orders_written = self.items_written = 0
+        self.chunk_started = time.perf_counter()
+        buffer = []
+        with historical_timestamps():
+            for order, lines in self.generate_orders(students, menus):
+                buffer.append((order, lines))
+                if len(buffer) >= options['chunk_size']:
+                    self.flush(buffer)
+                    buffer = []
+            if buffer:
+                self.flush(buffer)
+
+        elapsed = time.perf_counter() - started
+        rows = self.orders_written + self.items_written
+        self.stdout.write(self.style.SUCCESS(
+            f'\n🎉 {self.orders_written} orders and {self.items_written} items in {elapsed:.1f}s '
+            f'({rows / elapsed:,.0f} rows/sec)'
+        ))
+
+    def create_students(self):
+        prefix = self.options['prefix']
+        existing = set(User.objects.filter(username__startswith=f'{prefix}_student').values_list('username', flat=True))
+        password = make_password(self.options['password'])  # hash once, not per user
+        new_users = [
+            User(
+                username=f'{prefix}_student{i}',
+                email=f'{prefix}_student{i}@school.edu',
+                password=password,
+                role='student',
+                student_id=f'{prefix.upper()}{i:06d}',
+            )
+            for i in range(1, self.options['students'] + 1)
+            if f'{prefix}_student{i}' not in existing
+        ]
+        User.objects.bulk_create(new_users, batch_size=2000)
+        return list(User.objects.filter(username__startswith=f'{prefix}_student').order_by('pk').values_list('id', flat=True))
+
+    def create_stalls(self):
+        prefix = self.options['prefix']
+        owner, _ = User.objects.get_or_create(
+            username=f'{prefix}_owner', defaults={'role': 'stall_owner', 'password': make_password(self.options['password'])}
+        )
+        menus = {}
+        for i in range(1, self.options['stalls'] + 1):
+            stall, created = FoodStall.objects.get_or_create(
+                name=f'{prefix.title()} Stall {i}',
+                defaults={'owner': owner, 'location': f'Block {chr(65 + (i - 1) % 26)}', 'is_open': True},
+            )
+            if created:
+                # Own RNG per stall: whether a stall already exists must not shift the order stream
+                menu_rng = random.Random(f"{self.options['seed']}:{stall.name}")
+                dishes = menu_rng.sample(DISHES, min(self.options['items_per_stall'], len(DISHES)))
+                MenuItem.objects.bulk_create([
+                    MenuItem(stall=stall, name=name, category=cat, price=price, is_vegetarian=veg,
+                             calories=cal, prep_time_minutes=prep, description=f'Fresh {name.lower()}.')
+                    for name, cat, price, veg, cal, prep in dishes
+                ])
+                get_backend().index_stalls([stall.pk])
+            menus[stall.id] = list(stall.menu_items.filter(is_available=True).order_by('pk'))
+        return {stall_id: items for stall_id, items in menus.items() if items}
+
+    def generate_orders(self, students, menus):
+        rng = self.rng
+        opts = self.options
+        today = timezone.localdate()
+        tz = timezone.get_current_timezone()
+        slot_weights = {
+            slot: weight * (opts['rush_factor'] if slot in RUSH_SLOTS else 1)
+            for slot, weight in SLOT_WEIGHTS.items()
+        }
+        total_weight = sum(slot_weights.values())
+
+        for days_back in range(opts['days'], -1, -1):
+            pickup_date = today - timedelta(days=days_back)
+            day_factor = WEEKDAY_FACTORS[pickup_date.weekday()]
+            for stall_id, items in menus.items():
+                token = 0
+                for slot, _label in BREAK_SLOT_CHOICES:
+                    mean = opts['orders_per_day'] * day_factor * slot_weights[slot] / total_weight
+                    count = max(0, round(rng.gauss(mean, mean ** 0.5)))
+                    slot_time = datetime.combine(pickup_date, dt_time.fromisoformat(slot))
+                    for _ in range(count):
+                        token += 1
+                        yield self.build_order(stall_id, items, students, pickup_date, slot, slot_time, token, tz, today)
+
+    def build_order(self, stall_id, items, students, pickup_date, slot, slot_time, token, tz, today):
+        rng = self.rng
+        if pickup_date < today:
+            status = 'cancelled' if rng.random() < self.options['cancel_rate'] else 'completed'
+        else:
+            status = rng.choice(['pending', 'confirmed', 'preparing'])
+        # Most orders land in the few hours before the slot, some the night before
+        created_at = timezone.make_aware(slot_time - timedelta(minutes=rng.expovariate(1 / 120)), tz)
+
+        lines = []
+        total = Decimal('0.00')
+        for menu_item in rng.sample(items, min(rng.choice((1, 1, 2, 2, 3)), len(items))):
+            qty = rng.choice((1, 1, 1, 2))
+            lines.append(OrderItem(menu_item=menu_item, quantity=qty, price_at_order=menu_item.price))
+            total += menu_item.price * qty
+
+        order = Order(
+            user_id=rng.choice(students),
+            stall_id=stall_id,
+            break_slot=slot,
+            pickup_date=pickup_date,
+            status=status,
+            total_amount=total,
+            token_number=f"{pickup_date.strftime('%d%m')}{token:03d}",
+            created_at=created_at,
+            updated_at=created_at,
+            line_items=[line.as_line() for line in lines],
+        )
+        return order, lines
+
+    def flush(self, buffer):
+        with transaction.atomic():
+            orders = Order.objects.bulk_create([order for order, _lines in buffer])
+            items = []
+            for order, (_order, lines) in zip(orders, buffer):
+                for line in lines:
+                    line.order_id = order.pk
+                    items.append(line)
+            OrderItem.objects.bulk_create(items, batch_size=5000)
+
+        self.orders_written += len(orders)
+        self.items_written += len(items)
+        now = time.perf_counter()
+        rate = (len(orders) + len(items)) / (now - self.chunk_started)
+        self.chunk_started = now
+        self.stdout.write(f'  … {self.orders_written:,} orders, {self.items_written:,} items ({rate:,.0f} rows/sec)')
@@ -158,16 +158,19 @@ class Command(BaseCommand):
                             special_instructions=''
                         )
                         total = 0
+                        lines = []
                         for menu_item in selected_items:
                             qty = random.randint(1, 2)
-                            OrderItem.objects.create(
+                            order_item = OrderItem.objects.create(
                                 order=order,
                                 menu_item=menu_item,
                                 quantity=qty,
                                 price_at_order=menu_item.price
                             )
+                            lines.append(order_item.as_line())
                             total += menu_item.price * qty
                         order.total_amount = total
+                        order.line_items = lines
                         order.save()
                         order_count += 1
 
@@ -188,11 +191,14 @@ class Command(BaseCommand):
                         total_amount=0
                     )
                     total = 0
+                    lines = []
                     for item in selected_items:
                         qty = random.randint(1, 2)
-                        OrderItem.objects.create(order=order, menu_item=item, quantity=qty, price_at_order=item.price)
+                        order_item = OrderItem.objects.create(order=order, menu_item=item, quantity=qty, price_at_order=item.price)
+                        lines.append(order_item.as_line())
                         total += item.price * qty
                     order.total_amount = total
+                    order.line_items = lines
                     order.save()
                     today_orders += 1
 
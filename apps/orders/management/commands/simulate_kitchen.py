@@ -0,0 +1,123 @@
+"""
+What-if capacity planning for a stall's kitchen (see apps/orders/kitchen_sim.py).
+Usage:
+    python manage.py simulate_kitchen 3                                 # replay the last 28 days, 1-3 stations
+    python manage.py simulate_kitchen 3 --stations 1,2 --batch 2,4 --prep-ahead 20,40 --move-slot 15:00=15:30
+    python manage.py simulate_kitchen 3 --samples 500 --demand-scale 1,1.25,1.5 --workers 8
+"""
+import argparse
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.orders.kitchen_sim import (
+    PERCENTILES, load_days, minutes_of, run_scenarios, scenario_grid, slot_windows,
+)
+from apps.orders.models import BREAK_SLOT_CHOICES
+from apps.stalls.models import FoodStall
+
+
+def number_list(cast, allow_zero=False):
+    def parse(value):
+        try:
+            numbers = [cast(part) for part in value.split(',') if part]
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'expected a comma-separated list of numbers, got {value!r}')
+        if not numbers or any(number < 0 or (number == 0 and not allow_zero) for number in numbers):
+            kind = 'zero or more' if allow_zero else 'greater than zero'
+            raise argparse.ArgumentTypeError(f'expected a comma-separated list of numbers {kind}, got {value!r}')
+        return numbers
+    return parse
+
+
+def clock_minutes(value):
+    """Minutes after midnight for HH:MM, or None if it isn't a time of day."""
+    if len(value) != 5 or value[2] != ':':
+        return None
+    try:
+        minutes = minutes_of(value)
+    except ValueError:
+        return None
+    return minutes if int(value[3:]) < 60 and minutes < 24 * 60 else None
+
+
+class Command(BaseCommand):
+    help = 'Simulate a stall kitchen under what-if scenarios and report queue length and wait percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('stall_id', type=int)
+        parser.add_argument('--days', type=int, default=28, help='Days of history to replay or resample')
+        parser.add_argument('--stations', type=number_list(int), default=[1, 2, 3], help='Parallel cooks, e.g. 1,2,3')
+        parser.add_argument('--batch', type=number_list(int), default=[4],
+                            help='Units one station cooks at once, e.g. 2,4')
+        parser.add_argument('--prep-ahead', type=number_list(float, allow_zero=True), default=[30.0],
+                            help='Minutes before a slot cooking may start, e.g. 15,30')
+        parser.add_argument('--work-factor', type=number_list(float), default=[1.0],
+                            help='Multiplier on listed prep times, e.g. 0.8,1')
+        parser.add_argument('--demand-scale', type=number_list(float), default=[1.0],
+                            help='Demand multiplier for resampled days, e.g. 1,1.5')
+        parser.add_argument('--move-slot', action='append', default=[], metavar='OLD=NEW',
+                            help='Move a break slot, e.g. 15:00=15:30 (repeatable)')
+        parser.add_argument('--samples', type=int, default=0,
+                            help='Resampled days per scenario instead of replaying history')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', dest='json_path', help='Also write the results here')
+
+    def handle(self, *args, **options):
+        stall = FoodStall.objects.filter(pk=options['stall_id']).first()
+        if stall is None:
+            raise CommandError(f"Stall {options['stall_id']} does not exist")
+        windows = slot_windows(BREAK_SLOT_CHOICES)
+        moves = []
+        for move in options['move_slot']:
+            old, _, new = move.partition('=')
+            if old not in windows or clock_minutes(new) is None:
+                raise CommandError(f'--move-slot expects OLD=NEW with OLD one of {", ".join(windows)} and NEW an HH:MM time, got {move!r}')
+            moves.append((old, new))
+        for name in ('days', 'workers'):
+            if options[name] is not None and options[name] < 1:
+                raise CommandError(f'--{name} must be at least 1')
+        if options['samples'] < 0:
+            raise CommandError('--samples must be zero or more')
+        if options['samples'] == 0 and options['demand_scale'] != [1.0]:
+            raise CommandError('--demand-scale applies to resampled days; add --samples N')
+
+        today = timezone.localdate()
+        days = load_days(stall.pk, today - timedelta(days=options['days']), today - timedelta(days=1))
+        if not days:
+            raise CommandError(f'No orders for {stall.name} in the last {options["days"]} days')
+        scenarios = scenario_grid(
+            options['stations'], options['batch'], options['prep_ahead'], options['work_factor'],
+            options['demand_scale'], moves,
+        )
+
+        started = time.perf_counter()
+        results = run_scenarios(
+            scenarios, days, windows, history=days, samples=options['samples'], seed=options['seed'],
+            workers=options['workers'],
+        )
+        elapsed = time.perf_counter() - started
+
+        waits = ''.join(f"{'p%d' % pct:>6}" for pct in PERCENTILES)
+        self.stdout.write(f"{'Scenario':<52} {'Days':>5} {'Orders':>7} {'Mean':>6}{waits} {'OnTime':>7} {'MaxQ':>5} {'AvgQ':>5} {'Util':>5}")
+        for scenario, summary in results:
+            percentiles = ''.join(f"{summary[f'p{pct}_wait']:>6.1f}" for pct in PERCENTILES)
+            self.stdout.write(
+                f"{scenario.label()[:52]:<52} {summary['days']:>5} {summary['orders']:>7} {summary['mean_wait']:>6.1f}"
+                f"{percentiles} {summary['on_time'] * 100:>6.0f}% {summary['max_queue']:>5} "
+                f"{summary['mean_queue']:>5.1f} {summary['utilisation'] * 100:>4.0f}%"
+            )
+        runs = sum(summary['days'] for _scenario, summary in results)
+        self.stdout.write(self.style.SUCCESS(
+            f'👩‍🍳 Simulated {len(results)} scenarios ({runs} kitchen days) for {stall.name} in {elapsed:.1f}s. '
+            f'Waits are minutes past the slot opening.'
+        ))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as out:
+                json.dump([{'scenario': scenario._asdict(), **summary} for scenario, summary in results], out, indent=2)
+            self.stdout.write(f"💾 Results written to {options['json_path']}")
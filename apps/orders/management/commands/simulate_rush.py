@@ -0,0 +1,99 @@
+"""
+Simulate a break rush against a running server.
+Usage:
+    python manage.py generate_orders --students 1000      # accounts and stalls to use
+    python manage.py runserver                            # in another terminal
+    python manage.py simulate_rush --students 400 --time-scale 60
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.orders.loadsim import RushSimulation, parse_arrivals, parse_clock
+from apps.orders.models import BREAK_SLOT_CHOICES
+from apps.stalls.models import FoodStall
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Drive a simulated break rush (orders, polling, owner updates) against a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--prefix', default='synth', help='Prefix used by generate_orders')
+        parser.add_argument('--password', default='pass1234')
+        parser.add_argument('--students', type=int, default=300, help='Students placing an order')
+        parser.add_argument('--owners', type=int, default=2, help='Owner dashboards pushing statuses')
+        parser.add_argument('--stalls', type=int, default=3, help='Open stalls to spread orders over')
+        parser.add_argument('--pollers-per-stall', type=int, default=5,
+                            help='Open pages refreshing slot demand per stall')
+        parser.add_argument('--slot-weights', default='12:00=0.55,13:00=0.45',
+                            help='Share of students ordering for each break slot')
+        parser.add_argument('--start', default='11:00', help='Simulated start time (HH:MM)')
+        parser.add_argument('--end', default='13:30', help='Simulated end time (HH:MM)')
+        parser.add_argument('--time-scale', type=float, default=60.0, help='Simulated seconds per real second')
+        parser.add_argument('--lead-minutes', type=float, default=45, help='Arrival peak before each slot')
+        parser.add_argument('--spread-minutes', type=float, default=20, help='Std deviation of arrivals')
+        parser.add_argument('--poll-seconds', type=float, default=10, help='Order status poll interval')
+        parser.add_argument('--double-submit-rate', type=float, default=0.0,
+                            help='Share of students posting their order form twice at once')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        try:
+            arrivals = parse_arrivals(options['slot_weights'], options['students'],
+                                      slots=[slot for slot, _label in BREAK_SLOT_CHOICES])
+        except ValueError as exc:
+            raise CommandError(f'--slot-weights expects SLOT=WEIGHT,... e.g. 12:00=0.55,13:00=0.45: {exc}')
+        today = timezone.localdate()
+        try:
+            start, end = parse_clock(options['start'], today), parse_clock(options['end'], today)
+        except ValueError:
+            raise CommandError('--start and --end expect HH:MM times')
+
+        prefix = options['prefix']
+        students = list(
+            User.objects.filter(username__startswith=f'{prefix}_student')
+            .order_by('id').values_list('username', flat=True)[:options['students']]
+        )
+        owner = f'{prefix}_owner'
+        stalls = {}
+        for stall in FoodStall.objects.filter(owner__username=owner, is_open=True).order_by('id')[:options['stalls']]:
+            items = list(stall.menu_items.filter(is_available=True).values_list('id', flat=True))
+            if items:
+                stalls[stall.id] = items
+        if not students or not stalls:
+            raise CommandError(f'No "{prefix}" students or stalls found; run generate_orders first')
+
+        simulation = RushSimulation(
+            options['base_url'], students, [owner] * options['owners'], stalls, arrivals,
+            start=start,
+            end=end,
+            time_scale=options['time_scale'],
+            lead_minutes=options['lead_minutes'],
+            spread_minutes=options['spread_minutes'],
+            poll_seconds=options['poll_seconds'],
+            double_submit_rate=options['double_submit_rate'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"🏃 Simulating {options['start']}-{options['end']} with {len(students)} students "
+            f"across {len(stalls)} stalls at {options['time_scale']:g}x..."
+        )
+        report = simulation.run(options['password'], pollers_per_stall=options['pollers_per_stall'])
+
+        self.stdout.write(f"\nWall time {report['wall_seconds']}s, counters: {report['counters']}\n")
+        self.stdout.write(f"{'endpoint':<22}{'reqs':>7}{'rps':>8}{'err%':>8}{'p50':>9}{'p95':>9}{'p99':>9}  errors")
+        for endpoint, stats in report['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<22}{stats['requests']:>7}{stats['throughput_rps']:>8.1f}"
+                f"{stats['error_rate'] * 100:>7.1f}%{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+                f"{stats['p99_ms']:>9.1f}  {stats['errors'] or ''}"
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w') as fh:
+                json.dump(report, fh, indent=2)
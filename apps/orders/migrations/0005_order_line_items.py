@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:01
+
+from django.db import migrations, models
+
+
+def backfill_line_items(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    order_ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(order_ids), 1000):
+        chunk = order_ids[start:start + 1000]
+        lines = {}
+        items = OrderItem.objects.filter(order_id__in=chunk).select_related('menu_item').order_by('id')
+        for item in items:
+            lines.setdefault(item.order_id, []).append({
+                'id': item.menu_item_id,
+                'name': item.menu_item.name,
+                'qty': item.quantity,
+                'price': str(item.price_at_order),
+                'prep': item.menu_item.prep_time_minutes,
+                'customization': item.customization,
+            })
+        orders = [Order(pk=pk, line_items=order_lines) for pk, order_lines in lines.items()]
+        Order.objects.bulk_update(orders, ['line_items'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='line_items',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_line_items, migrations.RunPython.noop),
+    ]
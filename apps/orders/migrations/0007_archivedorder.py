@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:22
+
+import apps.orders.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('stalls', '0004_review_feed_index'),
+        ('orders', '0006_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('break_slot', models.CharField(choices=[('10:00', '10:00 AM - 10:20 AM'), ('12:00', '12:00 PM - 12:30 PM'), ('13:00', '1:00 PM - 1:30 PM'), ('15:00', '3:00 PM - 3:20 PM')], max_length=5)),
+                ('pickup_date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('preparing', 'Preparing'), ('ready', 'Ready for Pickup'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('special_instructions', models.TextField(blank=True)),
+                ('token_number', models.CharField(blank=True, max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('line_items', models.JSONField(blank=True, default=list)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('stall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to='stalls.foodstall')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='archived_order_user_feed_idx'), models.Index(fields=['pickup_date'], name='archived_order_pickup_idx')],
+            },
+            bases=(apps.orders.models.OrderLinesMixin, models.Model),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stalls', '0004_review_feed_index'),
+        ('orders', '0007_archivedorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demandforecast',
+            name='lower_quantity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='demandforecast',
+            name='upper_quantity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ForecastState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('break_slot', models.CharField(choices=[('10:00', '10:00 AM - 10:20 AM'), ('12:00', '12:00 PM - 12:30 PM'), ('13:00', '1:00 PM - 1:30 PM'), ('15:00', '3:00 PM - 3:20 PM')], max_length=5)),
+                ('level', models.FloatField()),
+                ('trend', models.FloatField()),
+                ('season', models.JSONField()),
+                ('alpha', models.FloatField()),
+                ('beta', models.FloatField()),
+                ('gamma', models.FloatField()),
+                ('mse', models.FloatField()),
+                ('observations', models.IntegerField(default=0)),
+                ('last_date', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_states', to='stalls.menuitem')),
+                ('stall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_states', to='stalls.foodstall')),
+            ],
+            options={
+                'unique_together': {('stall', 'menu_item', 'break_slot')},
+            },
+        ),
+    ]
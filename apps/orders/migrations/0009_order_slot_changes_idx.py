@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_demand_forecast_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['stall', 'pickup_date', 'break_slot', 'updated_at'], name='order_slot_changes_idx'),
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
 from django.utils import timezone
 from apps.users.models import User
 from apps.stalls.models import FoodStall, MenuItem
+from apps.stalls.stock import release_stock
 
 
 BREAK_SLOT_CHOICES = [
@@ -21,7 +23,62 @@ ORDER_STATUS_CHOICES = [
 ]
 
 
-class Order(models.Model):
+class OrderQuerySet(models.QuerySet):
+    PREVIEW_ITEMS = 3
+
+    def with_item_totals(self):
+        """Annotate item_count, total_quantity and prep_minutes in SQL."""
+        return self.annotate(
+            item_count=models.Count('order_items'),
+            total_quantity=models.Sum('order_items__quantity'),
+            prep_minutes=models.Sum(
+                models.F('order_items__quantity') * models.F('order_items__menu_item__prep_time_minutes')
+            ),
+        )
+
+    def with_item_summary(self):
+        """
+        with_item_totals(), plus the stall and the first few line items
+        prefetched as `preview_items`.
+        """
+        preview = OrderItem.objects.select_related('menu_item').order_by('id')[:self.PREVIEW_ITEMS]
+        return self.with_item_totals().select_related('stall').prefetch_related(
+            models.Prefetch('order_items', queryset=preview, to_attr='preview_items')
+        )
+
+    def with_items(self):
+        """Prefetch every line item with its menu item, for detail pages."""
+        return self.select_related('stall').prefetch_related(
+            models.Prefetch('order_items', queryset=OrderItem.objects.select_related('menu_item'))
+        )
+
+
+class OrderLinesMixin:
+    """Template helpers over the `line_items` snapshot, shared with ArchivedOrder."""
+
+    @property
+    def lines(self):
+        """Snapshot lines with Decimal prices and subtotals, for templates."""
+        lines = []
+        for line in self.line_items:
+            price = Decimal(line['price'])
+            lines.append(dict(line, price=price, subtotal=price * line['qty']))
+        return lines
+
+    @property
+    def preview_lines(self):
+        return self.lines[:OrderQuerySet.PREVIEW_ITEMS]
+
+    @property
+    def extra_line_count(self):
+        return max(0, len(self.line_items) - OrderQuerySet.PREVIEW_ITEMS)
+
+    @property
+    def line_summary(self):
+        return ', '.join(f"{line['name']} ×{line['qty']}" for line in self.line_items)
+
+
+class Order(OrderLinesMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     stall = models.ForeignKey(FoodStall, on_delete=models.CASCADE, related_name='orders')
     break_slot = models.CharField(max_length=5, choices=BREAK_SLOT_CHOICES)
@@ -33,9 +90,29 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     estimated_ready_time = models.DateTimeField(null=True, blank=True)
+    # Lines frozen at order time so history pages never join OrderItem/MenuItem.
+    # OrderItem rows stay the source of truth for analytics.
+    line_items = models.JSONField(default=list, blank=True)
+    # Issued with the order form so a resubmitted POST maps back to this order
+    idempotency_key = models.CharField(max_length=64, blank=True, default='')
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination for order history and dashboard feeds
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_feed_idx'),
+            models.Index(fields=['pickup_date', '-created_at', '-id'], name='order_pickup_feed_idx'),
+            # Production sheet: orders of one stall/slot changed since a watermark
+            models.Index(fields=['stall', 'pickup_date', 'break_slot', 'updated_at'], name='order_slot_changes_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'idempotency_key'], condition=~models.Q(idempotency_key=''),
+                name='order_user_idempotency_key_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username} - {self.break_slot}"
@@ -51,14 +128,46 @@ class Order(models.Model):
             self.token_number = f"{today_str}{count:03d}"
         super().save(*args, **kwargs)
 
+    def snapshot_lines(self, order_items=None):
+        """Rebuild line_items from OrderItem rows and save it."""
+        if order_items is None:
+            order_items = self.order_items.select_related('menu_item').order_by('id')
+        self.line_items = [item.as_line() for item in order_items]
+        self.save(update_fields=['line_items'])
+
     def calculate_total(self):
         total = sum(item.subtotal for item in self.order_items.all())
         self.total_amount = total
         self.save(update_fields=['total_amount'])
         return total
 
+    def cancel(self, from_statuses=None):
+        """
+        Cancel the order and release its reserved stock.
+        Returns False if the order was already cancelled (or not in
+        `from_statuses`), so stock is never released twice.
+        """
+        orders = Order.objects.filter(pk=self.pk).exclude(status='cancelled')
+        if from_statuses:
+            orders = orders.filter(status__in=from_statuses)
+        with transaction.atomic():
+            if not orders.update(status='cancelled', updated_at=timezone.now()):
+                return False
+            release_stock(self)
+        self.status = 'cancelled'
+        return True
+
+    @property
+    def extra_item_count(self):
+        """Line items beyond the preview, for "+N more" labels."""
+        return max(0, self.item_count - len(self.preview_items))
+
     @property
     def estimated_prep_time(self):
+        if hasattr(self, 'prep_minutes'):
+            return self.prep_minutes or 0
+        if self.line_items:
+            return sum(line.get('prep', 0) * line['qty'] for line in self.line_items)
         return sum(item.menu_item.prep_time_minutes * item.quantity for item in self.order_items.all())
 
 
@@ -76,12 +185,57 @@ class OrderItem(models.Model):
     def subtotal(self):
         return self.price_at_order * self.quantity
 
+    def as_line(self):
+        """Compact snapshot of this line for Order.line_items."""
+        return {
+            'id': self.menu_item_id,
+            'name': self.menu_item.name,
+            'qty': self.quantity,
+            'price': str(self.price_at_order),
+            'prep': self.menu_item.prep_time_minutes,
+            'customization': self.customization,
+        }
+
     def save(self, *args, **kwargs):
         if not self.price_at_order:
             self.price_at_order = self.menu_item.price
         super().save(*args, **kwargs)
 
 
+class ArchivedOrder(OrderLinesMixin, models.Model):
+    """
+    A completed or cancelled order moved out of Order by `archive_orders`.
+    Keeps the original id; its items survive only in the line_items snapshot.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    stall = models.ForeignKey(FoodStall, on_delete=models.CASCADE, related_name='archived_orders')
+    break_slot = models.CharField(max_length=5, choices=BREAK_SLOT_CHOICES)
+    pickup_date = models.DateField()
+    status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    special_instructions = models.TextField(blank=True)
+    token_number = models.CharField(max_length=10, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    line_items = models.JSONField(default=list, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='archived_order_user_feed_idx'),
+            models.Index(fields=['pickup_date'], name='archived_order_pickup_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id} - {self.break_slot} {self.pickup_date}"
+
+    @property
+    def estimated_prep_time(self):
+        return sum(line.get('prep', 0) * line['qty'] for line in self.line_items)
+
+
 class DemandForecast(models.Model):
     """Stores demand forecast data for AI-based prediction"""
     stall = models.ForeignKey(FoodStall, on_delete=models.CASCADE, related_name='forecasts')
@@ -90,6 +244,8 @@ class DemandForecast(models.Model):
     forecast_date = models.DateField()
     day_of_week = models.IntegerField()  # 0=Monday, 6=Sunday
     predicted_quantity = models.IntegerField(default=0)
+    lower_quantity = models.IntegerField(default=0)  # 80% prediction interval
+    upper_quantity = models.IntegerField(default=0)
     actual_quantity = models.IntegerField(default=0)
     confidence_score = models.FloatField(default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -101,6 +257,32 @@ class DemandForecast(models.Model):
         return f"Forecast: {self.stall.name} | {self.break_slot} | {self.forecast_date}"
 
 
+class ForecastState(models.Model):
+    """
+    Fitted Holt-Winters state for one (stall, menu item, slot) series, so the
+    next forecasting run only has to feed in the days since `last_date`.
+    """
+    stall = models.ForeignKey(FoodStall, on_delete=models.CASCADE, related_name='forecast_states')
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='forecast_states')
+    break_slot = models.CharField(max_length=5, choices=BREAK_SLOT_CHOICES)
+    level = models.FloatField()
+    trend = models.FloatField()
+    season = models.JSONField()  # one additive term per weekday, Monday first
+    alpha = models.FloatField()
+    beta = models.FloatField()
+    gamma = models.FloatField()
+    mse = models.FloatField()  # exponentially weighted one-step squared error
+    observations = models.IntegerField(default=0)
+    last_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('stall', 'menu_item', 'break_slot')
+
+    def __str__(self):
+        return f"State: {self.menu_item} | {self.break_slot} | through {self.last_date}"
+
+
 class OrderAnalytics(models.Model):
     """Daily analytics snapshot"""
     stall = models.ForeignKey(FoodStall, on_delete=models.CASCADE, related_name='analytics')
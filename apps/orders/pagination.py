@@ -0,0 +1,97 @@
+"""
+Keyset (cursor) pagination for newest-first feeds.
+Pages are keyed on (created_at, id), so fetching page N costs the same as
+page 1 as long as the queryset is backed by a matching index.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj):
+    """Opaque cursor pointing just after `obj` in a newest-first feed."""
+    raw = json.dumps([obj.created_at.isoformat(), obj.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+class CursorPage:
+    def __init__(self, items, next_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def paginate_by_cursor(queryset, cursor=None, per_page=20):
+    """
+    Return one CursorPage of `queryset`, newest first.
+    An unreadable cursor falls back to the first page.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        try:
+            created_at, pk = decode_cursor(cursor)
+        except InvalidCursor:
+            pass
+        else:
+            # The leading created_at bound keeps this a range scan on the index
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return CursorPage(items[:per_page], next_cursor)
+
+
+def paginate_across(querysets, cursor=None, per_page=20):
+    """
+    Page through several querysets one after the other, each newest first,
+    e.g. live orders and then archived ones. Later querysets are only
+    queried once the earlier ones run out. Cursors are prefixed with the
+    index of the queryset they point into; unprefixed cursors point into
+    the first.
+    """
+    index, inner = 0, cursor
+    if cursor:
+        head, dot, rest = cursor.partition('.')
+        if dot and head.isdigit() and int(head) < len(querysets):
+            index, inner = int(head), rest
+
+    items = []
+    for i in range(index, len(querysets)):
+        page = paginate_by_cursor(querysets[i], inner if i == index else None, per_page - len(items))
+        items += page.items
+        if page.has_next:
+            return CursorPage(items, f'{i}.{page.next_cursor}')
+        if len(items) == per_page:
+            following = next((j for j in range(i + 1, len(querysets)) if querysets[j].exists()), None)
+            return CursorPage(items, f'{following}.' if following is not None else None)
+    return CursorPage(items)
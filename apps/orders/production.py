@@ -0,0 +1,187 @@
+"""
+Kitchen production sheet: how many of each item (and customization) a
+stall has to make for one date and slot.
+The first request builds running totals from the slot's OrderItem rows
+and caches them with a watermark (the newest Order.updated_at counted) and
+each order's status bucket and lines. Later requests read only the orders
+changed since the watermark, take their old lines out of the totals and
+add their current ones, so a refresh costs the same however many orders
+the slot already has. Orders changing status or lines touch updated_at
+(Order.save(), Order.cancel() and admin edits all do), which is what the
+watermark relies on. Forecasts from
+DemandForecast fill in what is still expected to be ordered.
+"""
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+OPEN_STATUSES = ('pending', 'confirmed', 'preparing')   # still to cook
+DONE_STATUSES = ('ready', 'completed')
+SHEET_CACHE_SECONDS = 24 * 60 * 60
+# Re-read changes this far behind the watermark: updated_at is stamped
+# before commit, so a slow transaction can land just behind it
+WATERMARK_OVERLAP = timedelta(seconds=10)
+
+
+def _bucket(status):
+    if status in OPEN_STATUSES:
+        return 'open'
+    if status in DONE_STATUSES:
+        return 'done'
+    return None
+
+
+def _cache_key(stall_id, day, slot):
+    return f'production:v2:{stall_id}:{day}:{slot}'
+
+
+def _slot_items(stall_id, day, slot):
+    from apps.orders.models import OrderItem
+    return OrderItem.objects.filter(order__stall_id=stall_id, order__pickup_date=day, order__break_slot=slot)
+
+
+def _order_lines(orders):
+    """
+    ({order id: (bucket, lines)}, newest updated_at) for `orders`; lines are
+    sorted (menu item, customization, quantity) tuples.
+    """
+    from apps.orders.models import OrderItem
+
+    entries, latest = {}, None
+    for pk, status, updated_at in orders.values_list('pk', 'status', 'updated_at'):
+        entries[pk] = (_bucket(status), [])
+        latest = updated_at if latest is None else max(latest, updated_at)
+    items = OrderItem.objects.filter(order__in=orders).values_list(
+        'order_id', 'menu_item_id', 'customization', 'quantity',
+    )
+    for order_id, item_id, customization, quantity in items:
+        if order_id in entries:
+            entries[order_id][1].append((item_id, customization, quantity))
+    return {pk: (bucket, tuple(sorted(lines)) if bucket else ()) for pk, (bucket, lines) in entries.items()}, latest
+
+
+def _add(totals, entry, sign):
+    bucket, lines = entry
+    if not bucket:
+        return
+    for item_id, customization, quantity in lines:
+        counts = totals.setdefault((item_id, customization), {'open': 0, 'done': 0})
+        counts[bucket] += sign * quantity
+
+
+def build_totals(stall_id, day, slot):
+    """Full build: the slot's orders with their buckets and lines, and the totals over them."""
+    from apps.orders.models import Order
+
+    orders = Order.objects.filter(stall_id=stall_id, pickup_date=day, break_slot=slot)
+    with transaction.atomic():  # both reads from one snapshot
+        entries, watermark = _order_lines(orders)
+    totals = {}
+    for entry in entries.values():
+        _add(totals, entry, 1)
+    return {'totals': totals, 'orders': entries, 'watermark': watermark}
+
+
+def apply_changes(state, stall_id, day, slot):
+    """
+    Fold orders updated since the watermark into `state`: their old lines
+    leave the totals and their current ones go in. Returns the number of
+    orders that changed.
+    """
+    from apps.orders.models import Order
+
+    changed = Order.objects.filter(stall_id=stall_id, pickup_date=day, break_slot=slot)
+    if state['watermark'] is not None:
+        changed = changed.filter(updated_at__gte=state['watermark'] - WATERMARK_OVERLAP)
+    # Lines read after their order can only be newer; such an order is read again next time
+    entries, latest = _order_lines(changed)
+    if latest is not None and (state['watermark'] is None or latest > state['watermark']):
+        state['watermark'] = latest
+
+    moved = 0
+    for order_id, entry in entries.items():
+        old = state['orders'].get(order_id)
+        if old == entry:
+            continue  # seen already (overlap window), or saved without changing its bucket or lines
+        if old:
+            _add(state['totals'], old, -1)
+        _add(state['totals'], entry, 1)
+        state['orders'][order_id] = entry
+        moved += 1
+    return moved
+
+
+def refresh_totals(stall_id, day, slot):
+    """Cached totals for a stall/date/slot, brought up to date."""
+    key = _cache_key(stall_id, day, slot)
+    state = cache.get(key)
+    if state is None:
+        state = build_totals(stall_id, day, slot)
+    elif not apply_changes(state, stall_id, day, slot):
+        return state
+    cache.set(key, state, SHEET_CACHE_SECONDS)
+    return state
+
+
+def slot_has_started(day, slot, now=None):
+    now = timezone.localtime(now)
+    start = timezone.make_aware(datetime.combine(day, datetime.strptime(slot, '%H:%M').time()))
+    return now >= start
+
+
+def production_sheet(stall, day, slot, now=None):
+    """
+    Per-item rows with ordered quantities (still to cook / done), a
+    customization breakdown, the item's forecast and how many more are
+    expected before the slot starts.
+    """
+    from apps.orders.models import DemandForecast
+
+    state = refresh_totals(stall.pk, day, slot)
+    forecasts = {
+        row['menu_item_id']: row
+        for row in DemandForecast.objects.filter(
+            stall=stall, forecast_date=day, break_slot=slot, menu_item__isnull=False,
+        ).values('menu_item_id', 'predicted_quantity', 'lower_quantity', 'upper_quantity')
+    }
+    accepting = not slot_has_started(day, slot, now)
+
+    items = {}
+    for (item_id, customization), counts in state['totals'].items():
+        if not counts['open'] and not counts['done']:
+            continue
+        item = items.setdefault(item_id, {'to_cook': 0, 'done': 0, 'customizations': []})
+        item['to_cook'] += counts['open']
+        item['done'] += counts['done']
+        if customization:
+            item['customizations'].append({'text': customization, 'quantity': counts['open'] + counts['done']})
+    for item_id in forecasts:
+        items.setdefault(item_id, {'to_cook': 0, 'done': 0, 'customizations': []})
+
+    names = dict(stall.menu_items.filter(pk__in=items).values_list('pk', 'name'))
+    rows = []
+    for item_id, item in items.items():
+        ordered = item['to_cook'] + item['done']
+        forecast = forecasts.get(item_id)
+        expected = max(forecast['predicted_quantity'] - ordered, 0) if forecast and accepting else 0
+        rows.append({
+            'menu_item_id': item_id,
+            'name': names.get(item_id, f'Item #{item_id}'),
+            'ordered': ordered,
+            'to_cook': item['to_cook'],
+            'done': item['done'],
+            'forecast': forecast['predicted_quantity'] if forecast else None,
+            'forecast_upper': forecast['upper_quantity'] if forecast else None,
+            'expected_more': expected,
+            'plan': item['to_cook'] + expected,
+            'customizations': sorted(item['customizations'], key=lambda c: -c['quantity']),
+        })
+    rows.sort(key=lambda row: (-row['plan'], row['name']))
+    return {
+        'orders': sum(1 for bucket, _lines in state['orders'].values() if bucket),
+        'accepting_orders': accepting,
+        'items': rows,
+        'updated_through': state['watermark'],
+    }
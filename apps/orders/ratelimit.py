@@ -0,0 +1,137 @@
+"""
+Rate limiting backed by Django's cache.
+Each bucket is a pair of fixed-window counters (current and previous
+window) bumped with the cache's atomic incr(); the previous window is
+weighted by how much of it still overlaps the sliding window. That
+behaves like a token bucket refilling at `limit / period`, with a burst of
+`limit`, while needing nothing but add/incr/get from the cache backend.
+Buckets are configured per view in settings.RATE_LIMITS, e.g.
+    RATE_LIMITS = {'place_order': {'user': '5/m', 'endpoint': '600/m'}}
+Scopes: 'user', 'ip', 'user_or_ip' (user when logged in, else IP) and
+'endpoint' (one bucket shared by everybody). Per-client buckets are
+checked first and the shared one last; a rejected request is refunded
+from every bucket it was counted in, so one client hammering a view uses
+up only its own bucket, not the endpoint's.
+Use a shared cache (Redis/Memcached) when running several processes;
+LocMemCache only limits per process.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'30/m' -> (30, 60); '100/5m' -> (100, 300)."""
+    count, _, period = rate.partition('/')
+    multiplier = int(period[:-1]) if period[:-1] else 1
+    return int(count), multiplier * PERIODS[period[-1]]
+
+
+def bucket_ident(request, scope):
+    if scope == 'endpoint':
+        return 'all'
+    if scope in ('user', 'user_or_ip') and request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    if scope == 'user':
+        return None  # anonymous requests are left to the login check
+    return 'ip' + request.META.get('REMOTE_ADDR', '')
+
+
+def _window_key(key, period, now):
+    return f'rl:{key}:{int(now // period)}'
+
+
+def refund(key, period, now):
+    """Take back a request counted by hit() at `now`."""
+    try:
+        cache.decr(_window_key(key, period, now))
+    except ValueError:  # window already expired
+        pass
+
+
+def hit(key, limit, period, now=None):
+    """
+    Count one request against `key`. Returns 0 when it is allowed, otherwise
+    the number of seconds until the bucket has room again; rejected requests
+    are not counted.
+    """
+    now = time.time() if now is None else now
+    window = int(now // period)
+    current_key = _window_key(key, period, now)
+    cache.add(current_key, 0, period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:  # expired between add() and incr()
+        cache.set(current_key, 1, period * 2)
+        current = 1
+    if current <= limit:
+        elapsed = (now % period) / period
+        previous = cache.get(f'rl:{key}:{window - 1}', 0)
+        if current + previous * (1 - elapsed) <= limit:
+            return 0
+        # Wait until enough of the previous window has slid out
+        retry_after = max(1, math.ceil(((1 - (limit - current) / previous) - elapsed) * period))
+    else:
+        retry_after = max(1, math.ceil(period - now % period))
+    refund(key, period, now)
+    return retry_after
+
+
+def check_rate_limits(request, name):
+    """
+    Seconds to wait if a bucket configured for `name` is exhausted, else 0.
+    Stops at the first bucket that rejects, refunding the ones already counted.
+    """
+    if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+        return 0
+    now = time.time()
+    buckets = getattr(settings, 'RATE_LIMITS', {}).get(name, {})
+    charged = []
+    for scope in sorted(buckets, key=lambda scope: scope == 'endpoint'):   # shared bucket last
+        ident = bucket_ident(request, scope)
+        if ident is None:
+            continue
+        key = f'{name}:{scope}:{ident}'
+        limit, period = parse_rate(buckets[scope])
+        retry_after = hit(key, limit, period, now)
+        if retry_after:
+            for charged_key, charged_period in charged:
+                refund(charged_key, charged_period, now)
+            return retry_after
+        charged.append((key, period))
+    return 0
+
+
+def too_many_requests(request, retry_after):
+    if '/api/' in request.path:
+        response = JsonResponse({'error': 'Too many requests', 'retry_after': retry_after}, status=429)
+    else:
+        response = HttpResponse(
+            f'Too many requests. Please wait {retry_after} seconds and try again.',
+            status=429, content_type='text/plain; charset=utf-8',
+        )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(name, methods=None):
+    """
+    Apply the RATE_LIMITS buckets configured under `name` to a view.
+    `methods` restricts limiting to those HTTP methods (e.g. ['POST']).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                retry_after = check_rate_limits(request, name)
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
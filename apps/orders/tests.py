@@ -0,0 +1,56 @@
+import json
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.orders.models import Order
+from apps.stalls.models import FoodStall, MenuItem, MenuItemStock
+from apps.users.models import User
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class DoubleSubmitTests(TransactionTestCase):
+    """Two posts of one order form at once must create one order."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('double', password='pw')
+        self.stall = FoodStall.objects.create(name='Dosa Corner')
+        self.item = MenuItem.objects.create(stall=self.stall, name='Masala Dosa', price='60.00')
+        self.today = timezone.now().date()
+        MenuItemStock.objects.create(menu_item=self.item, date=self.today, quantity=10, remaining=10)
+
+    def post_order(self, barrier, responses):
+        client = Client()
+        client.force_login(self.user)
+        data = {
+            'break_slot': '12:00',
+            'pickup_date': self.today.isoformat(),
+            'cart_data': json.dumps([{'id': self.item.pk, 'quantity': 2}]),
+            'idempotency_key': 'same-key',
+        }
+        try:
+            barrier.wait()
+            responses.append(client.post(reverse('place_order', args=[self.stall.pk]), data))
+        finally:
+            connection.close()   # this thread's own connection
+
+    def test_concurrent_submits_create_one_order(self):
+        barrier = threading.Barrier(2, timeout=10)
+        responses = []
+        threads = [threading.Thread(target=self.post_order, args=(barrier, responses)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+
+        self.assertEqual(Order.objects.count(), 1)
+        order = Order.objects.get()
+        self.assertEqual(MenuItemStock.objects.get(menu_item=self.item).remaining, 8)
+        self.assertEqual(len(responses), 2)
+        for response in responses:
+            self.assertRedirects(response, reverse('order_detail', args=[order.pk]), fetch_redirect_response=False)
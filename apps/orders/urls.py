@@ -8,7 +8,12 @@ urlpatterns = [
     path('orders/', views.my_orders, name='my_orders'),
     path('orders/<int:pk>/cancel/', views.cancel_order, name='cancel_order'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('export/<str:kind>/', views.export_data, name='export_data'),
+    path('production/<int:stall_id>/', views.production_sheet_view, name='production_sheet'),
     path('api/update-status/<int:pk>/', views.update_order_status, name='update_order_status'),
     path('api/slot-demand/', views.slot_demand_api, name='slot_demand_api'),
     path('api/order-status/<int:pk>/', views.order_status_api, name='order_status_api'),
+    path('api/my-orders/', views.my_orders_api, name='my_orders_api'),
+    path('api/recent-orders/', views.recent_orders_api, name='recent_orders_api'),
+    path('api/production/<int:stall_id>/', views.production_sheet_api, name='production_sheet_api'),
 ]
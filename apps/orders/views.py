@@ -1,23 +1,53 @@
 import json
+import uuid
 from datetime import date
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, transaction
 
-from apps.stalls.models import FoodStall, MenuItem
-from .models import Order, OrderItem, BREAK_SLOT_CHOICES, DemandForecast
+from apps.stalls.catalog import catalog_version
+from apps.stalls.models import FoodStall
+from apps.stalls.stock import OutOfStock, reserve_stock, exclude_sold_out
+from .models import ArchivedOrder, Order, OrderItem, BREAK_SLOT_CHOICES, DemandForecast
 from .forms import OrderForm
+from .exports import EXPORT_FORMATS, EXPORT_KINDS, export_filename, stream_export
+from .pagination import paginate_across, paginate_by_cursor
+from .production import production_sheet, slot_has_started
+from .ratelimit import rate_limit
 from .ai_demand import (
     get_slot_congestion_level, get_recommended_slot,
     get_peak_hours_analysis, predict_demand_for_slot
 )
 
 
+ORDERS_PER_PAGE = 20
+RECENT_ORDERS_PER_PAGE = 20
+# How long a submitted order form's key is remembered in the cache
+IDEMPOTENCY_CACHE_SECONDS = 10 * 60
+
+
+def _idempotency_cache_key(user, key):
+    return f'order-idempotency:{user.pk}:{key}'
+
+
+def _order_for_idempotency_key(user, key):
+    """Id of the order already placed with this form key, if any"""
+    if not key:
+        return None
+    order_id = cache.get(_idempotency_cache_key(user, key))
+    if order_id is None:
+        order_id = Order.objects.filter(user=user, idempotency_key=key).values_list('pk', flat=True).first()
+        if order_id:
+            cache.set(_idempotency_cache_key(user, key), order_id, IDEMPOTENCY_CACHE_SECONDS)
+    return order_id
+
+
 def home(request):
     stalls = FoodStall.objects.filter(is_open=True)[:6]
     today = timezone.now().date()
@@ -46,20 +76,29 @@ def home(request):
         'stalls': stalls,
         'slot_info': slot_info,
         'today_total_orders': today_orders.count(),
+        'catalog_version': catalog_version(),
     }
     return render(request, 'orders/home.html', context)
 
 
 @login_required
+@rate_limit('place_order', methods=['POST'])
 def place_order(request, stall_id):
     stall = get_object_or_404(FoodStall, pk=stall_id, is_open=True)
-    menu_items = stall.menu_items.filter(is_available=True)
     today = timezone.now().date()
+    menu_items = exclude_sold_out(stall.menu_items.filter(is_available=True), today)
 
     # Get slot recommendations
     slot_recommendations = get_recommended_slot(stall_id, today)
 
+    idempotency_key = request.POST.get('idempotency_key', '')[:64]
     if request.method == 'POST':
+        # A double click or retried POST returns the order the first submit created
+        existing_order_id = _order_for_idempotency_key(request.user, idempotency_key)
+        if existing_order_id:
+            messages.info(request, 'This order was already placed.')
+            return redirect('order_detail', pk=existing_order_id)
+
         form = OrderForm(request.POST)
         cart_data = request.POST.get('cart_data', '[]')
         try:
@@ -112,60 +151,79 @@ def place_order(request, stall_id):
         #     return redirect('order_detail', pk=order.pk)
 
         from decimal import Decimal
-        from django.db import transaction
 
         if form.is_valid():
-            with transaction.atomic():
-
-                slot = form.cleaned_data['break_slot']
-                pickup_date = form.cleaned_data['pickup_date']
-
-                level, current_count = get_slot_congestion_level(stall_id, slot, pickup_date)
-
-                if level == 'high':
-                    messages.warning(request, f'The {slot} slot is very busy ({current_count} orders).')
-
-                order = form.save(commit=False)
-                order.user = request.user
-                order.stall = stall
-                order.status = 'pending'
-                order.save()
-
-                total = Decimal('0.00')
-
-                for cart_item in cart:
-                    try:
-                        menu_item = MenuItem.objects.get(
-                            pk=cart_item['id'],
-                            stall=stall,
-                            is_available=True
-                        )
-
-                        qty = int(cart_item.get('quantity', 1))
-
-                        OrderItem.objects.create(
+            slot = form.cleaned_data['break_slot']
+            pickup_date = form.cleaned_data['pickup_date']
+
+            # Merge the cart into menu item id -> quantity
+            quantities = {}
+            customizations = {}
+            for cart_item in cart:
+                try:
+                    item_id = int(cart_item['id'])
+                    qty = int(cart_item.get('quantity', 1))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if qty < 1:
+                    continue
+                quantities[item_id] = quantities.get(item_id, 0) + qty
+                customizations.setdefault(item_id, cart_item.get('customization', ''))
+
+            cart_items = stall.menu_items.filter(is_available=True).in_bulk(list(quantities))
+            quantities = {item_id: qty for item_id, qty in quantities.items() if item_id in cart_items}
+
+            if not quantities:
+                messages.error(request, "Invalid cart items.")
+                return redirect('place_order', stall_id=stall_id)
+
+            try:
+                with transaction.atomic():
+                    level, current_count = get_slot_congestion_level(stall_id, slot, pickup_date)
+
+                    if level == 'high':
+                        messages.warning(request, f'The {slot} slot is very busy ({current_count} orders).')
+
+                    reserve_stock(quantities, pickup_date, slot)
+
+                    order = form.save(commit=False)
+                    order.user = request.user
+                    order.stall = stall
+                    order.status = 'pending'
+                    order.idempotency_key = idempotency_key
+                    order.save()
+
+                    total = Decimal('0.00')
+                    order_items = []
+                    for item_id, qty in quantities.items():
+                        menu_item = cart_items[item_id]
+                        order_items.append(OrderItem(
                             order=order,
                             menu_item=menu_item,
                             quantity=qty,
                             price_at_order=menu_item.price,
-                            customization=cart_item.get('customization', '')
-                        )
-
+                            customization=customizations[item_id]
+                        ))
                         total += menu_item.price * qty
-
-                    except (MenuItem.DoesNotExist, KeyError, ValueError):
-                        continue
-
-                if total == 0:
-                    order.delete()
-                    messages.error(request, "Invalid cart items.")
-                    return redirect('place_order', stall_id=stall_id)
-
-                order.total_amount = total
-                order.save()
-
-                messages.success(request, f'Order placed! Your token number is #{order.token_number}')
-                return redirect('order_detail', pk=order.pk)        
+                    OrderItem.objects.bulk_create(order_items)
+
+                    order.total_amount = total
+                    order.line_items = [item.as_line() for item in order_items]
+                    order.save(update_fields=['total_amount', 'line_items'])
+            except OutOfStock as exc:
+                messages.error(request, str(exc))
+                return redirect('place_order', stall_id=stall_id)
+            except IntegrityError:
+                # A concurrent submit with the same key committed first
+                existing_order_id = _order_for_idempotency_key(request.user, idempotency_key)
+                if not existing_order_id:
+                    raise
+                return redirect('order_detail', pk=existing_order_id)
+
+            if idempotency_key:
+                cache.set(_idempotency_cache_key(request.user, idempotency_key), order.pk, IDEMPOTENCY_CACHE_SECONDS)
+            messages.success(request, f'Order placed! Your token number is #{order.token_number}')
+            return redirect('order_detail', pk=order.pk)
     else:
         form = OrderForm()
 
@@ -175,13 +233,16 @@ def place_order(request, stall_id):
         'form': form,
         'slot_recommendations': slot_recommendations,
         'break_slots': BREAK_SLOT_CHOICES,
+        'idempotency_key': idempotency_key or uuid.uuid4().hex,
     }
     return render(request, 'orders/place_order.html', context)
 
 
 @login_required
 def order_detail(request, pk):
-    order = get_object_or_404(Order, pk=pk, user=request.user)
+    order = Order.objects.select_related('stall').filter(pk=pk, user=request.user).first()
+    if order is None:
+        order = get_object_or_404(ArchivedOrder.objects.select_related('stall'), pk=pk, user=request.user)
     statuses = ['pending', 'confirmed', 'preparing', 'ready', 'completed']
 
     return render(request, 'orders/order_detail.html', {
@@ -190,24 +251,56 @@ def order_detail(request, pk):
     })
 
 
-@login_required
-def my_orders(request):
-    orders = Order.objects.filter(user=request.user).select_related('stall').prefetch_related('order_items__menu_item')
+def _my_orders_querysets(request):
+    """Live and archived order history for the user, filtered alike"""
+    orders = Order.objects.filter(user=request.user).select_related('stall')
+    archived = ArchivedOrder.objects.filter(user=request.user).select_related('stall')
     status_filter = request.GET.get('status')
     if status_filter:
         orders = orders.filter(status=status_filter)
+        archived = archived.filter(status=status_filter)
+    return [orders, archived], status_filter
+
+
+def _order_summary_json(order):
+    return {
+        'id': order.pk,
+        'token': order.token_number,
+        'stall': order.stall.name,
+        'break_slot': order.break_slot,
+        'pickup_date': order.pickup_date.isoformat(),
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'total_amount': str(order.total_amount),
+        'created_at': order.created_at.isoformat(),
+    }
+
+
+@login_required
+def my_orders(request):
+    history, status_filter = _my_orders_querysets(request)
+    page = paginate_across(history, request.GET.get('cursor'), per_page=ORDERS_PER_PAGE)
     return render(request, 'orders/my_orders.html', {
-        'orders': orders,
+        'orders': page,
         'status_filter': status_filter,
     })
 
 
+@login_required
+def my_orders_api(request):
+    """Order history feed, one cursor page at a time"""
+    history, status_filter = _my_orders_querysets(request)
+    page = paginate_across(history, request.GET.get('cursor'), per_page=ORDERS_PER_PAGE)
+    return JsonResponse({
+        'orders': [dict(_order_summary_json(o), items=o.line_items) for o in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
 @login_required
 def cancel_order(request, pk):
     order = get_object_or_404(Order, pk=pk, user=request.user)
-    if order.status in ('pending', 'confirmed'):
-        order.status = 'cancelled'
-        order.save()
+    if order.cancel(from_statuses=('pending', 'confirmed')):
         messages.success(request, 'Order cancelled successfully.')
     else:
         messages.error(request, 'This order cannot be cancelled.')
@@ -216,6 +309,13 @@ def cancel_order(request, pk):
 
 # ---- Admin/Stall Owner Views ----
 
+def _dashboard_orders(request, pickup_date):
+    orders = Order.objects.filter(pickup_date=pickup_date)
+    if request.user.is_stall_owner:
+        orders = orders.filter(stall__owner=request.user)
+    return orders
+
+
 @login_required
 def admin_dashboard(request):
     if not request.user.is_staff and not request.user.is_stall_owner:
@@ -228,23 +328,32 @@ def admin_dashboard(request):
         stalls = stalls.filter(owner=request.user)
 
     # Today's orders
-    today_orders = Order.objects.filter(pickup_date=today)
-    if request.user.is_stall_owner:
-        today_orders = today_orders.filter(stall__owner=request.user)
-
-    # Slot-wise breakdown
+    today_orders = _dashboard_orders(request, today)
+
+    # Slot-wise breakdown, one grouped query for all slots
+    slot_stats = {
+        row['break_slot']: row
+        for row in today_orders.values('break_slot').annotate(
+            count=Count('id'),
+            revenue=Sum('total_amount'),
+            pending=Count('id', filter=Q(status='pending')),
+            preparing=Count('id', filter=Q(status='preparing')),
+            ready=Count('id', filter=Q(status='ready')),
+            completed=Count('id', filter=Q(status='completed')),
+        )
+    }
     slot_breakdown = []
     for slot_value, slot_label in BREAK_SLOT_CHOICES:
-        slot_orders = today_orders.filter(break_slot=slot_value)
+        stats = slot_stats.get(slot_value, {})
         slot_breakdown.append({
             'slot': slot_label,
             'value': slot_value,
-            'count': slot_orders.count(),
-            'revenue': slot_orders.aggregate(r=Sum('total_amount'))['r'] or 0,
-            'pending': slot_orders.filter(status='pending').count(),
-            'preparing': slot_orders.filter(status='preparing').count(),
-            'ready': slot_orders.filter(status='ready').count(),
-            'completed': slot_orders.filter(status='completed').count(),
+            'count': stats.get('count', 0),
+            'revenue': stats.get('revenue') or 0,
+            'pending': stats.get('pending', 0),
+            'preparing': stats.get('preparing', 0),
+            'ready': stats.get('ready', 0),
+            'completed': stats.get('completed', 0),
         })
 
     # Demand predictions for tomorrow
@@ -260,12 +369,17 @@ def admin_dashboard(request):
                 'confidence': round(confidence * 100),
             })
 
-    # Recent orders
-    recent_orders = today_orders.order_by('-created_at')[:20]
+    # Recent orders, with item counts and prep time summed in SQL
+    recent_orders = paginate_by_cursor(
+        today_orders.with_item_summary().select_related('user'),
+        request.GET.get('cursor'),
+        per_page=RECENT_ORDERS_PER_PAGE,
+    )
 
     context = {
         'today': today,
         'tomorrow': tomorrow,
+        'export_start': today - timezone.timedelta(days=30),
         'stalls': stalls,
         'today_orders_count': today_orders.count(),
         'today_revenue': today_orders.aggregate(r=Sum('total_amount'))['r'] or 0,
@@ -277,6 +391,84 @@ def admin_dashboard(request):
     return render(request, 'orders/admin_dashboard.html', context)
 
 
+@login_required
+def export_data(request, kind):
+    """Stream orders, line items or daily analytics as CSV/JSONL, optionally gzipped"""
+    if not request.user.is_staff and not request.user.is_stall_owner:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    fmt = request.GET.get('format', 'csv')
+    if kind not in EXPORT_KINDS or fmt not in EXPORT_FORMATS:
+        raise Http404('Unknown export')
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD'}, status=400)
+    try:
+        stall_id = int(request.GET['stall']) if request.GET.get('stall') else None
+    except ValueError:
+        return JsonResponse({'error': 'stall must be a stall id'}, status=400)
+
+    stalls = FoodStall.objects.all()
+    if not request.user.is_staff:
+        stalls = stalls.filter(owner=request.user)
+    if stall_id is not None:
+        stalls = stalls.filter(pk=stall_id)
+    stall_ids = list(stalls.values_list('pk', flat=True))
+    compress = request.GET.get('gzip') == '1'
+
+    response = StreamingHttpResponse(
+        stream_export(kind, fmt, stall_ids, start, end, compress),
+        content_type='application/gzip' if compress else EXPORT_FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(kind, fmt, start, end, compress)}"'
+    return response
+
+
+def _production_params(request, stall_id):
+    """(stall, date, slot) for a production sheet request, or None if not allowed"""
+    stall = get_object_or_404(FoodStall, pk=stall_id)
+    if not request.user.is_staff and stall.owner_id != request.user.pk:
+        return None
+    try:
+        day = date.fromisoformat(request.GET['date']) if request.GET.get('date') else timezone.localdate()
+    except ValueError:
+        day = timezone.localdate()
+    slots = [value for value, _label in BREAK_SLOT_CHOICES]
+    slot = request.GET.get('slot')
+    if slot not in slots:
+        # Default to the next slot that hasn't started yet
+        slot = next((value for value in slots if not slot_has_started(day, value)), slots[-1])
+    return stall, day, slot
+
+
+@login_required
+def production_sheet_view(request, stall_id):
+    """What the kitchen has to make for one slot, per item and customization"""
+    params = _production_params(request, stall_id)
+    if params is None:
+        messages.error(request, 'Access denied.')
+        return redirect('home')
+    stall, day, slot = params
+    return render(request, 'orders/production_sheet.html', {
+        'stall': stall,
+        'day': day,
+        'slot': slot,
+        'slots': BREAK_SLOT_CHOICES,
+        'sheet': production_sheet(stall, day, slot),
+    })
+
+
+@login_required
+def production_sheet_api(request, stall_id):
+    params = _production_params(request, stall_id)
+    if params is None:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    stall, day, slot = params
+    sheet = production_sheet(stall, day, slot)
+    return JsonResponse({'stall': stall.pk, 'date': day.isoformat(), 'slot': slot, **sheet})
+
+
 @login_required
 @require_POST
 def update_order_status(request, pk):
@@ -288,12 +480,34 @@ def update_order_status(request, pk):
     valid_statuses = [s[0] for s in Order._meta.get_field('status').choices]
 
     if new_status in valid_statuses:
-        order.status = new_status
-        order.save()
+        if new_status == 'cancelled':
+            # Releases reserved stock exactly once
+            order.cancel()
+        elif Order.objects.filter(pk=order.pk).exclude(status='cancelled').update(
+                status=new_status, updated_at=timezone.now()):
+            order.status = new_status
+        else:
+            # Its stock went back on cancel; reopening would oversell
+            return JsonResponse({'error': 'Cancelled orders cannot be reopened'}, status=400)
         return JsonResponse({'success': True, 'status': new_status, 'status_display': order.get_status_display()})
     return JsonResponse({'error': 'Invalid status'}, status=400)
 
 
+@login_required
+def recent_orders_api(request):
+    """Dashboard feed of today's orders, one cursor page at a time"""
+    if not request.user.is_staff and not request.user.is_stall_owner:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    orders = _dashboard_orders(request, timezone.now().date()).select_related('user', 'stall')
+    page = paginate_by_cursor(orders, request.GET.get('cursor'), per_page=RECENT_ORDERS_PER_PAGE)
+    return JsonResponse({
+        'orders': [dict(_order_summary_json(o), student=o.user.get_full_name() or o.user.username) for o in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
+@rate_limit('slot_demand_api')
 def slot_demand_api(request):
     """Real-time slot demand data API"""
     stall_id = request.GET.get('stall_id')
@@ -317,6 +531,7 @@ def slot_demand_api(request):
     return JsonResponse({'slots': result, 'date': pickup_date_str})
 
 
+@rate_limit('order_status_api')
 def order_status_api(request, pk):
     """Real-time order status check"""
     try:
@@ -325,6 +540,7 @@ def order_status_api(request, pk):
             'status': order.status,
             'status_display': order.get_status_display(),
             'token': order.token_number,
+            'items': order.line_items,
         })
     except Order.DoesNotExist:
         return JsonResponse({'error': 'Not found'}, status=404)
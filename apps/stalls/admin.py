@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FoodStall, MenuItem, StallReview
+from .models import FoodStall, MenuItem, MenuItemStock, StallReview
 
 
 @admin.register(FoodStall)
@@ -16,6 +16,14 @@ class MenuItemAdmin(admin.ModelAdmin):
     search_fields = ['name', 'stall__name']
 
 
+@admin.register(MenuItemStock)
+class MenuItemStockAdmin(admin.ModelAdmin):
+    list_display = ['menu_item', 'date', 'break_slot', 'quantity', 'remaining']
+    list_filter = ['date', 'break_slot', 'menu_item__stall']
+    list_select_related = ['menu_item', 'menu_item__stall']
+    search_fields = ['menu_item__name']
+
+
 @admin.register(StallReview)
 class StallReviewAdmin(admin.ModelAdmin):
     list_display = ['user', 'stall', 'rating', 'created_at']
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class StallsConfig(AppConfig):
+    name = 'apps.stalls'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,33 @@
+"""
+Catalog cache versioning.
+Anything cached from menus or stalls should put catalog_version() in its
+cache key. Bumping the version makes every such entry unreachable at once,
+so writers invalidate with one cache call instead of deleting keys one by one.
+Versions are clock tokens rather than counters: a version evicted from the
+cache comes back as a new, larger token, never as one an old entry
+(such as a cached fragment, which may outlive it) was stored under.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(stall_id=None):
+    return f'catalog-version:{stall_id or "all"}'
+
+
+def catalog_version(stall_id=None):
+    """Current version of one stall's menu, or of the whole catalog."""
+    key = _version_key(stall_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):   # another request set it first
+            version = cache.get(key, version)
+    return version
+
+
+def bump_catalog_version(*stall_ids):
+    """Invalidate catalog caches for these stalls and the catalog as a whole."""
+    for key in [_version_key(stall_id) for stall_id in stall_ids] + [_version_key()]:
+        cache.set(key, max(time.time_ns(), cache.get(key, 0) + 1), None)
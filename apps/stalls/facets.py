@@ -0,0 +1,159 @@
+"""
+Faceted browsing of a stall's menu: category, vegetarian, price,
+calories and prep time.
+Each available item is reduced to its facet values, (category, veg,
+price range, calorie range, prep range), with one query, and items with
+the same values are grouped into a cell. The cells are cached per stall
+under its catalog_version, so menu edits invalidate them. Counts for the
+filter sidebar come from the cells in Python, with no query per facet
+value, and cost the same however many items share a cell. Items sold out today are left out
+of the counts, because stock changes do not bump the catalog version.
+A value's count is the number of items that would be shown if it were
+picked, with the other facets' filters still applied.
+"""
+from collections import Counter, namedtuple
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .catalog import catalog_version
+from .models import MenuItem
+
+FACET_CACHE_SECONDS = 24 * 60 * 60
+
+Range = namedtuple('Range', 'value label low high')   # low <= x < high; None is unbounded
+
+RANGES = {
+    'price': ('price', [
+        Range('under-50', 'Under ₹50', None, 50),
+        Range('50-100', '₹50 – ₹100', 50, 100),
+        Range('100-150', '₹100 – ₹150', 100, 150),
+        Range('150-up', '₹150 and up', 150, None),
+    ]),
+    'calories': ('calories', [
+        Range('under-200', 'Under 200 cal', None, 200),
+        Range('200-400', '200 – 400 cal', 200, 400),
+        Range('400-600', '400 – 600 cal', 400, 600),
+        Range('600-up', '600 cal and up', 600, None),
+    ]),
+    'prep': ('prep_time_minutes', [
+        Range('under-10', 'Under 10 min', None, 10),
+        Range('10-20', '10 – 20 min', 10, 20),
+        Range('20-up', '20 min and up', 20, None),
+    ]),
+}
+
+# Facet parameters, in the order of the values in a facet row (after pk)
+FACETS = ('category', 'veg', 'price', 'calories', 'prep')
+TITLES = {'category': 'Category', 'veg': 'Diet', 'price': 'Price', 'calories': 'Calories', 'prep': 'Prep time'}
+
+
+def facet_options(facet):
+    """[(value, label)] for one facet."""
+    if facet == 'category':
+        return MenuItem.CATEGORY_CHOICES
+    if facet == 'veg':
+        return [('1', 'Vegetarian')]
+    return [(rng.value, rng.label) for rng in RANGES[facet][1]]
+
+
+def parse_filters(params):
+    """{facet: value or None} from GET parameters; unknown values are ignored."""
+    filters = {}
+    for facet in FACETS:
+        value = params.get(facet)
+        filters[facet] = value if value in dict(facet_options(facet)) else None
+    return filters
+
+
+def _range_of(facet, amount):
+    if amount is None:
+        return None   # no calories listed: matches no calorie range
+    for rng in RANGES[facet][1]:
+        if (rng.low is None or amount >= rng.low) and (rng.high is None or amount < rng.high):
+            return rng.value
+    return None
+
+
+def filter_menu(menu_items, filters):
+    """Narrow a MenuItem queryset to the selected facet values."""
+    if filters['category']:
+        menu_items = menu_items.filter(category=filters['category'])
+    if filters['veg']:
+        menu_items = menu_items.filter(is_vegetarian=True)
+    for facet, (field, ranges) in RANGES.items():
+        if filters[facet]:
+            rng = next(r for r in ranges if r.value == filters[facet])
+            bounds = Q()
+            if rng.low is not None:
+                bounds &= Q(**{f'{field}__gte': rng.low})
+            if rng.high is not None:
+                bounds &= Q(**{f'{field}__lt': rng.high})
+            menu_items = menu_items.filter(bounds)
+    return menu_items
+
+
+def filter_query(filters, **changes):
+    """Query string for the current filters with `changes` applied (None removes a facet)."""
+    values = {**filters, **changes}
+    return urlencode([(facet, values[facet]) for facet in FACETS if values[facet]])
+
+
+def facet_rows(stall_id):
+    """
+    Cached facets of a stall's available items: {'cells': Counter(values ->
+    items)} for counting, and {'items': {pk: values}} to take sold-out items
+    back out.
+    """
+    key = f'menu-facets:{stall_id}:{catalog_version(stall_id)}'
+    rows = cache.get(key)
+    if rows is None:
+        items = {
+            pk: (category, '1' if veg else None, _range_of('price', price),
+                 _range_of('calories', calories), _range_of('prep', prep))
+            for pk, category, veg, price, calories, prep in MenuItem.objects.filter(
+                stall_id=stall_id, is_available=True,
+            ).values_list('pk', 'category', 'is_vegetarian', 'price', 'calories', 'prep_time_minutes')
+        }
+        rows = {'cells': Counter(items.values()), 'items': items}
+        cache.set(key, rows, FACET_CACHE_SECONDS)
+    return rows
+
+
+def facet_counts(rows, filters, hidden=()):
+    """
+    {facet: Counter(value -> items)}. Items failing one facet's filter are
+    counted for that facet only; items failing two are not counted at all.
+    """
+    cells = rows['cells']
+    hidden = [rows['items'][pk] for pk in hidden if pk in rows['items']]
+    if hidden:
+        cells = cells - Counter(hidden)
+    selected = [filters[facet] for facet in FACETS]
+    counts = {facet: Counter() for facet in FACETS}
+    for values, items in cells.items():
+        misses = [index for index, want in enumerate(selected) if want and values[index] != want]
+        if not misses:
+            for index, facet in enumerate(FACETS):
+                counts[facet][values[index]] += items
+        elif len(misses) == 1:
+            counts[FACETS[misses[0]]][values[misses[0]]] += items
+    return counts
+
+
+def sidebar(filters, counts):
+    """Facet groups for the template; picking a selected value again clears it."""
+    groups = []
+    for facet in FACETS:
+        options = []
+        for value, label in facet_options(facet):
+            selected = filters[facet] == value
+            options.append({
+                'label': label,
+                'count': counts[facet][value],
+                'selected': selected,
+                'query': filter_query(filters, **{facet: None if selected else value}),
+            })
+        groups.append({'name': facet, 'title': TITLES[facet], 'options': options})
+    return groups
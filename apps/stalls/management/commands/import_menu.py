@@ -0,0 +1,36 @@
+"""
+Bulk-update a stall's menu from a CSV file.
+Usage:
+    python manage.py import_menu 3 menu.csv --dry-run
+    python manage.py import_menu 3 menu.csv --keep-missing
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.stalls.menu_import import MenuImportError, import_menu, parse_menu_csv
+from apps.stalls.models import FoodStall
+
+
+class Command(BaseCommand):
+    help = "Diff a CSV against a stall's menu and apply it in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('stall_id', type=int)
+        parser.add_argument('csv_path')
+        parser.add_argument('--keep-missing', action='store_true',
+                            help='Leave items that are not in the file available')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the diff')
+
+    def handle(self, *args, **options):
+        try:
+            stall = FoodStall.objects.get(pk=options['stall_id'])
+        except FoodStall.DoesNotExist:
+            raise CommandError(f"Stall {options['stall_id']} does not exist")
+        with open(options['csv_path'], encoding='utf-8-sig', newline='') as fh:
+            try:
+                rows = parse_menu_csv(fh)
+            except MenuImportError as exc:
+                raise CommandError('\n'.join(f'line {line}: {message}' for line, message in exc.errors))
+
+        result = import_menu(stall, rows, deactivate_missing=not options['keep_missing'], dry_run=options['dry_run'])
+        prefix = 'Would apply' if options['dry_run'] else '🍽️  Imported'
+        self.stdout.write(self.style.SUCCESS(f'{prefix} {len(rows)} rows to {stall.name}: {result} ({result.seconds:.2f}s)'))
@@ -0,0 +1,26 @@
+"""
+Rebuild the catalog search index from scratch (after loaddata or raw SQL
+edits to stalls and menu items).
+Usage:
+    python manage.py rebuild_search_index
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.stalls.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Re-index every stall and menu item for catalog search'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        started = time.perf_counter()
+        with transaction.atomic():
+            rows = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'🔎 Indexed {rows} stalls and menu items with {type(backend).__name__} '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,172 @@
+"""
+Bulk menu import from CSV.
+The uploaded file is diffed against the stall's current menu by item name
+(case-insensitive) and applied with one bulk_create, one bulk_update and
+one UPDATE for items missing from the file, then the stall is re-indexed
+for search and catalog caches are invalidated once. Columns: name, price (required); category, description,
+prep_time_minutes, calories, is_vegetarian, is_available (optional).
+"""
+import csv
+import io
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .catalog import bump_catalog_version
+from .models import MenuItem
+from .search import get_backend
+
+CSV_COLUMNS = ['name', 'price', 'category', 'description', 'prep_time_minutes', 'calories',
+               'is_vegetarian', 'is_available']
+UPDATE_FIELDS = ['name', 'price', 'category', 'description', 'prep_time_minutes', 'calories',
+                 'is_vegetarian', 'is_available']
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+CATEGORIES = dict(MenuItem.CATEGORY_CHOICES)
+CATEGORY_LABELS = {label.lower(): value for value, label in MenuItem.CATEGORY_CHOICES}
+
+
+class MenuImportError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors  # [(line number, message)]
+        super().__init__(f'{len(errors)} invalid rows')
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deactivated = 0
+        self.seconds = 0.0
+
+    def __str__(self):
+        return (f'{self.created} created, {self.updated} updated, {self.unchanged} unchanged, '
+                f'{self.deactivated} marked unavailable')
+
+
+def _parse_bool(value, default):
+    value = (value or '').strip().lower()
+    return value in TRUE_VALUES if value else default
+
+
+def _parse_int(value, default, column):
+    value = (value or '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{column} must be a whole number') from None
+
+
+def _parse_price(value):
+    value = (value or '').strip()
+    if not value:
+        raise ValueError('price is empty')
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValueError('price must be a number') from None
+    if not price.is_finite():
+        raise ValueError('price must be a number')
+    return price
+
+
+def parse_menu_csv(fileobj):
+    """
+    Read CSV text or bytes into {lowercased name: field dict}.
+    Raises MenuImportError listing every bad row.
+    """
+    if isinstance(fileobj, (bytes, bytearray)):
+        fileobj = io.StringIO(fileobj.decode('utf-8-sig'))
+    reader = csv.DictReader(fileobj)
+    missing = {'name', 'price'} - set(reader.fieldnames or [])
+    if missing:
+        raise MenuImportError([(1, f"Missing column(s): {', '.join(sorted(missing))}")])
+
+    rows = {}
+    errors = []
+    for line, raw in enumerate(reader, start=2):
+        name = (raw.get('name') or '').strip()
+        try:
+            if not name:
+                raise ValueError('name is empty')
+            if name.lower() in rows:
+                raise ValueError(f'duplicate item "{name}"')
+            price = _parse_price(raw.get('price'))
+            if price < 0:
+                raise ValueError('price is negative')
+            category = (raw.get('category') or 'snacks').strip().lower()
+            category = CATEGORY_LABELS.get(category, category)
+            if category not in CATEGORIES:
+                raise ValueError(f'unknown category "{category}"')
+            rows[name.lower()] = {
+                'name': name,
+                'price': price.quantize(Decimal('0.01')),
+                'category': category,
+                'description': (raw.get('description') or '').strip(),
+                'prep_time_minutes': _parse_int(raw.get('prep_time_minutes'), 10, 'prep_time_minutes'),
+                'calories': _parse_int(raw.get('calories'), None, 'calories'),
+                'is_vegetarian': _parse_bool(raw.get('is_vegetarian'), False),
+                'is_available': _parse_bool(raw.get('is_available'), True),
+            }
+        except ValueError as exc:
+            errors.append((line, str(exc)))
+    if errors:
+        raise MenuImportError(errors)
+    return rows
+
+
+def import_menu(stall, rows, deactivate_missing=True, dry_run=False):
+    """Apply parsed rows to `stall`'s menu. Returns an ImportResult."""
+    result = ImportResult()
+    started = time.perf_counter()
+    with transaction.atomic():
+        current = {item.name.lower(): item for item in stall.menu_items.all()}
+        to_create = []
+        to_update = []
+        changed_fields = set()
+        for key, fields in rows.items():
+            item = current.get(key)
+            if item is None:
+                to_create.append(MenuItem(stall=stall, **fields))
+                continue
+            changed = [field for field, value in fields.items() if getattr(item, field) != value]
+            if not changed:
+                result.unchanged += 1
+                continue
+            for field in changed:
+                setattr(item, field, fields[field])
+            changed_fields.update(changed)
+            to_update.append(item)
+        missing_ids = [
+            item.pk for key, item in current.items() if key not in rows and item.is_available
+        ] if deactivate_missing else []
+
+        result.created = len(to_create)
+        result.updated = len(to_update)
+        result.deactivated = len(missing_ids)
+        if dry_run:
+            result.seconds = time.perf_counter() - started
+            return result
+
+        MenuItem.objects.bulk_create(to_create)
+        if to_update:
+            # Only the columns that changed somewhere; each one adds a CASE to the UPDATE
+            MenuItem.objects.bulk_update(to_update, [f for f in UPDATE_FIELDS if f in changed_fields])
+        if missing_ids:
+            MenuItem.objects.filter(pk__in=missing_ids).update(is_available=False)
+        if to_create or to_update or missing_ids:
+            get_backend().index_stalls([stall.pk])
+            transaction.on_commit(lambda: bump_catalog_version(stall.pk))
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def export_menu_csv(stall, out):
+    """Write the stall's menu in the import format, for editing and re-upload."""
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for row in stall.menu_items.order_by('category', 'name').values_list(*CSV_COLUMNS):
+        writer.writerow(row)
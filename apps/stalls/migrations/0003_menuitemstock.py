@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stalls', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('break_slot', models.CharField(blank=True, max_length=5)),
+                ('quantity', models.PositiveIntegerField()),
+                ('remaining', models.PositiveIntegerField(blank=True)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_caps', to='stalls.menuitem')),
+            ],
+            options={
+                'unique_together': {('menu_item', 'date', 'break_slot')},
+            },
+        ),
+    ]
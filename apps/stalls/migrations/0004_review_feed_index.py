@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stalls', '0003_menuitemstock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stallreview',
+            index=models.Index(fields=['stall', '-created_at', '-id'], name='review_stall_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Full-text search index over stalls and menu items (SQLite FTS5, see apps/stalls/search.py)
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return  # other databases use the ORM search backend
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE stalls_search USING fts5("
+        "name, stall, location, description, tags, stall_id UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    # Item rows use rowid = id, stall rows 2^40 + id; tags hold the search filters
+    schema_editor.execute(
+        "INSERT INTO stalls_search (rowid, name, stall, location, description, tags, stall_id) "
+        "SELECT i.id, i.name, s.name, s.location, i.description, "
+        "'item ' || i.category || CASE WHEN i.is_vegetarian THEN ' veg veg' || i.category ELSE ' nonveg' END"
+        " || CASE WHEN i.is_available AND s.is_open THEN '' ELSE ' hidden' END, s.id "
+        "FROM stalls_menuitem i JOIN stalls_foodstall s ON s.id = i.stall_id"
+    )
+    schema_editor.execute(
+        "INSERT INTO stalls_search (rowid, name, stall, location, description, tags, stall_id) "
+        "SELECT 1099511627776 + s.id, s.name, '', s.location, s.description, "
+        "'stall' || CASE WHEN s.is_open THEN '' ELSE ' hidden' END, s.id "
+        "FROM stalls_foodstall s"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS stalls_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stalls', '0004_review_feed_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
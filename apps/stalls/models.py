@@ -46,6 +46,35 @@ class MenuItem(models.Model):
         return f"{self.name} - {self.stall.name}"
 
 
+class MenuItemStock(models.Model):
+    """Daily stock cap for a menu item, optionally limited to one break slot.
+
+    A blank break_slot caps the whole day; a slot row caps just that slot.
+    Items without any stock row for a date are unlimited.
+    """
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='stock_caps')
+    date = models.DateField()
+    break_slot = models.CharField(max_length=5, blank=True)
+    quantity = models.PositiveIntegerField()
+    remaining = models.PositiveIntegerField(blank=True)
+
+    class Meta:
+        unique_together = ('menu_item', 'date', 'break_slot')
+
+    def __str__(self):
+        slot = self.break_slot or 'all day'
+        return f"{self.menu_item.name} | {self.date} | {slot}: {self.remaining}/{self.quantity}"
+
+    def save(self, *args, **kwargs):
+        if self.remaining is None:
+            self.remaining = self.quantity
+        super().save(*args, **kwargs)
+
+    @property
+    def is_sold_out(self):
+        return self.remaining == 0
+
+
 class StallReview(models.Model):
     stall = models.ForeignKey(FoodStall, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -55,6 +84,9 @@ class StallReview(models.Model):
 
     class Meta:
         unique_together = ('stall', 'user')
+        indexes = [
+            models.Index(fields=['stall', '-created_at', '-id'], name='review_stall_feed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} rated {self.stall.name} - {self.rating}/5"
@@ -0,0 +1,320 @@
+"""
+Catalog search over stalls and menu items.
+Stall name, location and description, and menu item name and description,
+are indexed by a pluggable backend (SEARCH_BACKEND in settings). On SQLite,
+the default is an FTS5 table. Other databases fall back to ORM lookups.
+Signals in apps/stalls/signals.py keep the index in step with saves and
+deletes; bulk writes call index_stalls() themselves.
+
+A backend only finds candidates: rows containing every query word, at most
+RANK_CANDIDATES of them. Rows with every word in their name come first
+(stalls, then the newest items), and the rest of the window is filled
+from matches in the other fields. Ranking happens here, the same for every
+backend: each field that contains query words adds its weight, and short
+fields count for more than long ones. The window only bounds ranking;
+stall_ids() returns every stall with a match, for the stall list.
+BM25 inside FTS5 costs several microseconds per matching row, far too slow
+for a word in half of a 100k-item catalog; bounding the candidate set keeps
+every query to a few milliseconds.
+
+In the FTS5 table, item rows have rowid = pk and stall rows
+STALL_ROWID_BASE + pk, so one row can be replaced without scanning and
+stalls sort after every item. Item rows also carry their stall's name and
+location, so a stall can be found by its dishes and a dish by its stall.
+Filters are tokens in the tags column, matched inside the same FTS query:
+item rows carry their category, "veg" or "nonveg", and "veg<category>" so
+that the two filters together cost one lookup. Unavailable items and
+closed stalls are tagged "hidden".
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import FoodStall, MenuItem
+
+SEARCH_TABLE = 'stalls_search'
+STALL_ROWID_BASE = 1 << 40
+FIELD_WEIGHTS = {'name': 10.0, 'stall': 4.0, 'location': 2.0, 'description': 1.0}
+RANK_CANDIDATES = 200
+MIN_PREFIX = 2      # shorter trailing words are matched whole, not as prefixes
+CATEGORIES = dict(MenuItem.CATEGORY_CHOICES)
+
+Hit = namedtuple('Hit', 'kind pk stall_id score')   # kind is 'stall' or 'item'; higher score is better
+# fields maps FIELD_WEIGHTS names to text; a stall row's own name is its 'name'
+Candidate = namedtuple('Candidate', 'kind pk stall_id fields')
+
+
+WORD = re.compile(r'\w+')
+
+
+def fold(text):
+    """Lowercase without accents ("Café" -> "cafe"), as FTS5's remove_diacritics matches."""
+    return ''.join(char for char in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(char))
+
+
+def query_terms(text):
+    return WORD.findall(fold(text)) if text else []
+
+
+def score(words, prefix, fields):
+    """Field-weighted share of query words found, damped by field length."""
+    total = 0.0
+    *leading, last = words
+    for field, weight in FIELD_WEIGHTS.items():
+        text = fields.get(field)
+        if not text:
+            continue
+        tokens = WORD.findall(fold(text))
+        found = 0
+        if leading:
+            present = set(tokens)
+            found = sum(1 for word in leading if word in present)
+        if prefix:
+            found += any(token.startswith(last) for token in tokens)
+        else:
+            found += last in tokens
+        if found:
+            total += weight * found / (1 + len(tokens) / 8)
+    return total / len(words)
+
+
+class SearchBackend:
+    """Interface for search backends: keep an index (optional) and find candidates."""
+
+    def index_stalls(self, stall_ids):
+        """(Re)index these stalls and all of their menu items."""
+
+    def index_items(self, item_ids):
+        """(Re)index these menu items."""
+
+    def remove(self, stall_ids=(), item_ids=()):
+        """Drop stalls and menu items from the index."""
+
+    def rebuild(self):
+        """Index the whole catalog from scratch. Returns the number of rows indexed."""
+        return 0
+
+    def candidates(self, words, prefix, category, vegetarian, kind):
+        """
+        Up to RANK_CANDIDATES Candidates containing every word: name matches
+        first (stalls, then the newest items), then matches in other fields.
+        """
+        raise NotImplementedError
+
+    def stall_ids(self, words, prefix, category, vegetarian):
+        """Every open stall that matches itself or through an available item, unbounded."""
+        raise NotImplementedError
+
+    def matching_stalls(self, text, category=None, vegetarian=False, prefix=True):
+        """Ids of every stall search() could list for `text`, beyond its candidate window."""
+        words = query_terms(text)
+        if not words or (category and category not in CATEGORIES):
+            return set()
+        return set(self.stall_ids(words, prefix and len(words[-1]) >= MIN_PREFIX, category, vegetarian))
+
+    def search(self, text, category=None, vegetarian=False, kind=None, limit=20, prefix=True):
+        """
+        Open stalls and available items matching every word of `text`, best
+        first. With prefix, the last word also matches longer words, for
+        type-ahead. category and vegetarian restrict results to menu items.
+        """
+        words = query_terms(text)
+        if not words or (category and category not in CATEGORIES):
+            return []
+        prefix = prefix and len(words[-1]) >= MIN_PREFIX
+        hits = [
+            Hit(row.kind, row.pk, row.stall_id, score(words, prefix, row.fields))
+            for row in self.candidates(words, prefix, category, vegetarian, kind)
+        ]
+        hits.sort(key=lambda hit: -hit.score)
+        return hits[:limit]
+
+
+def _marks(values):
+    return ', '.join(['%s'] * len(values))
+
+
+class FTS5Backend(SearchBackend):
+    """SQLite FTS5 index, kept in the same database (and transaction) as the catalog."""
+    COLUMNS = 'rowid, name, stall, location, description, tags, stall_id'
+
+    def _insert_stalls(self, cursor, where, params):
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({self.COLUMNS}) "
+            f"SELECT {STALL_ROWID_BASE} + s.id, s.name, '', s.location, s.description, "
+            f"'stall' || CASE WHEN s.is_open THEN '' ELSE ' hidden' END, s.id "
+            f"FROM {FoodStall._meta.db_table} s WHERE {where}",
+            params,
+        )
+
+    def _insert_items(self, cursor, where, params):
+        stalls, items = FoodStall._meta.db_table, MenuItem._meta.db_table
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({self.COLUMNS}) "
+            f"SELECT i.id, i.name, s.name, s.location, i.description, "
+            f"'item ' || i.category || CASE WHEN i.is_vegetarian THEN ' veg veg' || i.category ELSE ' nonveg' END"
+            f" || CASE WHEN i.is_available AND s.is_open THEN '' ELSE ' hidden' END, s.id "
+            f"FROM {items} i JOIN {stalls} s ON s.id = i.stall_id WHERE {where}",
+            params,
+        )
+
+    def _delete(self, cursor, rowids):
+        if rowids:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({_marks(rowids)})', rowids)
+
+    def index_stalls(self, stall_ids):
+        stall_ids = list(stall_ids)
+        if not stall_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN '
+                f'(SELECT id FROM {MenuItem._meta.db_table} WHERE stall_id IN ({_marks(stall_ids)}))', stall_ids,
+            )
+            self._delete(cursor, [STALL_ROWID_BASE + pk for pk in stall_ids])
+            self._insert_items(cursor, f'i.stall_id IN ({_marks(stall_ids)})', stall_ids)
+            self._insert_stalls(cursor, f's.id IN ({_marks(stall_ids)})', stall_ids)
+
+    def index_items(self, item_ids):
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+        with connection.cursor() as cursor:
+            self._delete(cursor, item_ids)
+            self._insert_items(cursor, f'i.id IN ({_marks(item_ids)})', item_ids)
+
+    def remove(self, stall_ids=(), item_ids=()):
+        with connection.cursor() as cursor:
+            self._delete(cursor, list(item_ids) + [STALL_ROWID_BASE + pk for pk in stall_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+            self._insert_items(cursor, '1', [])
+            self._insert_stalls(cursor, '1', [])
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+            cursor.execute(f'SELECT count(*) FROM {SEARCH_TABLE}')
+            return cursor.fetchone()[0]
+
+    def match_expression(self, words, prefix, category=None, vegetarian=False, kind=None,
+                         columns='name stall location description'):
+        terms = [f'"{word}"' for word in words]
+        if prefix:
+            terms[-1] += '*'
+        expression = f"{{{columns}}}: ({' '.join(terms)})"
+        tag = ('veg' if vegetarian else '') + (category or '') or kind   # filters imply kind 'item'
+        if tag:
+            expression += f' AND tags: {tag}'
+        return expression + ' NOT tags: hidden'
+
+    def candidates(self, words, prefix, category, vegetarian, kind):
+        rows = {}
+        with connection.cursor() as cursor:
+            # Name matches first, so an old dish named after the query beats new description-only hits
+            for columns in ('name', 'name stall location description'):
+                cursor.execute(
+                    f'SELECT rowid, stall_id, name, stall, location, description FROM {SEARCH_TABLE} '
+                    f'WHERE {SEARCH_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s',
+                    [self.match_expression(words, prefix, category, vegetarian, kind, columns), RANK_CANDIDATES],
+                )
+                for row in cursor.fetchall():
+                    rows.setdefault(row[0], row)
+                if len(rows) >= RANK_CANDIDATES:
+                    break
+        return [
+            Candidate('stall' if rowid >= STALL_ROWID_BASE else 'item',
+                      rowid - STALL_ROWID_BASE if rowid >= STALL_ROWID_BASE else rowid, stall_id,
+                      {'name': name, 'stall': stall, 'location': location, 'description': description})
+            for rowid, stall_id, name, stall, location, description in list(rows.values())[:RANK_CANDIDATES]
+        ]
+
+    def stall_ids(self, words, prefix, category, vegetarian):
+        # Only rowids are read from the index; its stall_id column would cost a row fetch per match
+        expression = self.match_expression(words, prefix, category, vegetarian)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT DISTINCT i.stall_id FROM {SEARCH_TABLE} s '
+                f'JOIN {MenuItem._meta.db_table} i ON i.id = s.rowid WHERE {SEARCH_TABLE} MATCH %s '
+                f'UNION SELECT rowid - {STALL_ROWID_BASE} FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s AND rowid >= {STALL_ROWID_BASE}',
+                [expression, expression],
+            )
+            return [stall_id for (stall_id,) in cursor.fetchall()]
+
+
+class DatabaseBackend(SearchBackend):
+    """
+    Portable fallback: icontains lookups on the catalog tables. Nothing to
+    maintain, but every query scans them, and since query words arrive
+    folded, accented catalog text is only found by its unaccented spelling.
+    """
+
+    def _stalls(self, words, fields):
+        stalls = FoodStall.objects.filter(is_open=True)
+        for word in words:
+            stalls = stalls.filter(Q(*[(f'{field}__icontains', word) for field in fields], _connector=Q.OR))
+        return stalls
+
+    def _items(self, words, fields, category, vegetarian):
+        items = MenuItem.objects.filter(is_available=True, stall__is_open=True)
+        if category:
+            items = items.filter(category=category)
+        if vegetarian:
+            items = items.filter(is_vegetarian=True)
+        for word in words:
+            items = items.filter(Q(*[(f'{field}__icontains', word) for field in fields], _connector=Q.OR))
+        return items
+
+    def candidates(self, words, prefix, category, vegetarian, kind):
+        rows = {}
+        # Name matches first, as in FTS5Backend.candidates
+        for stall_fields, item_fields in (
+            (['name'], ['name']),
+            (['name', 'location', 'description'], ['name', 'description', 'stall__name', 'stall__location']),
+        ):
+            if kind != 'item' and not category and not vegetarian:
+                stalls = self._stalls(words, stall_fields).exclude(pk__in=[pk for kind_, pk in rows if kind_ == 'stall'])
+                for stall in stalls.order_by('-pk').values('pk', 'name', 'location', 'description')[
+                    :RANK_CANDIDATES - len(rows)
+                ]:
+                    rows['stall', stall['pk']] = Candidate('stall', stall['pk'], stall['pk'], stall)
+            if kind != 'stall' and len(rows) < RANK_CANDIDATES:
+                items = self._items(words, item_fields, category, vegetarian).exclude(
+                    pk__in=[pk for kind_, pk in rows if kind_ == 'item'],
+                )
+                for item in items.order_by('-pk').values('pk', 'stall_id', 'name', 'description', 'stall__name',
+                                                         'stall__location')[:RANK_CANDIDATES - len(rows)]:
+                    rows['item', item['pk']] = Candidate('item', item['pk'], item['stall_id'], {
+                        'name': item['name'], 'stall': item['stall__name'],
+                        'location': item['stall__location'], 'description': item['description'],
+                    })
+            if len(rows) >= RANK_CANDIDATES:
+                break
+        return list(rows.values())
+
+    def stall_ids(self, words, prefix, category, vegetarian):
+        items = self._items(words, ['name', 'description', 'stall__name', 'stall__location'], category, vegetarian)
+        ids = set(items.values_list('stall_id', flat=True).distinct())
+        if not category and not vegetarian:
+            ids.update(self._stalls(words, ['name', 'location', 'description']).values_list('pk', flat=True))
+        return ids
+
+
+_backend = None
+
+
+def get_backend():
+    """The configured backend: SEARCH_BACKEND, or FTS5 on SQLite and DatabaseBackend elsewhere."""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        else:
+            _backend = FTS5Backend() if connection.vendor == 'sqlite' else DatabaseBackend()
+    return _backend
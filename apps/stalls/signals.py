@@ -0,0 +1,67 @@
+"""
+Keep the search index and catalog caches in step with stall and menu edits.
+Bulk writes (queryset.update, bulk_create) skip these; callers re-index
+with search.get_backend().index_stalls() and bump_catalog_version().
+Reviews and newly rendered image variants bump the version too, since
+cached stall pages show ratings and images.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.images.pipeline import variants_rendered
+
+from .catalog import bump_catalog_version
+from .models import FoodStall, MenuItem, StallReview
+from .search import get_backend
+
+
+def _invalidate(stall_id):
+    transaction.on_commit(lambda: bump_catalog_version(stall_id))
+
+
+@receiver(post_save, sender=FoodStall)
+def stall_saved(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata; rebuild_search_index afterwards
+        return
+    get_backend().index_stalls([instance.pk])   # items carry the stall's name and open state
+    _invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=FoodStall)
+def stall_deleted(sender, instance, **kwargs):
+    get_backend().remove(stall_ids=[instance.pk])
+    _invalidate(instance.pk)
+
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_backend().index_items([instance.pk])
+    _invalidate(instance.stall_id)
+
+
+@receiver(post_delete, sender=MenuItem)
+def menu_item_deleted(sender, instance, **kwargs):
+    get_backend().remove(item_ids=[instance.pk])
+    _invalidate(instance.stall_id)
+
+
+@receiver(post_save, sender=StallReview)
+@receiver(post_delete, sender=StallReview)
+def review_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate(instance.stall_id)
+
+
+@receiver(variants_rendered, sender=FoodStall)
+def stall_image_rendered(sender, pk, **kwargs):
+    bump_catalog_version(pk)
+
+
+@receiver(variants_rendered, sender=MenuItem)
+def menu_item_image_rendered(sender, pk, **kwargs):
+    stall_id = MenuItem.objects.filter(pk=pk).values_list('stall_id', flat=True).first()
+    if stall_id:
+        bump_catalog_version(stall_id)
@@ -0,0 +1,80 @@
+"""
+Daily stock caps for menu items.
+Reservations decrement every capped line of a cart in a single UPDATE so
+concurrent orders can never push a counter below zero.
+"""
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Least
+
+from .models import MenuItemStock
+
+
+class OutOfStock(Exception):
+    """Raised when a cart asks for more than the remaining stock."""
+
+    def __init__(self, item_names):
+        self.item_names = item_names
+        super().__init__(f"Sorry, not enough stock left for: {', '.join(item_names)}")
+
+
+def _caps_for(item_ids, pickup_date, break_slot):
+    # Whole-day caps (blank slot) and slot-specific caps both apply
+    return MenuItemStock.objects.filter(
+        menu_item_id__in=item_ids,
+        date=pickup_date,
+        break_slot__in=['', break_slot],
+    )
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(menu_item_id=item_id, then=Value(qty)) for item_id, qty in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(quantities, pickup_date, break_slot):
+    """
+    Decrement stock for a whole cart in one statement.
+    `quantities` maps menu item id -> quantity. Must be called inside
+    transaction.atomic() so a partial decrement is rolled back on OutOfStock.
+    """
+    caps = _caps_for(quantities.keys(), pickup_date, break_slot)
+    capped_rows = caps.count()
+    if not capped_rows:
+        return
+
+    enough = Q()
+    for item_id, qty in quantities.items():
+        enough |= Q(menu_item_id=item_id, remaining__gte=qty)
+
+    updated = caps.filter(enough).update(remaining=F('remaining') - _quantity_case(quantities))
+    if updated != capped_rows:
+        short = caps.exclude(enough).values_list('menu_item__name', flat=True).distinct()
+        raise OutOfStock(sorted(short))
+
+
+def release_stock(order):
+    """Give an order's quantities back to the stock it reserved."""
+    quantities = {}
+    for item_id, qty in order.order_items.values_list('menu_item_id', 'quantity'):
+        quantities[item_id] = quantities.get(item_id, 0) + qty
+    if not quantities:
+        return
+    _caps_for(quantities.keys(), order.pickup_date, order.break_slot).update(
+        remaining=Least(F('remaining') + _quantity_case(quantities), F('quantity'))
+    )
+
+
+def exclude_sold_out(menu_items, on_date):
+    """Hide items whose whole-day stock for `on_date` has run out."""
+    sold_out = MenuItemStock.objects.filter(date=on_date, break_slot='', remaining=0)
+    return menu_items.exclude(pk__in=sold_out.values('menu_item_id'))
+
+
+def sold_out_item_ids(stall_id, on_date):
+    """Ids of a stall's items whose whole-day stock for `on_date` has run out."""
+    return list(MenuItemStock.objects.filter(
+        menu_item__stall_id=stall_id, date=on_date, break_slot='', remaining=0,
+    ).order_by('menu_item_id').values_list('menu_item_id', flat=True))
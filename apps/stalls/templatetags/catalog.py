@@ -0,0 +1,11 @@
+from django import template
+
+from apps.stalls import catalog
+
+register = template.Library()
+
+
+@register.filter
+def catalog_version(stall_id):
+    """A stall's catalog version, for {% cache %} keys: {% cache 86400 card stall.pk stall.pk|catalog_version %}"""
+    return catalog.catalog_version(stall_id)
@@ -5,5 +5,8 @@ urlpatterns = [
     path('', views.stall_list, name='stall_list'),
     path('<int:pk>/', views.stall_detail, name='stall_detail'),
     path('<int:pk>/review/', views.add_review, name='add_review'),
+    path('<int:pk>/menu/import/', views.menu_import, name='menu_import'),
+    path('api/search/', views.catalog_search_api, name='catalog_search_api'),
     path('api/menu-item/<int:pk>/', views.get_menu_item_api, name='menu_item_api'),
+    path('api/<int:pk>/reviews/', views.stall_reviews_api, name='stall_reviews_api'),
 ]
@@ -1,39 +1,108 @@
+from functools import partial
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from .models import FoodStall, MenuItem, StallReview
+from .menu_import import CSV_COLUMNS, MenuImportError, export_menu_csv, import_menu, parse_menu_csv
+from .catalog import catalog_version
+from .facets import facet_counts, facet_rows, filter_menu, filter_query, parse_filters, sidebar
+from .search import CATEGORIES, RANK_CANDIDATES, get_backend
+from .stock import exclude_sold_out, sold_out_item_ids
+from apps.orders.pagination import paginate_by_cursor
+
+REVIEWS_PER_PAGE = 10
+MATCHED_DISHES = 3      # dishes listed under each stall in search results
+SUGGESTIONS = 8
+
+
+def _search_filters(request):
+    category = request.GET.get('category')
+    return (category if category in CATEGORIES else None), request.GET.get('veg') == '1'
+
+
+def _search_stalls(stalls, search, category, vegetarian):
+    """
+    Stalls in order of their best hit, each listing the dishes that matched.
+    Stalls whose matches all fall outside the ranked window follow, newest first.
+    """
+    backend = get_backend()
+    order, dishes, direct = [], {}, set()
+    hits = backend.search(search, category, vegetarian, limit=RANK_CANDIDATES)
+    for hit in hits:
+        if hit.stall_id not in dishes:
+            order.append(hit.stall_id)
+            dishes[hit.stall_id] = []
+        if hit.kind == 'stall':
+            direct.add(hit.stall_id)
+        elif len(dishes[hit.stall_id]) < MATCHED_DISHES:
+            dishes[hit.stall_id].append(hit.pk)
+    names = dict(MenuItem.objects.filter(
+        pk__in=[pk for pks in dishes.values() for pk in pks],
+    ).values_list('pk', 'name'))
+    if len(hits) == RANK_CANDIDATES:   # the window may have cut off whole stalls
+        for stall_id in sorted(backend.matching_stalls(search, category, vegetarian) - set(dishes), reverse=True):
+            order.append(stall_id)
+            dishes[stall_id] = []
+    by_pk = stalls.in_bulk(order)
+    stalls = [by_pk[pk] for pk in order if pk in by_pk]
+    for stall in stalls:
+        # A stall found by its own name would otherwise list every dish (they carry its name too)
+        stall.matched_dishes = [] if stall.pk in direct else [names[pk] for pk in dishes[stall.pk] if pk in names]
+    return stalls
 
 
 def stall_list(request):
     stalls = FoodStall.objects.filter(is_open=True)
-    category = request.GET.get('category')
-    search = request.GET.get('search', '')
+    category, vegetarian = _search_filters(request)
+    search = request.GET.get('search', '').strip()
     if search:
-        stalls = stalls.filter(name__icontains=search)
+        # Lazy, so a cached stall grid skips the search
+        stalls = SimpleLazyObject(partial(_search_stalls, stalls, search, category, vegetarian))
+    elif category or vegetarian:
+        dishes = {'menu_items__is_available': True}
+        if category:
+            dishes['menu_items__category'] = category
+        if vegetarian:
+            dishes['menu_items__is_vegetarian'] = True
+        stalls = stalls.filter(**dishes).distinct()
     return render(request, 'stalls/stall_list.html', {
         'stalls': stalls,
         'search': search,
+        'categories': MenuItem.CATEGORY_CHOICES,
+        'selected_category': category,
+        'vegetarian': vegetarian,
+        'catalog_version': catalog_version(),
     })
 
 
 def stall_detail(request, pk):
     stall = get_object_or_404(FoodStall, pk=pk)
-    menu_items = stall.menu_items.filter(is_available=True)
-    category = request.GET.get('category')
-    if category:
-        menu_items = menu_items.filter(category=category)
-    reviews = stall.reviews.all().order_by('-created_at')
+    filters = parse_filters(request.GET)
+    sold_out = sold_out_item_ids(stall.pk, timezone.now().date())
+    menu_items = filter_menu(stall.menu_items.filter(is_available=True).exclude(pk__in=sold_out), filters)
+    # Lazy, so cached fragments skip them; the template caches per catalog version
+    facets = SimpleLazyObject(lambda: sidebar(filters, facet_counts(facet_rows(stall.pk), filters, hidden=sold_out)))
+    reviews = SimpleLazyObject(lambda: paginate_by_cursor(
+        stall.reviews.select_related('user'), request.GET.get('cursor'), per_page=REVIEWS_PER_PAGE
+    ))
     user_review = None
     if request.user.is_authenticated:
-        user_review = reviews.filter(user=request.user).first()
+        user_review = stall.reviews.filter(user=request.user).first()
     return render(request, 'stalls/stall_detail.html', {
         'stall': stall,
         'menu_items': menu_items,
         'reviews': reviews,
         'user_review': user_review,
-        'categories': MenuItem.CATEGORY_CHOICES,
-        'selected_category': category,
+        'facets': facets,
+        'filtered': any(filters.values()),
+        'filter_query': filter_query(filters),
+        'sold_out': sold_out,
+        'catalog_version': catalog_version(stall.pk),
     })
 
 
@@ -53,9 +122,89 @@ def add_review(request, pk):
         return redirect('stall_detail', pk=pk)
 
 
+@login_required
+def menu_import(request, pk):
+    """Bulk-update a stall's menu from a CSV upload (owner or staff)"""
+    stall = get_object_or_404(FoodStall, pk=pk)
+    if not request.user.is_staff and stall.owner_id != request.user.pk:
+        messages.error(request, 'Access denied.')
+        return redirect('stall_detail', pk=pk)
+
+    if request.GET.get('download'):
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="menu-{stall.pk}.csv"'
+        export_menu_csv(stall, response)
+        return response
+
+    result = None
+    errors = []
+    if request.method == 'POST' and request.FILES.get('menu_file'):
+        try:
+            rows = parse_menu_csv(request.FILES['menu_file'].read())
+        except (MenuImportError, UnicodeDecodeError) as exc:
+            errors = getattr(exc, 'errors', [(0, 'The file is not UTF-8 CSV')])
+        else:
+            dry_run = bool(request.POST.get('preview'))
+            result = import_menu(stall, rows, deactivate_missing=bool(request.POST.get('deactivate_missing')),
+                                 dry_run=dry_run)
+            if not dry_run:
+                messages.success(request, f'Menu updated: {result}.')
+                return redirect('menu_import', pk=pk)
+
+    return render(request, 'stalls/menu_import.html', {
+        'stall': stall,
+        'result': result,
+        'errors': errors,
+        'columns': ', '.join(CSV_COLUMNS),
+    })
+
+
+def stall_reviews_api(request, pk):
+    """Review feed for a stall, one cursor page at a time"""
+    stall = get_object_or_404(FoodStall, pk=pk)
+    page = paginate_by_cursor(
+        stall.reviews.select_related('user'), request.GET.get('cursor'), per_page=REVIEWS_PER_PAGE
+    )
+    return JsonResponse({
+        'reviews': [{
+            'id': review.id,
+            'user': review.user.get_full_name() or review.user.username,
+            'rating': review.rating,
+            'comment': review.comment,
+            'created_at': review.created_at.isoformat(),
+        } for review in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
+def catalog_search_api(request):
+    """Type-ahead suggestions: stalls and dishes matching ?q= (prefix on the last word)"""
+    category, vegetarian = _search_filters(request)
+    hits = get_backend().search(request.GET.get('q', ''), category, vegetarian, limit=SUGGESTIONS)
+    stalls = FoodStall.objects.in_bulk({hit.stall_id for hit in hits})
+    items = MenuItem.objects.in_bulk([hit.pk for hit in hits if hit.kind == 'item'])
+    results = []
+    for hit in hits:
+        stall = stalls.get(hit.stall_id)
+        item = items.get(hit.pk) if hit.kind == 'item' else None
+        if stall is None or (hit.kind == 'item' and item is None):
+            continue
+        results.append({
+            'type': hit.kind,
+            'id': hit.pk,
+            'name': item.name if item else stall.name,
+            'stall_id': stall.pk,
+            'stall_name': stall.name,
+            'category': item.category if item else None,
+            'url': reverse('stall_detail', args=[stall.pk]),
+        })
+    return JsonResponse({'results': results})
+
+
 def get_menu_item_api(request, pk):
     """API endpoint to get menu item details for cart"""
-    item = get_object_or_404(MenuItem, pk=pk, is_available=True)
+    available = exclude_sold_out(MenuItem.objects.filter(is_available=True), timezone.now().date())
+    item = get_object_or_404(available, pk=pk)
     return JsonResponse({
         'id': item.id,
         'name': item.name,
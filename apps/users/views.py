@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import StudentRegistrationForm, CustomLoginForm, ProfileUpdateForm
 from apps.orders.models import Order
+from apps.orders.pagination import paginate_by_cursor
 
 
 def register(request):
@@ -58,7 +59,7 @@ def profile(request):
     else:
         form = ProfileUpdateForm(instance=request.user)
 
-    recent_orders = Order.objects.filter(user=request.user).order_by('-created_at')[:5]
+    recent_orders = paginate_by_cursor(Order.objects.filter(user=request.user).select_related('stall'), per_page=5)
     return render(request, 'users/profile.html', {
         'form': form,
         'recent_orders': recent_orders
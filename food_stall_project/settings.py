@@ -22,16 +22,22 @@ INSTALLED_APPS = [
     'apps.users',
     'apps.stalls',
     'apps.orders',
+    'apps.monitoring',
+    'apps.images',
 ]
 
 MIDDLEWARE = [
+    'apps.monitoring.middleware.RequestMetricsMiddleware',
+    'apps.monitoring.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'food_stall_project.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.monitoring.nplusone.NPlusOneMiddleware',
 ]
 
 ROOT_URLCONF = 'food_stall_project.urls'
@@ -56,8 +62,12 @@ WSGI_APPLICATION = 'food_stall_project.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite with BEGIN IMMEDIATE transactions, see sqlite_backend/base.py
+        'ENGINE': 'food_stall_project.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than SQLite's shared in-memory database, where concurrent
+        # writers fail with "table is locked" instead of queueing (apps/orders/tests.py)
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -78,10 +88,31 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# collectstatic minifies, hashes and precompresses (food_stall_project/staticfiles.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'food_stall_project.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+# Serve STATIC_ROOT from the app; turn off when a proxy or CDN serves /static/
+SERVE_STATIC = not DEBUG
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Instrumented so /metrics can report cache hits and misses
+CACHES = {
+    'default': {
+        'BACKEND': 'apps.monitoring.cache.InstrumentedLocMemCache',
+    },
+    # {% cache ... using="fragments" %} in stall pages; keys carry the catalog
+    # version, so edits make old entries unreachable and they age out here
+    'fragments': {
+        'BACKEND': 'apps.monitoring.cache.InstrumentedLocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/users/login/'
@@ -102,3 +133,31 @@ BREAK_TIME_SLOTS = [
 
 # Max orders per slot to control crowd
 MAX_ORDERS_PER_SLOT = 50
+
+# Rate limits per view: scope ('user', 'ip', 'user_or_ip', 'endpoint') -> 'count/period'.
+# Pages poll order status every 10s and slot demand every 30s.
+RATE_LIMIT_ENABLED = True
+RATE_LIMITS = {
+    'place_order': {'user': '5/m'},
+    'order_status_api': {'user_or_ip': '30/m'},
+    'slot_demand_api': {'user_or_ip': '20/m', 'endpoint': '1200/m'},
+}
+
+# Request profiling (off unless a sample rate or slow threshold is set)
+PROFILE_SAMPLE_RATE = 0.0   # fraction of requests to profile
+PROFILE_SLOW_MS = None      # also profile any request running longer than this
+PROFILE_INTERVAL_MS = 5
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_KEEP = 50           # profiles kept per URL name
+
+# Daily order counts cached between backtest_forecasts runs
+BACKTEST_CACHE_DIR = BASE_DIR / '.backtest_cache'
+
+# Catalog search backend (apps/stalls/search.py): None picks FTS5 on SQLite and
+# the ORM fallback elsewhere, or give a dotted path to a SearchBackend subclass
+SEARCH_BACKEND = None
+
+# Image variant presets (apps/images/pipeline.py): widths, aspect ratio and the
+# sizes hint per preset. None uses the defaults there; changing a preset makes
+# its images re-render the next time they are shown
+IMAGE_VARIANTS = None
@@ -0,0 +1,15 @@
+"""
+SQLite backend whose transactions start with BEGIN IMMEDIATE.
+With a plain BEGIN, two requests that read and then write in an atomic
+block (place_order, session saves) can both hold read locks and deadlock
+when upgrading to a write lock; SQLite fails one of them at once with
+"database is locked" instead of waiting out the busy timeout. Taking the
+write lock up front makes concurrent writers queue instead. Django 5.1+
+offers the same through OPTIONS = {'transaction_mode': 'IMMEDIATE'}.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,231 @@
+"""
+Static assets: minified, content-hashed and precompressed at collectstatic
+time, and served by the app when no front proxy does it.
+CompressedManifestStaticFilesStorage minifies CSS and JS before
+ManifestStaticFilesStorage hashes them, so a name like main.3f2a9c1e.css
+always means the same bytes and can be cached for a year. Every hashed
+text asset also gets .gz and (if the brotli package is installed) .br
+siblings, compressed once at maximum level instead of on every request.
+StaticFilesMiddleware serves STATIC_ROOT with those siblings, picked from
+the request's Accept-Encoding. It is off when DEBUG is on, where
+runserver serves the unprocessed files; SERVE_STATIC overrides that.
+"""
+import gzip
+import json
+import mimetypes
+import os
+import re
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ico'}
+MIN_SAVING = 0.05          # keep a compressed sibling only if it saves at least 5%
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MUTABLE_MAX_AGE = 60       # unhashed names can change on the next deploy
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))   # in order of preference
+
+# Strings and comments, matched first so minification never touches the inside of a string
+CSS_TOKENS = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')|/\*.*?\*/', re.S)
+
+
+def _minify_css_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+    code = re.sub(r':\s+', ':', code)   # not before ':', where "a :hover" differs from "a:hover"
+    return code.replace(';}', '}')
+
+
+def minify_css(text):
+    """Drop comments and redundant whitespace."""
+    parts, last = [], 0
+    for match in CSS_TOKENS.finditer(text):
+        parts.append(_minify_css_code(text[last:match.start()]))
+        if match.group(1):
+            parts.append(match.group(1))
+        last = match.end()
+    parts.append(_minify_css_code(text[last:]))
+    return ''.join(parts).strip()
+
+
+def minify_js(text):
+    """
+    Conservative: strip indentation, blank lines and whole-line // comments.
+    Line breaks stay, so automatic semicolon insertion and regex literals
+    are unaffected. Multi-line template strings lose their indentation.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:  # not collected (tests, benchmark_views with DEBUG off): use the plain name
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        paths = self._minify(paths)
+        yield from super().post_process(paths, dry_run, **options)
+        for hashed_name in set(self.hashed_files.values()):
+            if os.path.splitext(hashed_name)[1] in COMPRESSIBLE:
+                self._compress(hashed_name)
+
+    def _replace(self, name, data):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(data))
+
+    def _minify(self, paths):
+        """
+        Minify the collected copies of the project's own CSS and JS (from
+        STATICFILES_DIRS; app assets such as the admin's are left alone),
+        and hash those instead of the sources.
+        """
+        own = {
+            os.path.realpath(entry[1] if isinstance(entry, (list, tuple)) else entry)
+            for entry in settings.STATICFILES_DIRS
+        }
+        paths = dict(paths)
+        for path, (storage, _source_path) in list(paths.items()):
+            minify = MINIFIERS.get(os.path.splitext(path)[1])
+            if minify is None or path.endswith(('.min.css', '.min.js')):
+                continue
+            if os.path.realpath(getattr(storage, 'location', '')) not in own:
+                continue
+            with self.open(path) as fh:
+                original = fh.read().decode('utf-8')
+            minified = minify(original)
+            if minified != original:
+                self._replace(path, minified.encode('utf-8'))
+            paths[path] = (self, path)
+        return paths
+
+    def _compress(self, name):
+        with self.open(name) as fh:
+            data = fh.read()
+        siblings = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            siblings['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in siblings.items():
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                self._replace(name + suffix, compressed)
+            elif self.exists(name + suffix):
+                self.delete(name + suffix)
+
+
+class Asset:
+    """One file under STATIC_ROOT with its precompressed siblings."""
+    __slots__ = ('path', 'content_type', 'mtime', 'etag', 'encoded', 'cache_control')
+
+    def __init__(self, path, immutable):
+        stat = path.stat()
+        self.path = path
+        self.content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        self.mtime = stat.st_mtime
+        self.etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}'
+        self.encoded = {
+            encoding: path.with_name(path.name + suffix)
+            for encoding, suffix in ENCODINGS if path.with_name(path.name + suffix).is_file()
+        }
+        max_age = IMMUTABLE_MAX_AGE if immutable else MUTABLE_MAX_AGE
+        self.cache_control = f'public, max-age={max_age}' + (', immutable' if immutable else '')
+
+    def response(self, request):
+        encoding = negotiate(request.headers.get('Accept-Encoding', ''), self.encoded)
+        path = self.encoded[encoding] if encoding else self.path
+        etag = self.etag + (f'-{encoding}"' if encoding else '"')
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags or '*' in etags or (
+            'If-None-Match' not in request.headers
+            and not was_modified_since(request.headers.get('If-Modified-Since'), self.mtime)
+        ):
+            response = HttpResponseNotModified()
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=self.content_type)
+            response['Content-Length'] = path.stat().st_size
+        else:
+            response = FileResponse(path.open('rb'), content_type=self.content_type)
+            response.headers.pop('Content-Disposition', None)   # would name the .br/.gz file
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if self.encoded:
+            response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(self.mtime)
+        response['Cache-Control'] = self.cache_control
+        return response
+
+
+def negotiate(accept_encoding, available):
+    """The preferred encoding in `available` that the client accepts (q > 0), or None."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding, _suffix in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def scan(root):
+    """{url path: Asset} for every file under root; hashed names (from the manifest) are immutable."""
+    root = Path(root)
+    manifest = root / ManifestStaticFilesStorage.manifest_name
+    hashed = set(json.loads(manifest.read_text())['paths'].values()) if manifest.is_file() else set()
+    suffixes = tuple(suffix for _encoding, suffix in ENCODINGS)
+    assets = {}
+    for path in root.rglob('*'):
+        if path.is_file() and not path.name.endswith(suffixes):
+            name = path.relative_to(root).as_posix()
+            assets[name] = Asset(path, name in hashed)
+    return assets
+
+
+class StaticFilesMiddleware:
+    """Serve collected static files with long-lived caching and precompressed siblings."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_STATIC', not settings.DEBUG) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = urlparse(settings.STATIC_URL).path
+        self.assets = scan(settings.STATIC_ROOT)   # collectstatic runs before the app starts
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            asset = self.assets.get(request.path_info[len(self.prefix):])
+            if asset is not None:
+                return asset.response(request)
+        return self.get_response(request)
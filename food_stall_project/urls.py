@@ -8,4 +8,5 @@ urlpatterns = [
     path('', include('apps.orders.urls')),
     path('users/', include('apps.users.urls')),
     path('stalls/', include('apps.stalls.urls')),
+    path('', include('apps.monitoring.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)